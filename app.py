@@ -4,15 +4,17 @@ import sys
 import glob # 用于查找配置文件
 import subprocess
 import time
-from flask import Flask, render_template, request, g, redirect, url_for, flash, jsonify
-
-# --- 定时任务库 ---
-from flask_apscheduler import APScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+import gzip
+from flask import Flask, render_template, request, g, redirect, url_for, flash, jsonify, Response, send_file
+from markupsafe import escape
 
 # --- 添加 scripts 目录到路径，以便导入 database ---
 sys.path.append(os.path.join(os.path.dirname(__file__), 'scripts'))
 import database
+from artifact_store import ARTIFACT_ROOT, artifact_dir
+import run_task
+import job_executor
+import work_queue
 
 # --- 基础配置 ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -27,19 +29,44 @@ app.secret_key = 'your_very_secret_and_random_key_for_flask'
 # --- 1. 配置 Scheduler (定时任务) ---
 class Config:
     SCHEDULER_API_ENABLED = True
-    # 持久化存储：把任务存到 scheduler.db 文件里，重启 Docker 不丢失
-    # SCHEDULER_JOBSTORES = {
-    #     'default': SQLAlchemyJobStore(url='sqlite:///scheduler.db')
-    # }
-    SCHEDULER_JOBSTORES = {
-        'default': SQLAlchemyJobStore(url=f'sqlite:///{os.path.join(DATABASE_DIR, "scheduler.db")}')
-    }
+    # 持久化存储：把任务存到 scheduler.db 文件里，重启 Docker 不丢失 (SQLAlchemyJobStore 在 init_scheduler 中创建)
+    SCHEDULER_JOBSTORE_URL = f'sqlite:///{os.path.join(DATABASE_DIR, "scheduler.db")}'
 
 app.config.from_object(Config())
 
-scheduler = APScheduler()
-scheduler.init_app(app)
-scheduler.start()
+# 由 init_scheduler() 创建。APScheduler/SQLAlchemy 的导入耗时较长，而预热工作进程 (spawn) 会重新导入本文件，
+# 所以只在实际提供服务的进程中导入
+scheduler = None
+
+def init_scheduler():
+    """导入 APScheduler 并创建调度器 (需在处理第一个请求之前调用，init_app 会注册 /scheduler 接口)"""
+    global scheduler
+    if scheduler is None:
+        from flask_apscheduler import APScheduler
+        from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+        app.config['SCHEDULER_JOBSTORES'] = {'default': SQLAlchemyJobStore(url=app.config['SCHEDULER_JOBSTORE_URL'])}
+        scheduler = APScheduler()
+        scheduler.init_app(app)
+    return scheduler
+
+def get_scheduler():
+    if scheduler is None:
+        raise RuntimeError("定时任务调度器未启动 (请通过 python app.py 启动服务)")
+    return scheduler
+
+# 手动与定时任务共用的执行器: 后台线程运行 run_task 任务 (各阶段在预热的工作进程中执行)，
+# 同一站点同时只运行一个任务，浏览器任务有全局并发上限
+executor = job_executor.init_executor(run_task.run_command)
+
+def migrate_legacy_jobs():
+    """旧版定时任务以 subprocess.run([python, run_task.py, 类型, ...]) 保存，转换为提交到执行器"""
+    for job in get_scheduler().get_jobs():
+        if job.func is not subprocess.run or not job.args:
+            continue
+        cmd = list(job.args[0])
+        if len(cmd) >= 3 and os.path.basename(cmd[1]) == 'run_task.py':
+            scheduler.modify_job(job.id, func=job_executor.run_scheduled_job, args=[cmd[2], cmd[3:]])
+            print(f"定时任务 {job.id} 已迁移为非阻塞执行: {cmd[2]} {' '.join(cmd[3:])}")
 
 # --- 数据库辅助函数 ---
 def get_db(db_name):
@@ -124,14 +151,24 @@ def delete_config():
 #               任务执行路由
 # ==========================================
 
+def run_all_form_args(form):
+    """全部站点任务的表单参数 -> run_task.py run_all 的命令行参数 (留空的项使用默认值)"""
+    args = []
+    for field, option in (('param_all_sites', '--sites'), ('param_all_browsers', '--max-browsers'),
+                          ('param_all_http', '--max-http'), ('param_all_rate', '--per-host-rate')):
+        value = form.get(field, '').strip()
+        if value:
+            args.extend([option, value])
+    return args
+
 @app.route('/run_advanced_task', methods=['POST'])
 def run_advanced_task():
     # 1. 获取通用参数
     task_type = request.form.get('task_type')
     site_name = request.form.get('param1')  # 统一从下拉菜单获取 site (不含 .yaml)
     
-    # 基础命令: python run_task.py [javbee/sehuatang/...]
-    cmd = [sys.executable, 'run_task.py', task_type]
+    # 任务参数: 与 python run_task.py [javbee/sehuatang/...] 之后的命令行参数相同
+    task_args = []
 
     # 2. 根据任务类型组装参数
     if task_type == 'javbee':
@@ -141,44 +178,56 @@ def run_advanced_task():
         date_val = request.form.get('param_jav_date', '').strip()
         start_page = request.form.get('param_jav_start', '1').strip()
         
-        cmd.extend(['--site', site_name])
+        task_args.extend(['--site', site_name])
         
         # 优先级逻辑: Search > Tag > Date
         if search_val:
-            cmd.extend(['--search', search_val])
+            task_args.extend(['--search', search_val])
         elif tag_val:
-            cmd.extend(['--tag', tag_val])
+            task_args.extend(['--tag', tag_val])
+        elif date_val and '~' in date_val:
+            # 日期范围: YYYY-MM-DD~YYYY-MM-DD (并发抓取)
+            date_from, date_to = [d.strip() for d in date_val.split('~', 1)]
+            task_args.extend(['--date-from', date_from])
+            if date_to:
+                task_args.extend(['--date-to', date_to])
         elif date_val and date_val != 'auto':
-            cmd.extend(['--date', date_val])
+            task_args.extend(['--date', date_val])
         
         # 起始页码是通用的
         if start_page and start_page != '1':
-            cmd.extend(['--start-page', start_page])
+            task_args.extend(['--start-page', start_page])
             
     elif task_type == 'sehuatang':
         page_val = request.form.get('param_sech_page', '').strip()
-        cmd.extend(['--site', site_name])
+        task_args.extend(['--site', site_name])
         if page_val:
-            if not page_val.startswith('-'):
-                cmd.extend(['--page', page_val])
-            else:
-                cmd.extend(page_val.split())
+            # 支持 "1-5"、"1-5 --stream"、"--retry-failed" 等写法
+            tokens = page_val.split()
+            if not tokens[0].startswith('-'):
+                tokens = ['--page'] + tokens
+            task_args.extend(tokens)
             
     elif task_type == 'nyaa':
         start_page = request.form.get('param_nyaa_start', '1').strip()
         end_page = request.form.get('param_nyaa_end', 'auto').strip()
-        cmd.extend(['--site', site_name])
-        cmd.extend(['--start-page', start_page])
-        cmd.extend(['--end-page', end_page])
+        task_args.extend(['--site', site_name])
+        task_args.extend(['--start-page', start_page])
+        task_args.extend(['--end-page', end_page])
 
     elif task_type == 'retag':
         # Retag 命令格式特殊: run_task.py retag [site_name]
-        cmd.append(site_name)
+        task_args.append(site_name)
+
+    elif task_type == 'run_all':
+        # 全部站点并发运行，忽略上方选择的配置文件
+        task_args.extend(run_all_form_args(request.form))
 
     try:
-        print(f"Executing: {' '.join(cmd)}")
-        subprocess.Popen(cmd)
-        flash(f"🚀 任务已启动 [{site_name}]: {' '.join(cmd)}", "success")
+        print(f"Executing: run_task {task_type} {' '.join(task_args)}")
+        status, message = executor.submit(task_type, task_args)
+        icon = {'started': '🚀', 'queued': '⏳', 'coalesced': '🔗', 'skipped': '⏭️'}[status]
+        flash(f"{icon} {message} [{task_type}]: {' '.join(task_args)}", "success" if status != 'skipped' else "error")
     except Exception as e:
         flash(f"启动失败: {str(e)}", "error")
         
@@ -188,12 +237,101 @@ def run_advanced_task():
 def run_update():
     """旧的一键更新入口，保留以兼容旧代码"""
     try:
-        subprocess.Popen([sys.executable, 'run_task.py', 'sehuatang'])
-        flash("🚀 后台更新任务已启动！请稍后查看日志。", "success")
+        status, message = executor.submit('sehuatang', [])
+        flash(f"🚀 后台更新任务: {message}。请稍后查看日志。", "success" if status != 'skipped' else "error")
     except Exception as e:
         flash(f"启动失败: {e}", "error")
     return redirect(url_for('index'))
 
+@app.route('/api/task_results')
+def get_task_results():
+    """正在运行/排队的任务，以及最近完成的任务及各阶段的结构化结果"""
+    return jsonify({'results': list(executor.results), 'executor': executor.status(),
+                    'runner': run_task.get_runner().status()})
+
+@app.route('/api/job_runs')
+def get_job_runs():
+    """各站点数据库中最近的运行记录 (吞吐与耗时拆分)，按开始时间倒序合并"""
+    limit = request.args.get('limit', 100, type=int)
+    job_type = request.args.get('job_type') or None
+    runs = []
+    for db_file in sorted(glob.glob(os.path.join(DATABASE_DIR, "*.db"))):
+        try:
+            for run in database.get_job_runs(db_file, job_type, limit):
+                runs.append({**run, 'db': os.path.basename(db_file)})
+        except sqlite3.OperationalError:
+            # 尚未初始化 job_runs 表的数据库 (如 scheduler.db)
+            continue
+    runs.sort(key=lambda r: r['started_at'], reverse=True)
+    return jsonify({'runs': runs[:limit]})
+
+# ==========================================
+#         远程工作进程 API (scripts/remote_worker.py)
+# ==========================================
+# 设置了 MAGNETO_WORKER_TOKEN 时，工作进程需在 X-Worker-Token 头中携带相同的值
+WORKER_TOKEN = os.environ.get('MAGNETO_WORKER_TOKEN')
+
+def _work_request():
+    """校验令牌并读取请求中的站点配置，返回 (config, payload, 错误响应)"""
+    if WORKER_TOKEN and request.headers.get('X-Worker-Token') != WORKER_TOKEN:
+        return None, None, (jsonify({'error': '令牌无效'}), 403)
+    payload = request.get_json(silent=True) or {}
+    site = payload.get('site') or request.args.get('site')
+    config = work_queue.site_config(site) if site else None
+    if config is None:
+        return None, None, (jsonify({'error': f'站点配置不存在: {site}'}), 404)
+    return config, payload, None
+
+@app.route('/api/work/config')
+def work_config():
+    """工作进程启动时获取站点配置 (选择器、标签规则、浏览器设置等)"""
+    config, _, error = _work_request()
+    if error:
+        return error
+    return jsonify({'config': work_queue.worker_config(config), 'work_queue': work_queue.get_work_queue_config(config)})
+
+@app.route('/api/work/claim', methods=['POST'])
+def work_claim():
+    config, payload, error = _work_request()
+    if error:
+        return error
+    return jsonify(work_queue.claim(config, payload.get('worker') or request.remote_addr,
+                                    int(payload.get('limit') or 1), bool(payload.get('retry_failed'))))
+
+@app.route('/api/work/heartbeat', methods=['POST'])
+def work_heartbeat():
+    config, payload, error = _work_request()
+    if error:
+        return error
+    held = work_queue.heartbeat(config, payload.get('lease_id', ''))
+    if not held:
+        return jsonify({'held': 0, 'error': '租约已过期或已全部提交'}), 409
+    return jsonify({'held': held})
+
+@app.route('/api/work/submit', methods=['POST'])
+def work_submit():
+    config, payload, error = _work_request()
+    if error:
+        return error
+    results = payload.get('results') or []
+    if not payload.get('lease_id') or not all(isinstance(r, dict) and r.get('url') for r in results):
+        return jsonify({'error': '缺少 lease_id 或结果中缺少 url'}), 400
+    return jsonify({'results': work_queue.submit(config, payload['lease_id'], payload.get('worker') or request.remote_addr, results)})
+
+@app.route('/api/work/release', methods=['POST'])
+def work_release():
+    config, payload, error = _work_request()
+    if error:
+        return error
+    return jsonify({'released': work_queue.release(config, payload.get('lease_id', ''))})
+
+@app.route('/api/work/status')
+def work_status():
+    config, _, error = _work_request()
+    if error:
+        return error
+    return jsonify(work_queue.status(config))
+
 # ==========================================
 #           APScheduler (定时任务) API
 # ==========================================
@@ -201,7 +339,7 @@ def run_update():
 def get_jobs():
     """获取所有定时任务"""
     jobs = []
-    for job in scheduler.get_jobs():
+    for job in (scheduler.get_jobs() if scheduler else []):
         next_run = job.next_run_time.strftime('%Y-%m-%d %H:%M:%S') if job.next_run_time else '暂停'
         jobs.append({
             'id': job.id,
@@ -221,9 +359,8 @@ def add_job():
     site_name = request.form.get('param1') # Get param1 from form, save as site_name
     cron_exp = request.form.get('cron_expression') 
     
-    # 构造要执行的命令参数
-    # 基础命令: python run_task.py [task_type]
-    job_args = [sys.executable, 'run_task.py', task_type]
+    # 构造要执行的任务参数 (与 python run_task.py [task_type] 之后的命令行参数相同)
+    job_args = []
     job_name = f"Task: {task_type}"
 
     # 2. According to task type, parse specific parameters
@@ -241,6 +378,12 @@ def add_job():
         elif tag_val:
             job_args.extend(['--tag', tag_val])
             job_name += f" (Tag: {tag_val})"
+        elif date_val and '~' in date_val:
+            date_from, date_to = [d.strip() for d in date_val.split('~', 1)]
+            job_args.extend(['--date-from', date_from])
+            if date_to:
+                job_args.extend(['--date-to', date_to])
+            job_name += f" (Range: {date_val})"
         elif date_val and date_val != 'auto':
             job_args.extend(['--date', date_val])
             job_name += f" (Date: {date_val})"
@@ -255,10 +398,10 @@ def add_job():
         # --- FIX: Use site_name instead of param1 ---
         job_args.extend(['--site', site_name])
         if page_val:
-            if not page_val.startswith('-'):
-                job_args.extend(['--page', page_val])
-            else:
-                job_args.extend(page_val.split()) 
+            tokens = page_val.split()
+            if not tokens[0].startswith('-'):
+                tokens = ['--page'] + tokens
+            job_args.extend(tokens)
         job_name += f" ({site_name})"
 
     elif task_type == 'nyaa':
@@ -275,6 +418,10 @@ def add_job():
         job_args.append(site_name)
         job_name += f" ({site_name})"
 
+    elif task_type == 'run_all':
+        job_args.extend(run_all_form_args(request.form))
+        job_name += " (全部站点)"
+
     try:
         # 解析 cron 表达式
         if not cron_exp:
@@ -283,10 +430,11 @@ def add_job():
         minute, hour, day, month, week = cron_exp.split()
         job_id = f"job_{int(time.time())}"
         
-        scheduler.add_job(
+        get_scheduler().add_job(
             id=job_id,
-            func=subprocess.run,
-            args=[job_args],
+            # 只把任务提交给执行器，调度器线程立即返回；同站点重叠时按 scheduling.overlap_policy 处理
+            func=job_executor.run_scheduled_job,
+            args=[task_type, job_args],
             trigger='cron',
             minute=minute, hour=hour, day=day, month=month, day_of_week=week,
             name=job_name,
@@ -302,7 +450,7 @@ def add_job():
 def delete_job(job_id):
     """删除定时任务"""
     try:
-        scheduler.remove_job(job_id)
+        get_scheduler().remove_job(job_id)
         flash(f"任务 {job_id} 已删除", "success")
     except Exception as e:
         flash(f"删除失败: {str(e)}", "error")
@@ -345,7 +493,7 @@ def list_logs():
     for f in files:
         if f.endswith('.log'):
             html += f'<li><a href="/logs/{f}">{f}</a></li>'
-    html += "</ul><a href='/admin'>返回后台</a> <a href='/'>返回首页</a>"
+    html += "</ul><a href='/artifacts'>失败现场</a> <a href='/admin'>返回后台</a> <a href='/'>返回首页</a>"
     return html
 
 @app.route('/logs/<filename>')
@@ -353,6 +501,53 @@ def view_log(filename):
     # 渲染新的实时日志模板
     return render_template('log_viewer.html', filename=filename)
 
+# 失败现场 (process_details 保存的压缩源码/截图)，按 post_url 检索
+@app.route('/artifacts')
+def list_artifacts():
+    try:
+        available_dbs = sorted([f for f in os.listdir(DATABASE_DIR) if f.endswith('.db')])
+    except FileNotFoundError:
+        available_dbs = []
+    db_name = request.args.get('db') or (available_dbs[0] if available_dbs else None)
+    q = request.args.get('q', '').strip()
+    if not db_name or db_name not in available_dbs:
+        return "没有可用的数据库"
+    try:
+        rows = database.get_failure_artifacts(os.path.join(DATABASE_DIR, db_name), q or None)
+    except sqlite3.OperationalError:
+        rows = []
+
+    html = f"<h1>失败现场 - {escape(db_name)}</h1>"
+    html += "<form>数据库: <select name='db'>" + "".join(
+        f"<option {'selected' if d == db_name else ''}>{escape(d)}</option>" for d in available_dbs)
+    html += f"</select> post_url: <input name='q' value='{escape(q)}' size='60'> <button>查询</button></form>"
+    html += "<table border='1' cellpadding='4'><tr><th>时间</th><th>post_url</th><th>原因</th><th>源码</th><th>截图</th></tr>"
+    for row in rows:
+        links = []
+        for key, label in (('html_path', '源码'), ('screenshot_path', '截图')):
+            if row[key]:
+                links.append(f"<a href='{url_for('view_artifact', site=row['source'], rel_path=row[key])}'>{label}</a>")
+            else:
+                links.append('-' if key == 'screenshot_path' else '已清理')
+        html += (f"<tr><td>{escape(row['created_at'][:19])}</td><td><a href='{escape(row['post_url'])}'>{escape(row['post_url'])}</a></td>"
+                 f"<td>{escape(row['reason'] or '')}</td><td>{links[0]}</td><td>{links[1]}</td></tr>")
+    html += "</table><a href='/logs'>返回日志</a> <a href='/admin'>返回后台</a>"
+    return html
+
+@app.route('/artifacts/<site>/<path:rel_path>')
+def view_artifact(site, rel_path):
+    root = os.path.abspath(artifact_dir(site))
+    file_path = os.path.abspath(os.path.join(root, rel_path))
+    if not file_path.startswith(os.path.abspath(ARTIFACT_ROOT) + os.sep) or not file_path.startswith(root + os.sep):
+        return "非法路径", 400
+    if not os.path.exists(file_path):
+        return "文件已被清理", 404
+    if file_path.endswith('.html.gz'):
+        # 以纯文本返回失败页面源码，避免在后台域名下执行其中的脚本
+        with gzip.open(file_path, 'rb') as f:
+            return Response(f.read(), mimetype='text/plain; charset=utf-8')
+    return send_file(file_path, mimetype='image/png')
+
 def get_all_sources(conn):
     if not conn: return []
     try:
@@ -418,47 +613,9 @@ def index():
             all_tags = database.get_all_tags(db_path)
 
             # 构建查询
-            query = "SELECT * FROM media WHERE 1=1"
-            params = []
-            
-            if search_term:
-                if search_scope == 'title':
-                    query += " AND title LIKE ?"
-                    params.append(f"%{search_term}%")
-                elif search_scope == 'item_number':
-                    query += " AND item_number LIKE ?"
-                    params.append(f"%{search_term}%")
-                else:
-                    query += " AND (title LIKE ? OR item_number LIKE ?)"
-                    params.extend([f"%{search_term}%", f"%{search_term}%"])
-
-            if filter_source:
-                query += " AND source = ?"
-                params.append(filter_source)
-            
-            if filter_tag:
-                query += " AND id IN (SELECT media_id FROM media_tags JOIN tags ON tags.id = media_tags.tag_id WHERE tags.name = ?)"
-                params.append(filter_tag)
-
-            if filter_workflow_status:
-                query += " AND workflow_status = ?"
-                params.append(filter_workflow_status)
-
-            if start_date:
-                query += " AND date(publish_date) >= date(?)"
-                params.append(start_date)
-            if end_date:
-                query += " AND date(publish_date) <= date(?)"
-                params.append(end_date)
-
-            valid_sort_columns = ['publish_date', 'added_at', 'file_size', 'item_number', 'title', 'source', 'workflow_status']
-            if sort_by not in valid_sort_columns: sort_by = 'publish_date'
-            if sort_order.upper() not in ['ASC', 'DESC']: sort_order = 'DESC'
-            
-            if sort_by == 'file_size':
-                query += f" ORDER BY file_size_bytes {sort_order}"
-            else:
-                query += f" ORDER BY {sort_by} {sort_order}"
+            query, params, sort_by, sort_order = database.build_media_listing_query(
+                search_term, search_scope, filter_source, filter_tag, filter_workflow_status,
+                start_date, end_date, sort_by, sort_order)
             
             page = request.args.get('page', 1, type=int)
             # offset = (page - 1) * PER_PAGE
@@ -533,4 +690,11 @@ def batch_delete():
     return redirect(request.referrer or url_for('index'))
 
 if __name__ == '__main__':
+    # 放在这里而不是模块顶层: 预热工作进程 (spawn) 会重新导入本文件，不能在其中再启动一份调度器。
+    # 调试模式下重载器的父进程只监视文件，调度器与预热工作进程只在实际提供服务的子进程中启动，
+    # 否则两个进程各有一个调度器和执行器，每个定时任务会触发两次
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_scheduler().start()
+        migrate_legacy_jobs()
+        run_task.get_runner()
     app.run(debug=True, host='0.0.0.0', port=6246)
\ No newline at end of file
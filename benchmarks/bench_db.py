@@ -0,0 +1,271 @@
+"""
+数据库操作基准: 在合成数据库 (synth_data.py) 的副本上测量写入、重打标签、批量改状态
+以及首页各筛选/排序组合查询的单次延迟分位数 (p50/p90/p99)，并与 baselines/db-<行数>.json 比较。
+
+    python benchmarks/bench_db.py --rows 1000000                 # 首次运行会先生成合成库 (较慢)
+    python benchmarks/bench_db.py --rows 100000 --group listing --page 50
+    python benchmarks/bench_db.py --rows 100000 --update-baseline
+"""
+import argparse
+import hashlib
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from common import machine_info, save_results, load_baseline, save_baseline, compare_to_baseline
+from synth_data import SyntheticMediaGenerator, default_tag_rules, generate_db, synthetic_db_path
+
+import database
+from utils import parse_tags_from_title
+
+PER_PAGE = 100
+
+# 首页筛选组合: 名称 -> build_media_listing_query 的关键字参数 (值为 None 时从数据中取样)
+LISTING_FILTERS = {
+    'all': {},
+    'search_all': {'search_term': 'SSIS'},
+    'search_title': {'search_term': '温泉', 'search_scope': 'title'},
+    'search_item_number': {'search_term': 'IPX-1', 'search_scope': 'item_number'},
+    'source': {'source': 'javbee'},
+    'tag': {'tag': None},
+    'workflow_status': {'workflow_status': 'downloaded'},
+    'date_range': {'start_date': None, 'end_date': None},
+    'tag+source+date': {'tag': None, 'source': 'sech', 'start_date': None, 'end_date': None},
+}
+LISTING_SORTS = [(column, 'DESC') for column in database.MEDIA_SORT_COLUMNS] + [('publish_date', 'ASC')]
+
+def percentiles(samples):
+    """返回毫秒单位的 p50/p90/p99/max (最近秩法)"""
+    ordered = sorted(samples)
+    def pick(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))] * 1000
+    return {
+        'samples': len(ordered),
+        'p50_ms': round(pick(50), 3),
+        'p90_ms': round(pick(90), 3),
+        'p99_ms': round(pick(99), 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+class DbBench:
+    """所有写操作都在合成库的临时副本上进行，原始合成库保持不变，可重复使用"""
+    def __init__(self, source_db, ops, seed=7):
+        self.work_dir = tempfile.mkdtemp(prefix="magneto_bench_db_")
+        self.db_path = os.path.join(self.work_dir, "bench.db")
+        shutil.copy(source_db, self.db_path)
+        self.ops = ops
+        self.rng = random.Random(seed)
+        self.tag_rules = default_tag_rules()
+        self.generator = SyntheticMediaGenerator(self.tag_rules, seed=seed)
+        self.rows = database.get_total_count(self.db_path)
+        self.next_index = 10 ** 9  # 新写入记录的 post_url/info_hash 编号，避开合成数据
+        conn = sqlite3.connect(self.db_path)
+        self.max_id = conn.execute("SELECT MAX(id) FROM media").fetchone()[0] or 0
+        self.tags = [row[0] for row in conn.execute("SELECT name FROM tags ORDER BY name")]
+        self.dates = conn.execute("SELECT MIN(publish_date), MAX(publish_date) FROM media").fetchone()
+        conn.close()
+
+    def close(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _new_details(self, source):
+        row, tags = self.generator.record(self.next_index)
+        self.next_index += 1
+        info_hash = hashlib.sha1(f"bench-{self.next_index}".encode()).hexdigest()
+        details = {
+            'post_url': f"https://bench.invalid/{source}/{self.next_index}",
+            'title': row[4], 'date': row[5], 'size': row[6], 'item_number': row[8],
+            'magnet_link': f"magnet:?xt=urn:btih:{info_hash}", 'cover_image_url': row[10],
+        }
+        return details, tags
+
+    def _random_ids(self, count):
+        return [self.rng.randint(1, self.max_id) for _ in range(count)]
+
+    # --- 写入 ---
+    def bench_add_processed_post_with_tags(self):
+        samples = []
+        for _ in range(self.ops):
+            details, tags = self._new_details('javbee')
+            seconds, _ = timed(database.add_processed_post_with_tags, self.db_path, 'javbee', details, tags)
+            samples.append(seconds)
+        return samples
+
+    def bench_add_processed_posts_bulk(self, batch=100):
+        samples = []
+        for _ in range(max(1, self.ops // 10)):
+            records = [self._new_details('nyaa') for _ in range(batch)]
+            seconds, _ = timed(database.add_processed_posts_bulk, self.db_path, 'nyaa', records)
+            samples.append(seconds)
+        return samples
+
+    def bench_update_post_with_tags(self):
+        # 模拟 sech 流程: 先由 fetch_urls 写入 NEW 状态的 URL，再由 process_details 逐条补全
+        pending = [self._new_details('sech') for _ in range(self.ops)]
+        database.add_urls(self.db_path, [details['post_url'] for details, _ in pending], 'sech')
+        samples = []
+        for details, tags in pending:
+            seconds, _ = timed(database.update_post_with_tags, self.db_path, details['post_url'], 'sech', details, tags)
+            samples.append(seconds)
+        return samples
+
+    # --- 重打标签 ---
+    def bench_get_all_media_for_retag(self):
+        return [timed(database.get_all_media_for_retag, self.db_path)[0] for _ in range(3)]
+
+    def bench_retag_row(self):
+        """retag.py 对每条记录的处理: 解析标签 + update_tags_for_media_id (内部为 _execute_tag_update)"""
+        conn = sqlite3.connect(self.db_path)
+        ids = self._random_ids(self.ops)
+        titles = dict(conn.execute(f"SELECT id, title FROM media WHERE id IN ({', '.join('?' for _ in ids)})", ids).fetchall())
+        conn.close()
+        samples = []
+        for media_id, title in titles.items():
+            start = time.perf_counter()
+            database.update_tags_for_media_id(self.db_path, media_id, parse_tags_from_title(title, self.tag_rules))
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    def bench_execute_tag_update(self):
+        """单独测量 _execute_tag_update (不含连接开销)，在一个事务内连续执行"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        samples = []
+        for media_id in self._random_ids(self.ops):
+            tags = self.rng.sample(self.tags, min(len(self.tags), self.rng.randint(0, 3)))
+            seconds, _ = timed(database._execute_tag_update, cursor, media_id, tags)
+            samples.append(seconds)
+        conn.commit()
+        conn.close()
+        return samples
+
+    # --- 批量修改状态 ---
+    def bench_batch_update_workflow_status(self, batch=100):
+        samples = []
+        for i in range(max(1, self.ops // 10)):
+            ids = self._random_ids(batch)
+            status = 'downloaded' if i % 2 == 0 else 'pending'
+            samples.append(timed(database.batch_update_workflow_status, self.db_path, ids, status)[0])
+        return samples
+
+    # --- 首页查询 ---
+    def listing_filters(self):
+        """把 LISTING_FILTERS 中需要取样的值替换为数据中实际存在的值"""
+        min_date, max_date = (d[:10] if d else '' for d in self.dates)
+        filters = {}
+        for name, spec in LISTING_FILTERS.items():
+            kwargs = dict(spec)
+            if 'tag' in kwargs:
+                kwargs['tag'] = self.tags[len(self.tags) // 2] if self.tags else ''
+            if 'start_date' in kwargs:
+                # 取最近约 30 天，对应最常见的“看看这个月新增”场景
+                end = time.mktime(time.strptime(max_date, '%Y-%m-%d')) if max_date else time.time()
+                kwargs['start_date'] = time.strftime('%Y-%m-%d', time.localtime(end - 30 * 86400))
+                kwargs['end_date'] = max_date
+            filters[name] = kwargs
+        return filters
+
+    def bench_listing(self, filter_kwargs, sort_by, sort_order, page, repeat):
+        """与 app.index() 相同的两条查询: COUNT(*) 计算总页数 + 当前页 LIMIT/OFFSET"""
+        query, params, sort_by, sort_order = database.build_media_listing_query(
+            sort_by=sort_by, sort_order=sort_order, **filter_kwargs)
+        total_query = query.replace("SELECT *", "SELECT COUNT(*)")
+        page_query = f"{query} LIMIT {PER_PAGE} OFFSET {(page - 1) * PER_PAGE}"
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        samples = []
+        total = 0
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                total = conn.execute(total_query, params).fetchone()[0]
+                conn.execute(page_query, params).fetchall()
+                samples.append(time.perf_counter() - start)
+        finally:
+            conn.close()
+        return samples, total
+
+WRITE_CASES = [
+    ('ingest', 'add_processed_post_with_tags', DbBench.bench_add_processed_post_with_tags),
+    ('ingest', 'add_processed_posts_bulk[100]', DbBench.bench_add_processed_posts_bulk),
+    ('ingest', 'update_post_with_tags', DbBench.bench_update_post_with_tags),
+    ('retag', 'get_all_media_for_retag', DbBench.bench_get_all_media_for_retag),
+    ('retag', 'retag_row', DbBench.bench_retag_row),
+    ('retag', '_execute_tag_update', DbBench.bench_execute_tag_update),
+    ('status', 'batch_update_workflow_status[100]', DbBench.bench_batch_update_workflow_status),
+]
+
+def print_case(name, result, extra=""):
+    print(f"  {name:<48} p50 {result['p50_ms']:>9.3f} ms  p90 {result['p90_ms']:>9.3f} ms  "
+          f"p99 {result['p99_ms']:>9.3f} ms  (n={result['samples']}){extra}")
+
+def main():
+    parser = argparse.ArgumentParser(description="在合成数据库上测量各数据库操作与首页查询的延迟分位数。")
+    parser.add_argument("--rows", type=int, default=100000, help="合成库行数 (默认: 100000)，不存在时自动生成")
+    parser.add_argument("--db", help="直接使用已有的数据库文件 (只读取，写操作在副本上进行)")
+    parser.add_argument("--ops", type=int, default=200, help="每个写操作的执行次数 (默认: 200)")
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询组合的执行次数 (默认: 5)")
+    parser.add_argument("--page", type=int, default=1, help="首页查询的页码，测试深分页时调大 (默认: 1)")
+    parser.add_argument("--group", action="append", choices=["ingest", "retag", "status", "listing"], help="只运行指定分组，可重复指定")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="允许的 p50 延迟增长比例 (默认: 0.5)")
+    parser.add_argument("--output", help="结果 JSON 路径 (默认: benchmarks/results/db-<时间>.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="将本次结果保存为新的基线")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    source_db = args.db or synthetic_db_path(args.rows)
+    if not args.db:
+        generate_db(source_db, args.rows, progress=False)
+
+    groups = args.group or ["ingest", "retag", "status", "listing"]
+    bench = DbBench(source_db, args.ops)
+    baseline_name = f"db-{bench.rows}"
+    results = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'machine': machine_info(),
+               'rows': bench.rows, 'ops': args.ops, 'page': args.page, 'cases': {}}
+    print(f"数据库: {source_db} ({bench.rows} 行, {os.path.getsize(source_db) / 1024 / 1024:.1f} MB)")
+    try:
+        # 查询先于写操作执行，保证各次运行面对的数据完全相同
+        if "listing" in groups:
+            print(f"[listing] 第 {args.page} 页, 每页 {PER_PAGE} 条")
+            for filter_name, kwargs in bench.listing_filters().items():
+                for sort_by, sort_order in LISTING_SORTS:
+                    name = f"listing:{filter_name}:{sort_by}_{sort_order.lower()}"
+                    samples, total = bench.bench_listing(kwargs, sort_by, sort_order, args.page, args.repeat)
+                    result = {**percentiles(samples), 'matched': total}
+                    results['cases'][name] = result
+                    print_case(name, result, f"  命中 {total}")
+        for group, name, func in WRITE_CASES:
+            if group not in groups:
+                continue
+            result = percentiles(func(bench))
+            results['cases'][f"{group}:{name}"] = result
+            print_case(f"{group}:{name}", result)
+    finally:
+        bench.close()
+
+    print(f"结果已保存: {save_results('db', results, args.output)}")
+    if args.update_baseline:
+        print(f"基线已更新: {save_baseline(baseline_name, results)}")
+        return 0
+
+    baseline = load_baseline(baseline_name)
+    if not baseline:
+        print(f"没有 {bench.rows} 行规模的基线，使用 --update-baseline 创建。")
+        return 0
+    lines, regressed = compare_to_baseline(results, baseline, 'p50_ms', args.tolerance, higher_is_better=False)
+    print(f"与基线 ({baseline.get('created_at')}) 比较 p50 延迟，容差 {args.tolerance:.0%}:")
+    print("\n".join(lines))
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
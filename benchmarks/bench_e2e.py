@@ -0,0 +1,162 @@
+"""
+端到端抓取压测: 启动本地替身站点，使用 benchmarks/standin_configs/ 中的配置运行真实的抓取脚本，
+统计每秒页面数/条目数以及替身站点看到的请求分布 (含 429/500)。
+
+    python benchmarks/bench_e2e.py --target nyaa --target javbee --pages 20 --latency-ms 100
+    python benchmarks/bench_e2e.py --target sech --pages 5          # 需要 Chrome/chromedriver
+    python benchmarks/bench_e2e.py --throttle-rps 5 --proxies 3 --proxy-rate 4   # 经 3 个替身代理，各自限速
+    python benchmarks/bench_e2e.py --target sech --workers 3        # 详情页由 3 个 remote_worker 进程经 app 的 API 领取处理
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from common import BENCH_DIR, PROJECT_ROOT, machine_info, save_results
+from standin_server import create_server, add_server_arguments, server_kwargs
+from standin_proxy import start_proxies
+
+import database
+from utils import load_config
+
+STANDIN_CONFIG_DIR = os.path.join(BENCH_DIR, "standin_configs")
+STANDIN_DEFAULT_URL = "http://127.0.0.1:8765"
+
+def prepare_config_dir(server_base, proxy_urls=None, proxy_rate=None):
+    """复制替身配置到临时目录，并把其中的 base_url 指向实际监听的地址；给出 proxy_urls 时追加 proxy_pool 段"""
+    config_dir = tempfile.mkdtemp(prefix="magneto_standin_")
+    proxy_block = ""
+    if proxy_urls:
+        proxy_block = f"\nproxy_pool:\n  proxies: {json.dumps(proxy_urls)}\n"
+        if proxy_rate:
+            proxy_block += f"  rate_per_proxy: {proxy_rate}\n"
+    for path in glob.glob(os.path.join(STANDIN_CONFIG_DIR, "*.yaml")):
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        with open(os.path.join(config_dir, os.path.basename(path)), 'w', encoding='utf-8') as f:
+            f.write(text.replace(STANDIN_DEFAULT_URL, server_base) + proxy_block)
+    os.environ["MAGNETO_CONFIG_DIR"] = config_dir
+    return config_dir
+
+def _script(name):
+    return os.path.join(PROJECT_ROOT, "scripts", name)
+
+def target_commands(target, args):
+    """每个目标对应的 (站点, [步骤...])，步骤按顺序执行，每个步骤是同时运行的一组命令"""
+    pipeline = ["--pipeline"] if args.pipeline else []
+    if target == "nyaa":
+        return "nyaa", [[[_script("scrape_nyaa.py"), "--site", "nyaa", "--start-page", "1", "--end-page", "auto"] + pipeline]]
+    if target == "javbee":
+        return "javbee", [[[_script("scrape_javbee.py"), "--site", "javbee", "--date", args.javbee_date] + pipeline]]
+    if target == "sech":
+        fetch = [_script("fetch_urls.py"), "--site", "sech", "--page", f"1-{args.pages}"]
+        if args.workers:
+            return "sech", [[fetch], [[_script("remote_worker.py"), "--site", "sech", "--server", args.work_api, "--worker", f"bench-{i}"]
+                                      for i in range(args.workers)]]
+        return "sech", [[fetch], [[_script("process_details.py"), "--site", "sech"]]]
+    raise ValueError(f"未知目标: {target}")
+
+def start_work_api(host, port):
+    """在后台线程中提供 app.py 的远程工作进程 API (只用到 /api/work/*，不启动调度器)"""
+    from werkzeug.serving import make_server
+    sys.path.insert(0, PROJECT_ROOT)
+    import app
+    server = make_server(host, port, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="work-api", daemon=True).start()
+    return server
+
+def _server_call(base, path, method="GET"):
+    request = urllib.request.Request(f"{base}{path}", method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+def run_target(target, args, server_base):
+    site, commands = target_commands(target, args)
+    db_path = load_config(site)['database_file']
+    if os.path.exists(db_path) and not args.keep_db:
+        os.remove(db_path)
+
+    _server_call(server_base, "/__reset", "POST")
+    env = dict(os.environ)
+    start = time.time()
+    steps = []
+    for group in commands:
+        step_start = time.time()
+        running = [subprocess.Popen([sys.executable] + cmd, cwd=PROJECT_ROOT, env=env,
+                                    stdout=None if args.verbose else subprocess.DEVNULL,
+                                    stderr=None if args.verbose else subprocess.DEVNULL) for cmd in group]
+        for cmd, process in zip(group, running):
+            steps.append({'script': os.path.basename(cmd[0]), 'returncode': process.wait(),
+                          'seconds': round(time.time() - step_start, 3)})
+    duration = time.time() - start
+    server_stats = _server_call(server_base, "/__stats")
+
+    items = database.get_total_count(db_path) if os.path.exists(db_path) else 0
+    ok = server_stats.get('ok', {})
+    pages = ok.get('list', 0) + ok.get('detail', 0)
+    return {
+        'site': site,
+        'steps': steps,
+        'seconds': round(duration, 3),
+        'pages': pages,
+        'items_in_db': items,
+        'pages_per_sec': round(pages / duration, 2) if duration else 0,
+        'items_per_sec': round(items / duration, 2) if duration else 0,
+        'server': server_stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="使用本地替身站点对抓取脚本做端到端压测。")
+    parser.add_argument("--target", action="append", choices=["nyaa", "javbee", "sech"], help="压测目标，可重复指定 (默认: nyaa, javbee)")
+    parser.add_argument("--javbee-date", default="2024-10-19", help="javbee 目标抓取的日期")
+    parser.add_argument("--pipeline", action="store_true", help="nyaa/javbee 使用流水线模式")
+    parser.add_argument("--keep-db", action="store_true", help="保留上次的替身数据库 (测试增量/重复检测路径)")
+    parser.add_argument("--verbose", action="store_true", help="显示脚本输出")
+    parser.add_argument("--output", help="结果 JSON 路径 (默认: benchmarks/results/e2e-<时间>.json)")
+    parser.add_argument("--proxies", type=int, default=0, help="经多少个替身代理抓取 (端口从 --port + 1 起，默认: 不使用代理)")
+    parser.add_argument("--proxy-rate", type=float, help="每个代理的请求数/秒 (proxy_pool.rate_per_proxy)")
+    parser.add_argument("--workers", type=int, default=0, help="sech 的详情页改由多少个 remote_worker 进程处理 (默认: 0，使用 process_details)")
+    parser.add_argument("--work-api-port", type=int, default=8799, help="--workers 时远程工作进程 API 的端口 (默认: 8799)")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = create_server(**server_kwargs(args))
+    threading.Thread(target=server.serve_forever, name="standin-server", daemon=True).start()
+    server_base = f"http://{args.host}:{args.port}"
+    proxies = start_proxies(args.host, args.port + 1, args.proxies)
+    proxy_urls = [f"http://{args.host}:{p.server_address[1]}" for p in proxies]
+    config_dir = prepare_config_dir(server_base, proxy_urls, args.proxy_rate)
+    work_api = start_work_api(args.host, args.work_api_port) if args.workers else None
+    args.work_api = f"http://{args.host}:{args.work_api_port}"
+
+    results = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'machine': machine_info(),
+               'server': server_kwargs(args), 'proxies': {'count': args.proxies, 'rate': args.proxy_rate},
+               'workers': args.workers, 'cases': {}}
+    try:
+        for target in args.target or ["nyaa", "javbee"]:
+            result = run_target(target, args, server_base)
+            results['cases'][target] = result
+            failed = [s['script'] for s in result['steps'] if s['returncode'] != 0]
+            print(f"{target}: {result['pages']} 页 / {result['seconds']:.2f} s = {result['pages_per_sec']:.1f} 页/秒, "
+                  f"入库 {result['items_in_db']} 条 ({result['items_per_sec']:.1f} 条/秒), 请求状态 {result['server']['status']}"
+                  f"{', 失败脚本: ' + ', '.join(failed) if failed else ''}")
+    finally:
+        if work_api:
+            work_api.shutdown()
+        for proxy in proxies:
+            proxy.shutdown()
+            proxy.server_close()
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(config_dir, ignore_errors=True)
+    print(f"结果已保存: {save_results('e2e', results, args.output)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+启动耗时基准: 在全新的解释器中导入各入口模块，报告导入耗时的中位数，以及是否加载了 selenium / APScheduler，
+并与 baselines/imports.json 比较。
+
+    python benchmarks/bench_imports.py                    # 运行并与基线比较，退化超出容差时退出码为 1
+    python benchmarks/bench_imports.py --detail scrape_nyaa  # 额外列出该模块导入耗时最多的依赖 (python -X importtime)
+    python benchmarks/bench_imports.py --update-baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import PROJECT_ROOT, machine_info, save_results, load_baseline, save_baseline, compare_to_baseline
+
+SCRIPTS_DIR = os.path.join(PROJECT_ROOT, "scripts")
+
+# 各入口对应的模块: 命令行脚本、预热工作进程执行的阶段模块，以及网页端
+ENTRY_MODULES = ['scrape_nyaa', 'scrape_javbee', 'retag', 'import_torrents', 'fetch_urls', 'process_details',
+                 'task_runner', 'run_task', 'app']
+
+# 导入后检查是否已被加载的重量级依赖
+HEAVY_PACKAGES = ['selenium', 'apscheduler', 'sqlalchemy', 'bs4', 'requests', 'yaml']
+
+PROBE = """
+import json, sys, time
+sys.path[:0] = [{scripts!r}, {root!r}]
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'modules': len(sys.modules),
+                  'loaded': [p for p in {heavy!r} if p in sys.modules]}}))
+"""
+
+def _run_python(code, extra_args=()):
+    return subprocess.run([sys.executable, *extra_args, "-c", code], cwd=PROJECT_ROOT,
+                          capture_output=True, text=True, check=True)
+
+def measure_module(module, repeat):
+    """每次都启动新的解释器 (模块缓存为空，.pyc 已生成)，返回中位数等统计"""
+    code = PROBE.format(scripts=SCRIPTS_DIR, root=PROJECT_ROOT, module=module, heavy=HEAVY_PACKAGES)
+    _run_python(code)  # 预热: 生成 .pyc，并让文件系统缓存就绪
+    samples = []
+    for _ in range(repeat):
+        # 输出的最后一行是测量结果，之前可能有被导入模块的打印
+        samples.append(json.loads(_run_python(code).stdout.strip().splitlines()[-1]))
+    seconds = [s['seconds'] for s in samples]
+    return {
+        'median_ms': statistics.median(seconds) * 1000,
+        'min_ms': min(seconds) * 1000,
+        'modules': samples[-1]['modules'],
+        'loaded': samples[-1]['loaded'],
+    }
+
+def importtime_detail(module, top):
+    """python -X importtime 的输出按累计耗时排序，返回 [(累计微秒, 包名)]"""
+    code = f"import sys; sys.path[:0] = [{SCRIPTS_DIR!r}, {PROJECT_ROOT!r}]; import {module}"
+    rows = []
+    for line in _run_python(code, ["-X", "importtime"]).stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), len(name) - len(name.lstrip()), name.strip()))
+    # importtime 先输出子模块再输出父模块: 取 module 那一行之前、缩进恰好深一层的行，即它的直接依赖，
+    # 避免同一耗时被父包和子包重复计算
+    index = max(i for i, row in enumerate(rows) if row[2] == module)
+    module_indent = rows[index][1]
+    direct = []
+    for us, indent, name in reversed(rows[:index]):
+        if indent <= module_indent:
+            break
+        if indent == module_indent + 2:
+            direct.append((us, name))
+    return sorted(direct, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="测量各入口模块在全新解释器中的导入耗时。")
+    parser.add_argument("--repeat", type=int, default=7, help="每个模块启动解释器的次数，取中位数 (默认: 7)")
+    parser.add_argument("--module", action="append", help="只测量指定模块，可重复指定 (默认: 全部入口)")
+    parser.add_argument("--detail", metavar="MODULE", help="列出该模块导入耗时最多的依赖")
+    parser.add_argument("--top", type=int, default=15, help="--detail 列出的条数 (默认: 15)")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="允许的导入耗时增加比例 (默认: 0.3)")
+    parser.add_argument("--output", help="结果 JSON 路径 (默认: benchmarks/results/imports-<时间>.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="将本次结果保存为新的基线")
+    args = parser.parse_args()
+
+    if args.detail:
+        print(f"{args.detail} 导入耗时最多的依赖 (累计):")
+        for us, name in importtime_detail(args.detail, args.top):
+            print(f"  {us / 1000:8.1f} ms  {name}")
+        return 0
+
+    results = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'machine': machine_info(), 'repeat': args.repeat, 'cases': {}}
+    for module in args.module or ENTRY_MODULES:
+        try:
+            result = measure_module(module, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"{module}: 导入失败\n{e.stderr.strip().splitlines()[-1] if e.stderr.strip() else ''}")
+            continue
+        results['cases'][module] = result
+        print(f"{module:16s} {result['median_ms']:7.1f} ms (最快 {result['min_ms']:.1f} ms), "
+              f"{result['modules']} 个模块, 已加载: {', '.join(result['loaded']) or '-'}")
+
+    print(f"结果已保存: {save_results('imports', results, args.output)}")
+    if args.update_baseline:
+        print(f"基线已更新: {save_baseline('imports', results)}")
+        return 0
+
+    baseline = load_baseline('imports')
+    if not baseline:
+        print("没有基线，使用 --update-baseline 创建。")
+        return 0
+    lines, regressed = compare_to_baseline(results, baseline, 'median_ms', args.tolerance, higher_is_better=False)
+    print(f"与基线 ({baseline.get('created_at')}) 比较，容差 {args.tolerance:.0%}:")
+    print("\n".join(lines))
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+解析性能基准: 在 benchmarks/fixtures/ 下的页面样本上运行各脚本的解析函数，
+报告每秒处理条数、各字段选择器耗时和内存峰值，并与 baselines/parse.json 比较。
+
+    python benchmarks/bench_parse.py                  # 运行并与基线比较，退化超出容差时退出码为 1
+    python benchmarks/bench_parse.py --update-baseline
+"""
+import argparse
+import glob
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+
+from common import BENCH_DIR, machine_info, save_results, load_baseline, save_baseline, compare_to_baseline
+
+from bs4 import BeautifulSoup
+
+from utils import load_config, parse_tags_from_title
+
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+def _read_fixtures(pattern):
+    paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, pattern)))
+    if not paths:
+        raise FileNotFoundError(f"没有找到样本页面: {pattern}")
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+class ParseCase(ABC):
+    """
+    一个基准项。子类实现:
+      - prepare(): 读取样本，返回函数输入列表 (在计时之外执行)
+      - run(inputs): 调用被测函数处理全部输入，返回处理的条数
+      - field_selectors: {字段名: CSS 选择器}，以及 field_scopes(inputs) 返回在其上执行选择器的元素
+    """
+    name = None
+    site = None
+    field_selectors = {}
+
+    def __init__(self):
+        self.config = load_config(self.site)
+
+    @abstractmethod
+    def prepare(self):
+        pass
+
+    @abstractmethod
+    def run(self, inputs):
+        pass
+
+    @abstractmethod
+    def field_scopes(self, inputs):
+        pass
+
+    def titles(self, inputs):
+        return []
+
+class ExtractUniqueUrlsCase(ParseCase):
+    name = "fetch_urls.extract_unique_urls"
+    site = "sech"
+
+    def __init__(self):
+        super().__init__()
+        import fetch_urls
+        self.func = fetch_urls.extract_unique_urls
+        self.selectors = self.config['selectors']['fetch_urls']
+        self.field_selectors = {k: self.selectors[k] for k in ('thread_list_item', 'max_page_link', 'max_page_span')}
+
+    def prepare(self):
+        return _read_fixtures("sech/forum_list_*.html")
+
+    def run(self, inputs):
+        return sum(len(self.func(html, self.config['base_url'], self.selectors)) for html in inputs)
+
+    def field_scopes(self, inputs):
+        return [BeautifulSoup(html, 'html.parser') for html in inputs]
+
+class ExtractDataCase(ParseCase):
+    name = "process_details.extract_data"
+    site = "sech"
+
+    def __init__(self):
+        super().__init__()
+        import process_details
+        self.func = process_details.extract_data
+        self.selectors = self.config['selectors']['process_details']
+        self.field_selectors = {k: self.selectors[k] for k in ('publish_time', 'meta_keywords', 'magnet_link', 'cover_image', 'post_content_container')}
+
+    def prepare(self):
+        return _read_fixtures("sech/thread_*.html")
+
+    def run(self, inputs):
+        rows = 0
+        for i, html in enumerate(inputs):
+            details, _ = self.func(html, f"{self.config['base_url']}/thread-{i}-1-1.html", self.selectors,
+                                   self.config['base_url'], self.config.get('tag_rules', {}))
+            rows += 1 if details else 0
+        return rows
+
+    def field_scopes(self, inputs):
+        return [BeautifulSoup(html, 'html.parser') for html in inputs]
+
+    def titles(self, inputs):
+        return [soup.select_one(self.selectors['meta_keywords']).get('content', '') for soup in self.field_scopes(inputs)]
+
+class NyaaExtractItemInfoCase(ParseCase):
+    name = "NyaaScraper.extract_item_info"
+    site = "offkab"
+
+    def __init__(self):
+        super().__init__()
+        from scrape_nyaa import NyaaScraper
+        self.scraper = NyaaScraper(self.config)
+        selectors = self.config['selectors']
+        self.field_selectors = {k: selectors[k] for k in ('title', 'post_url', 'magnet_link', 'file_size', 'publish_date')}
+
+    def prepare(self):
+        # 整页解析与行选择不属于被测函数，放在计时之外
+        rows = []
+        for html in _read_fixtures("nyaa/list_*.html"):
+            rows.extend(BeautifulSoup(html, 'html.parser').select(self.config['selectors']['item_row']))
+        return rows
+
+    def run(self, inputs):
+        for row in inputs:
+            self.scraper.extract_item_info(row)
+        return len(inputs)
+
+    def field_scopes(self, inputs):
+        return inputs
+
+    def titles(self, inputs):
+        return [row.select_one(self.field_selectors['title']).get_text(strip=True) for row in inputs]
+
+class JavbeeExtractTorrentInfoCase(ParseCase):
+    name = "JavbeeDownloader.extract_torrent_info"
+    site = "javbee"
+
+    def __init__(self):
+        super().__init__()
+        from scrape_javbee import JavbeeDownloader
+        self.downloader = JavbeeDownloader(self.config)
+        selectors = self.config['selectors']
+        self.field_selectors = {k: selectors[k] for k in ('title_link', 'size', 'date', 'magnet', 'torrent', 'image')}
+
+    def prepare(self):
+        cards = []
+        for html in _read_fixtures("javbee/date_*.html"):
+            cards.extend(BeautifulSoup(html, 'html.parser').select(self.config['selectors']['card']))
+        return cards
+
+    def run(self, inputs):
+        for card in inputs:
+            self.downloader.extract_torrent_info(card, self.downloader.tag_rules)
+        return len(inputs)
+
+    def field_scopes(self, inputs):
+        return inputs
+
+    def titles(self, inputs):
+        return [card.select_one(self.field_selectors['title_link']).get_text(strip=True) for card in inputs]
+
+CASES = [ExtractUniqueUrlsCase, ExtractDataCase, NyaaExtractItemInfoCase, JavbeeExtractTorrentInfoCase]
+
+def time_fields(case, inputs, repeat):
+    """各字段选择器 (及整页解析、标签匹配) 每次调用的平均耗时，单位微秒"""
+    fields = {}
+    if isinstance(inputs[0], str):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for html in inputs:
+                BeautifulSoup(html, 'html.parser')
+        fields['<html.parser>'] = (time.perf_counter() - start) / (repeat * len(inputs)) * 1e6
+    scopes = case.field_scopes(inputs)
+    for field, selector in case.field_selectors.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for scope in scopes:
+                scope.select_one(selector)
+        fields[field] = (time.perf_counter() - start) / (repeat * len(scopes)) * 1e6
+    titles = case.titles(inputs)
+    if titles:
+        tag_rules = case.config.get('tag_rules', {})
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for title in titles:
+                parse_tags_from_title(title, tag_rules)
+        fields['<tags>'] = (time.perf_counter() - start) / (repeat * len(titles)) * 1e6
+    return {k: round(v, 2) for k, v in fields.items()}
+
+def run_case(case_cls, repeat, min_time=0.2):
+    case = case_cls()
+    inputs = case.prepare()
+    rows = case.run(inputs)
+
+    # 每个样本至少循环 min_time 秒，减少小样本集上的计时噪声
+    start = time.perf_counter()
+    loops = 1
+    while time.perf_counter() - start < min_time:
+        case.run(inputs)
+        loops += 1
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            case.run(inputs)
+        samples.append((time.perf_counter() - start) / loops)
+
+    # 内存单独测一轮，tracemalloc 会显著拖慢执行
+    tracemalloc.start()
+    case.run(inputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(samples)
+    return {
+        'inputs': len(inputs),
+        'rows': rows,
+        'loops': loops,
+        'seconds_best': round(best, 6),
+        'seconds_median': round(statistics.median(samples), 6),
+        # 吞吐量取最快样本 (受其他进程干扰最小)
+        'rows_per_sec': round(rows / best, 2) if best else 0,
+        'peak_memory_kb': round(peak / 1024, 1),
+        'fields_us': time_fields(case, inputs, repeat),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="在样本页面上测量解析函数的吞吐量、字段耗时与内存。")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取中位数 (默认: 5)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每个样本的最短计时 (秒)，不足时循环执行 (默认: 0.2)")
+    parser.add_argument("--case", action="append", help="只运行名称包含该字符串的基准项，可重复指定")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许的吞吐量下降比例 (默认: 0.25)")
+    parser.add_argument("--output", help="结果 JSON 路径 (默认: benchmarks/results/parse-<时间>.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="将本次结果保存为新的基线")
+    args = parser.parse_args()
+
+    # 被测函数每条都会输出 INFO 日志，基准运行时屏蔽，只保留错误
+    logging.basicConfig(level=logging.ERROR, format="[%(levelname)s] %(message)s")
+    logging.disable(logging.WARNING)
+
+    cases = [c for c in CASES if not args.case or any(s in c.name for s in args.case)]
+    results = {'created_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'machine': machine_info(), 'repeat': args.repeat, 'cases': {}}
+    for case_cls in cases:
+        result = run_case(case_cls, args.repeat, args.min_time)
+        results['cases'][case_cls.name] = result
+        fields = ", ".join(f"{k} {v:.0f}µs" for k, v in result['fields_us'].items())
+        print(f"{case_cls.name}: {result['rows']} 条 / {result['seconds_best'] * 1000:.1f} ms = {result['rows_per_sec']:.0f} 条/秒, "
+              f"内存峰值 {result['peak_memory_kb']:.0f} KB\n    字段: {fields}")
+
+    print(f"结果已保存: {save_results('parse', results, args.output)}")
+    if args.update_baseline:
+        print(f"基线已更新: {save_baseline('parse', results)}")
+        return 0
+
+    baseline = load_baseline('parse')
+    if not baseline:
+        print("没有基线，使用 --update-baseline 创建。")
+        return 0
+    lines, regressed = compare_to_baseline(results, baseline, 'rows_per_sec', args.tolerance)
+    print(f"与基线 ({baseline.get('created_at')}) 比较，容差 {args.tolerance:.0%}:")
+    print("\n".join(lines))
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import json
+import os
+import platform
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+# 让基准脚本可以直接 import scripts/ 下的模块
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "scripts"))
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def save_results(name, results, output=None):
+    """写入 results/<name>-<时间戳>.json (或指定路径)，返回文件路径"""
+    path = output or os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return path
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+def load_baseline(name):
+    try:
+        with open(baseline_path(name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_baseline(name, results):
+    return save_results(name, results, baseline_path(name))
+
+def compare_to_baseline(results, baseline, metric, tolerance, higher_is_better=True):
+    """
+    按 cases[*][metric] 与基线比较，返回 (行列表, 是否存在超出容差的退化)。
+    higher_is_better=False 时 (如延迟) 当前值超过基线 (1 + tolerance) 倍即视为退化。
+    """
+    lines = []
+    regressed = False
+    if baseline.get('machine') != results.get('machine'):
+        lines.append("注意: 基线来自不同的机器/Python 版本，比较结果仅供参考。")
+    for case, current in results['cases'].items():
+        base = baseline.get('cases', {}).get(case)
+        if not base or not base.get(metric):
+            lines.append(f"  {case}: 基线中没有该项，跳过")
+            continue
+        ratio = current[metric] / base[metric]
+        bad = ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+        regressed = regressed or bad
+        lines.append(f"  {'❌' if bad else '✅'} {case}: {current[metric]:.1f} vs 基线 {base[metric]:.1f} ({(ratio - 1) * 100:+.1f}%)")
+    return lines, regressed
@@ -0,0 +1,126 @@
+"""
+本地替身代理: 转发 HTTP 请求 (绝对 URI 形式)，并在转发时加上 X-Forwarded-For 表示各自的“出口 IP”，
+替身站点按该地址分别限流，用于验证代理池的吞吐随代理数增加、以及故障代理的剔除与恢复。
+
+    python benchmarks/standin_proxy.py --port 8801 --count 3            # 8801-8803 三个代理
+    python benchmarks/standin_proxy.py --port 8801 --count 2 --fail 8802 # 8802 对所有请求返回 502
+
+直接请求代理自身的 GET /__stats 返回转发统计，POST /__fail 与 /__recover 切换故障模式。
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-connection', 'proxy-authorization', 'te', 'trailers',
+              'transfer-encoding', 'upgrade'}
+
+class StandinProxy(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, exit_ip, latency_ms=0, failing=False):
+        super().__init__(address, StandinProxyHandler)
+        self.exit_ip = exit_ip
+        self.latency_ms = latency_ms
+        self.failing = failing
+        self.lock = threading.Lock()
+        self.stats = {'forwarded': 0, 'failed': 0}
+
+    def record(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+class StandinProxyHandler(BaseHTTPRequestHandler):
+    server_version = "MagnetoStandinProxy/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="text/plain; charset=utf-8"):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path in ('/__fail', '/__recover'):
+            self.server.failing = self.path == '/__fail'
+            return self._send(200, json.dumps({'failing': self.server.failing}), "application/json")
+        self._send(405, "only GET is proxied")
+
+    def do_GET(self):
+        if self.path == '/__stats':
+            with self.server.lock:
+                stats = dict(self.server.stats, failing=self.server.failing, exit_ip=self.server.exit_ip)
+            return self._send(200, json.dumps(stats), "application/json")
+        if self.server.failing:
+            self.server.record('failed')
+            return self._send(502, "Bad Gateway (standin proxy failing)")
+        target = urlsplit(self.path)
+        if not target.hostname:
+            return self._send(400, "absolute URI required")
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_BY_HOP}
+        headers['X-Forwarded-For'] = self.server.exit_ip
+        path = target.path + (f"?{target.query}" if target.query else "")
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        try:
+            conn.request("GET", path or "/", headers=headers)
+            upstream = conn.getresponse()
+            body = upstream.read()
+        except OSError as e:
+            self.server.record('failed')
+            return self._send(502, f"upstream error: {e}")
+        finally:
+            conn.close()
+        self.server.record('forwarded')
+        self.send_response(upstream.status)
+        for key, value in upstream.getheaders():
+            if key.lower() not in HOP_BY_HOP and key.lower() != 'content-length':
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def create_proxy(host="127.0.0.1", port=8801, exit_ip=None, latency_ms=0, failing=False):
+    return StandinProxy((host, port), exit_ip or f"10.0.0.{port % 250 + 1}", latency_ms, failing)
+
+def start_proxies(host, first_port, count, latency_ms=0, failing_ports=()):
+    """在后台线程中启动 count 个代理，返回代理对象列表"""
+    proxies = []
+    for port in range(first_port, first_port + count):
+        proxy = create_proxy(host, port, latency_ms=latency_ms, failing=port in failing_ports)
+        threading.Thread(target=proxy.serve_forever, name=f"standin-proxy-{port}", daemon=True).start()
+        proxies.append(proxy)
+    return proxies
+
+def main():
+    parser = argparse.ArgumentParser(description="本地替身代理，用于测试代理池。")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8801, help="第一个代理的端口 (默认: 8801)")
+    parser.add_argument("--count", type=int, default=1, help="代理个数，端口依次递增 (默认: 1)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="每次转发额外的延迟 (毫秒)")
+    parser.add_argument("--fail", type=int, action="append", default=[], help="启动即处于故障模式的代理端口，可重复指定")
+    args = parser.parse_args()
+    proxies = start_proxies(args.host, args.port, args.count, args.latency_ms, set(args.fail))
+    for proxy in proxies:
+        port = proxy.server_address[1]
+        print(f"替身代理已启动: http://{args.host}:{port} (出口 {proxy.exit_ip}{', 故障模式' if proxy.failing else ''})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proxy in proxies:
+            proxy.shutdown()
+            proxy.server_close()
+
+if __name__ == "__main__":
+    main()
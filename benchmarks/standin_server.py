@@ -0,0 +1,335 @@
+"""
+本地替身站点: 按需生成 (或回放 benchmarks/fixtures/ 中录制的) 论坛列表/帖子详情、nyaa 列表、
+javbee 卡片页和 .torrent 文件，可配置延迟、错误率、429 限流和分页深度，用于端到端压测抓取脚本。
+
+    python benchmarks/standin_server.py --port 8765 --pages 20 --latency-ms 150 --error-rate 0.02 --throttle-rps 20
+
+站点配置的 base_url 指向该服务即可 (见 benchmarks/standin_configs/，配合 MAGNETO_CONFIG_DIR 使用):
+    sech (Discuz):  http://127.0.0.1:8765              /forum.php?mod=forumdisplay&fid=103&page=N, /thread-<tid>-1-1.html
+    nyaa:           http://127.0.0.1:8765/nyaa         ?p=N, ?page=rss (与第 1 页相同的条目)
+    javbee:         http://127.0.0.1:8765              /date/<day>?page=N, /tag/<x>, /search/<x>, /download/<hash>.torrent
+统计信息: GET /__stats (JSON)，POST /__reset 清零。
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from email.utils import formatdate
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+
+import bencodepy
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+STUDIOS = ['SSIS', 'IPZZ', 'MIDV', 'STARS', 'ABF', 'JUR', 'SONE', 'PRED', 'FC2-PPV', 'HEYZO', 'CAWD', 'MIAA', 'DASS', 'SDDE', 'HMN', 'NACR']
+WORDS = ['新人', '专属', '巨乳', '人妻', '中文字幕', '无码流出', '高清', '4K', 'FHDC', 'Uncensored', '1080p', 'AI破解', 'VR', '完整版', 'Leaked', 'BluRay']
+
+# 最新内容的 id 起点，第 1 页最新，往后递减
+NEWEST_ID = 2_600_000
+
+def _rng(*key):
+    return random.Random(":".join(map(str, key)))
+
+def _title(rng):
+    studio = rng.choice(STUDIOS)
+    number = rng.randint(1000000, 4999999) if studio == 'FC2-PPV' else rng.randint(100, 999)
+    return f"{studio}-{number}", " ".join(rng.sample(WORDS, rng.randint(2, 5)))
+
+def _hash(*key):
+    return hashlib.sha1(":".join(map(str, key)).encode()).hexdigest()
+
+def _size(rng):
+    return rng.choice([f"{rng.uniform(0.8, 9.9):.2f}GB", f"{rng.randint(400, 999)}MB", f"{rng.uniform(1, 30):.1f} GiB"])
+
+def _html(title, body, head=""):
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>{head}'
+            f'<link rel="stylesheet" href="/static/style.css"></head><body>{body}</body></html>')
+
+class SiteContent:
+    """按 (页码, 序号) 确定性生成页面，同一 URL 多次请求内容一致"""
+    def __init__(self, pages, per_page=None, magnet_rate=0.8, recorded=False):
+        self.pages = pages
+        self.per_page = per_page
+        self.magnet_rate = magnet_rate
+        self.recorded = recorded
+        self._fixtures = {}
+
+    def _fixture(self, pattern, page):
+        if pattern not in self._fixtures:
+            paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, pattern)))
+            self._fixtures[pattern] = [open(p, encoding='utf-8').read() for p in paths]
+        pages = self._fixtures[pattern]
+        return pages[(page - 1) % len(pages)] if pages else None
+
+    def forum_list(self, fid, page):
+        if self.recorded:
+            return self._fixture("sech/forum_list_*.html", page)
+        rows = []
+        if page <= self.pages:
+            per_page = self.per_page or 50
+            for i in range(per_page):
+                tid = NEWEST_ID - (page - 1) * per_page - i
+                number, words = _title(_rng('sech', tid))
+                rows.append(f'<tbody id="normalthread_{tid}"><tr><th class="new">'
+                            f'<a href="thread-{tid}-1-1.html" class="s xst">{number} {words}</a></th>'
+                            f'<td class="by"><em><span>2024-10-19</span></em></td></tr></tbody>')
+        pager = (f'<div class="pg"><a href="forum-{fid}-{self.pages}.html" class="last">... {self.pages}</a>'
+                 f'<label><span title="共 {self.pages} 页"> / {self.pages} 页</span></label></div>')
+        return _html(f"forum {fid} - page {page}", f'{pager}<table id="threadlisttableid">{"".join(rows)}</table>')
+
+    def thread(self, tid):
+        if self.recorded:
+            return self._fixture("sech/thread_*.html", tid)
+        rng = _rng('sech', tid)
+        number, words = _title(rng)
+        lines = [f"【影片名称】：{number} {words}", f"【影片大小】：{_size(rng)}", f"【是否有码】：{rng.choice(['有码', '无码'])}"]
+        cover = f'<img class="zoom" src="static/none.gif" file="https://img.example.net/{tid}.jpg" />'
+        body = (f'<div id="postlist"><em id="authorposton{tid}">发表于 <span title="2024-10-19 12:00:00">1&nbsp;天前</span></em>'
+                f'<table><tr><td class="t_f" id="postmessage_{tid}">{"<br />".join(lines)}<br />{cover}<br />'
+                f'<div class="blockcode"><li>magnet:?xt=urn:btih:{_hash("sech", tid).upper()}</li></div></td></tr></table></div>')
+        return _html(f"{number} {words}", body, f'<meta name="keywords" content="{number} {words}" />')
+
+    def nyaa_list(self, page):
+        if self.recorded:
+            return self._fixture("nyaa/list_*.html", page)
+        rows = []
+        if page <= self.pages:
+            per_page = self.per_page or 75
+            for i in range(per_page):
+                nid = NEWEST_ID - (page - 1) * per_page - i
+                rng = _rng('nyaa', nid)
+                number, words = _title(rng)
+                rows.append(f'<tr class="default"><td><a href="/?c=2_2">cat</a></td>'
+                            f'<td colspan="2"><a href="/view/{nid}" title="{number} {words}">[offkab] {number} {words}</a></td>'
+                            f'<td class="text-center"><a href="/download/{nid}.torrent">t</a>'
+                            f'<a href="magnet:?xt=urn:btih:{_hash("nyaa", nid)}&amp;dn={number}">m</a></td>'
+                            f'<td class="text-center">{_size(rng)}</td>'
+                            f'<td class="text-center" data-timestamp="{1729300000 - nid % 100000 * 60}">2024-10-19</td></tr>')
+        return _html(f"nyaa page {page}", f'<table class="torrent-list"><tbody>{"".join(rows)}</tbody></table>')
+
+    def nyaa_rss(self, site_base):
+        """与列表第 1 页相同的条目 (id/info_hash/大小/时间一致，可与 HTML 模式互相去重)"""
+        items = []
+        for i in range(self.per_page or 75):
+            nid = NEWEST_ID - i
+            rng = _rng('nyaa', nid)
+            number, words = _title(rng)
+            size = _size(rng)
+            items.append(f'<item><title>{escape(f"[offkab] {number} {words}")}</title>'
+                         f'<link>{site_base}/download/{nid}.torrent</link>'
+                         f'<guid isPermaLink="true">{site_base}/view/{nid}</guid>'
+                         f'<pubDate>{formatdate(1729300000 - nid % 100000 * 60)}</pubDate>'
+                         f'<nyaa:seeders>{rng.randint(0, 50)}</nyaa:seeders><nyaa:infoHash>{_hash("nyaa", nid)}</nyaa:infoHash>'
+                         f'<nyaa:categoryId>2_2</nyaa:categoryId><nyaa:size>{size}</nyaa:size>'
+                         f'<description><![CDATA[<a href="{site_base}/view/{nid}">#{nid}</a>]]></description></item>')
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n<rss xmlns:atom="http://www.w3.org/2005/Atom" '
+                'xmlns:nyaa="https://nyaa.si/xmlns/nyaa" version="2.0"><channel><title>nyaa standin</title>'
+                f'{"".join(items)}</channel></rss>')
+
+    def javbee_list(self, series, page):
+        if self.recorded:
+            return self._fixture("javbee/date_*.html", page)
+        cards = []
+        if page <= self.pages:
+            per_page = self.per_page or 30
+            for i in range(per_page):
+                rng = _rng('javbee', series, page, i)
+                number, words = _title(rng)
+                key = _hash('javbee', series, page, i)
+                magnet = (f'<a title="Download Magnet" href="magnet:?xt=urn:btih:{key}&amp;dn={number}">Magnet</a>'
+                          if rng.random() < self.magnet_rate else '')
+                cards.append(f'<div class="card mb-3"><img class="image lazy" src="/loading.gif" data-src="https://pics.example.org/{key[:8]}.jpg">'
+                             f'<h5 class="title is-4 is-spaced"><a href="/{number.lower()}-{key[:6]}">{number} {words}</a>'
+                             f'<span class="is-size-6"> {_size(rng)}</span></h5>'
+                             f'<p class="subtitle is-6"><a href="/date/2024-10-19">2024-10-19</a></p>'
+                             f'<a title="Download .torrent" href="/download/{key}.torrent">Torrent</a>{magnet}</div>')
+        return _html(f"{series} page {page}", "".join(cards))
+
+    def torrent(self, key):
+        rng = _rng('torrent', key)
+        number, _ = _title(rng)
+        length = rng.randint(400, 9000) * 1024 * 1024
+        info = {b'name': f"{number}.mp4".encode(), b'piece length': 4 * 1024 * 1024,
+                b'pieces': hashlib.sha1(key.encode()).digest() * 4, b'length': length}
+        return bencodepy.encode({b'announce': b'http://tracker.example.org/announce', b'creation date': 1729300000, b'info': info})
+
+class Throttle:
+    """按客户端 IP 的令牌桶，超出速率时返回 429"""
+    def __init__(self, rate):
+        self.rate = rate
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def allow(self, client):
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(client, (self.rate, now))
+            tokens = min(self.rate, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self.buckets[client] = (tokens, now)
+                return False
+            self.buckets[client] = (tokens - 1, now)
+            return True
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, content, latency_ms=0, jitter_ms=0, error_rate=0.0, throttle_rps=0, age_gate=False, seed=None):
+        super().__init__(address, StandinHandler)
+        self.content = content
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle = Throttle(throttle_rps)
+        self.age_gate = age_gate
+        self.random = random.Random(seed)
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {'started_at': time.time(), 'requests': defaultdict(int), 'ok': defaultdict(int), 'status': defaultdict(int), 'bytes': 0}
+
+    def record(self, kind, status, size):
+        with self.stats_lock:
+            self.stats['requests'][kind] += 1
+            if status == 200:
+                self.stats['ok'][kind] += 1
+            self.stats['status'][str(status)] += 1
+            self.stats['bytes'] += size
+
+    def stats_snapshot(self):
+        with self.stats_lock:
+            return {'uptime_seconds': round(time.time() - self.stats['started_at'], 3),
+                    'requests': dict(self.stats['requests']), 'ok': dict(self.stats['ok']), 'status': dict(self.stats['status']), 'bytes': self.stats['bytes']}
+
+AGE_GATE_PAGE = _html("age gate", '<a class="enter-btn" href="#" onclick="document.cookie=\'agegate=1; path=/\'; location.reload(); return false;">满18岁，请点此进入</a>')
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server_version = "MagnetoStandin/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8", kind="other", headers=None):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.record(kind, status, len(data))
+
+    def _route(self, path, query):
+        """返回 (kind, 生成函数)，kind 用于统计；不匹配时返回 (None, None)"""
+        content = self.server.content
+        if path.rstrip('/') == '/nyaa' and query.get('page', [''])[0] == 'rss':
+            return 'rss', lambda: content.nyaa_rss(f"http://{self.headers.get('Host')}")
+        page = int((query.get('page') or query.get('p') or ['1'])[0] or 1)
+        if path == '/forum.php' and query.get('mod', [''])[0] == 'viewthread':
+            return 'detail', lambda: content.thread(int(query['tid'][0]))
+        if path == '/forum.php':
+            return 'list', lambda: content.forum_list(query.get('fid', ['0'])[0], page)
+        m = re.fullmatch(r'/forum-(\d+)-(\d+)\.html', path)
+        if m:
+            return 'list', lambda: content.forum_list(m.group(1), int(m.group(2)))
+        m = re.fullmatch(r'/thread-(\d+)-\d+-\d+\.html', path)
+        if m:
+            return 'detail', lambda: content.thread(int(m.group(1)))
+        if path.rstrip('/') == '/nyaa':
+            return 'list', lambda: content.nyaa_list(page)
+        m = re.fullmatch(r'/(date|tag|search)/(.+)', path)
+        if m:
+            return 'list', lambda: content.javbee_list(f"{m.group(1)}/{m.group(2)}", page)
+        m = re.fullmatch(r'/download/(\w+)\.torrent', path)
+        if m:
+            return 'torrent', lambda: content.torrent(m.group(1))
+        if path == '/':
+            return 'index', lambda: _html("index", '<a href="/forum.php?mod=forumdisplay&fid=103">forum</a>')
+        return None, None
+
+    def do_POST(self):
+        if self.path == '/__reset':
+            self.server.reset_stats()
+            return self._send(200, '{"ok": true}', "application/json", kind="control")
+        self._send(404, "not found", kind="other")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/__stats':
+            return self._send(200, json.dumps(self.server.stats_snapshot()), "application/json", kind="control")
+
+        kind, render = self._route(url.path, parse_qs(url.query))
+        if kind is None:
+            return self._send(404, "not found")
+        # 经替身代理 (standin_proxy.py) 转发的请求按其出口地址分别限流
+        client = self.headers.get('X-Forwarded-For') or self.client_address[0]
+        if not self.server.throttle.allow(client):
+            return self._send(429, "Too Many Requests", kind=kind, headers={"Retry-After": "1"})
+
+        server = self.server
+        delay = server.latency_ms + (server.random.uniform(-server.jitter_ms, server.jitter_ms) if server.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if server.error_rate and server.random.random() < server.error_rate:
+            return self._send(500, "Internal Server Error", kind=kind)
+        if server.age_gate and kind in ('list', 'detail', 'index') and 'agegate=1' not in (self.headers.get('Cookie') or ''):
+            return self._send(200, AGE_GATE_PAGE, kind='age_gate')
+        if kind == 'torrent':
+            return self._send(200, render(), "application/x-bittorrent", kind=kind)
+        if kind == 'rss':
+            return self._send(200, render(), "application/xml; charset=utf-8", kind=kind)
+        self._send(200, render(), kind=kind)
+
+def create_server(host="127.0.0.1", port=8765, pages=20, per_page=None, magnet_rate=0.8, recorded=False,
+                  latency_ms=0, jitter_ms=0, error_rate=0.0, throttle_rps=0, age_gate=False, seed=None):
+    content = SiteContent(pages, per_page, magnet_rate, recorded)
+    return StandinServer((host, port), content, latency_ms, jitter_ms, error_rate, throttle_rps, age_gate, seed)
+
+def add_server_arguments(parser):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=20, help="列表分页深度，超出后返回空页 (默认: 20)")
+    parser.add_argument("--per-page", type=int, help="每页条数 (默认: 论坛 50 / nyaa 75 / javbee 30)")
+    parser.add_argument("--magnet-rate", type=float, default=0.8, help="javbee 卡片直接带磁链的比例，其余需下载 .torrent (默认: 0.8)")
+    parser.add_argument("--recorded", action="store_true", help="回放 benchmarks/fixtures/ 中录制的页面，而不是生成合成页面")
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个请求的固定延迟 (毫秒)")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="延迟的随机抖动范围 (毫秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 500 的概率")
+    parser.add_argument("--throttle-rps", type=float, default=0, help="每个客户端 (或 X-Forwarded-For 地址) 的请求速率上限，超出返回 429 (0 为不限)")
+    parser.add_argument("--age-gate", action="store_true", help="论坛页面需要先点击“满18岁”按钮")
+    parser.add_argument("--seed", type=int, help="延迟抖动/错误注入的随机种子")
+
+def server_kwargs(args):
+    return {k: getattr(args, k) for k in ('host', 'port', 'pages', 'per_page', 'magnet_rate', 'recorded', 'latency_ms',
+                                          'jitter_ms', 'error_rate', 'throttle_rps', 'age_gate', 'seed')}
+
+def main():
+    parser = argparse.ArgumentParser(description="本地替身站点，用于端到端压测抓取脚本。")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    server = create_server(**server_kwargs(args))
+    print(f"替身站点已启动: http://{args.host}:{args.port} (分页深度 {args.pages}, 延迟 {args.latency_ms}±{args.jitter_ms} ms, "
+          f"错误率 {args.error_rate:.0%}, 限流 {args.throttle_rps or '无'} rps)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+合成数据生成器: 按 init_db 的表结构向 media / tags / media_tags 批量写入指定规模的数据，
+标题、番号、标签、文件大小和发布日期分布尽量贴近真实抓取结果，用于数据库基准。
+
+    python benchmarks/synth_data.py --rows 1000000        # 写入 benchmarks/results/synthetic_1000000.db
+"""
+import argparse
+import hashlib
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from common import RESULTS_DIR
+
+import database
+from utils import load_config
+
+SOURCES = ["sech", "javbee", "nyaa", "offkab", "141jav"]
+# 各来源占比 (sech 与 javbee 为主)
+SOURCE_WEIGHTS = [40, 30, 15, 10, 5]
+ITEM_PREFIXES = ["SSIS", "IPX", "ABW", "MIDV", "SONE", "JUR", "STARS", "PRED", "MIDE", "CAWD",
+                 "FC2-PPV", "HEYZO", "DASS", "ADN", "MEYD", "WAAA", "EBWH", "NACR", "ROE", "SNOS"]
+TITLE_WORDS = ["新人", "专属", "初次", "完全", "密着", "温泉", "出差", "同学会", "邻居", "上司", "旅行",
+               "合集", "特别篇", "限定", "纪录", "Episode", "Vol.", "Best", "Special", "Collection"]
+# javbee/sech 的标题常带英文发布组后缀
+SUFFIXES = ["", "", "", "-C", "-UC", " [FHD]", " 4K", " 1080p", " 中文字幕"]
+WORKFLOW_STATUSES = ["pending", "downloaded", "skipped"]
+WORKFLOW_WEIGHTS = [80, 15, 5]
+SIZE_UNITS = [("MB", 1024 ** 2), ("GB", 1024 ** 3)]
+
+def default_tag_rules():
+    """使用 javbee 配置中的 tag_rules，保证合成标题能命中真实的标签规则"""
+    return load_config("javbee").get('tag_rules', {})
+
+class SyntheticMediaGenerator:
+    """按固定随机种子生成可重复的记录，rows 相同时生成的数据完全一致"""
+    def __init__(self, tag_rules, seed=42, days=3 * 365, end_date=None):
+        self.rng = random.Random(seed)
+        self.tag_rules = tag_rules
+        self.tag_names = list(tag_rules)
+        self.days = days
+        self.end_date = end_date or datetime(2026, 1, 1)
+
+    def _publish_date(self):
+        # 近期数据更多: 天数偏移取指数分布，并截断在 days 范围内
+        offset = min(int(self.rng.expovariate(1 / (self.days / 4))), self.days - 1)
+        return (self.end_date - timedelta(days=offset, seconds=self.rng.randrange(86400))).strftime('%Y-%m-%d %H:%M:%S')
+
+    def _tags(self):
+        # 大多数记录 0-2 个标签，少数更多
+        count = min(self.rng.choices([0, 1, 2, 3, 4], weights=[25, 35, 25, 10, 5])[0], len(self.tag_names))
+        return self.rng.sample(self.tag_names, count)
+
+    def _size(self):
+        if self.rng.random() < 0.3:
+            value = round(self.rng.uniform(200, 1000), 1)
+            unit, factor = SIZE_UNITS[0]
+        else:
+            value = round(self.rng.lognormvariate(1.2, 0.6), 2)
+            unit, factor = SIZE_UNITS[1]
+        return f"{value} {unit}", int(value * factor)
+
+    def record(self, index):
+        """返回 (media 行元组, 标签列表)"""
+        rng = self.rng
+        source = rng.choices(SOURCES, weights=SOURCE_WEIGHTS)[0]
+        prefix = rng.choice(ITEM_PREFIXES)
+        item_number = f"{prefix}-{rng.randint(1, 999 if prefix != 'FC2-PPV' else 4999999):03d}"
+        tags = self._tags()
+        # 标题中放入每个标签的一个关键词；后缀可能额外命中规则，这部分记录在 retag 时会产生真实的标签变更
+        keywords = [rng.choice(self.tag_rules[t]) for t in tags]
+        words = " ".join(rng.sample(TITLE_WORDS, rng.randint(2, 5)))
+        title = f"{item_number} {words} {' '.join(keywords)}{rng.choice(SUFFIXES)}".strip()
+        size_str, size_bytes = self._size()
+        info_hash = hashlib.sha1(f"synthetic-{index}".encode()).hexdigest()
+        publish_date = self._publish_date()
+        added_at = publish_date.replace(' ', 'T')
+        row = (source, f"https://synthetic.invalid/{source}/{index}", 'PROCESSED', info_hash, title, publish_date,
+               size_str, size_bytes, item_number, f"magnet:?xt=urn:btih:{info_hash}",
+               f"https://synthetic.invalid/cover/{index}.jpg", added_at, added_at,
+               rng.choices(WORKFLOW_STATUSES, weights=WORKFLOW_WEIGHTS)[0])
+        return row, tags
+
+def synthetic_db_path(rows):
+    return os.path.join(RESULTS_DIR, f"synthetic_{rows}.db")
+
+def generate_db(db_path, rows, tag_rules=None, seed=42, batch_size=20000, progress=True):
+    """
+    生成 (或追加到) db_path，直到 media 表达到 rows 行。返回实际写入的行数。
+    直接用 executemany 按批写入，比逐条调用 add_processed_post_with_tags 快两个数量级。
+    """
+    tag_rules = tag_rules or default_tag_rules()
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    database.init_db(db_path)
+    existing = database.get_total_count(db_path)
+    if existing >= rows:
+        return 0
+
+    generator = SyntheticMediaGenerator(tag_rules, seed=seed + existing)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous=OFF")
+    cursor = conn.cursor()
+    cursor.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(t,) for t in tag_rules])
+    tag_ids = dict(cursor.execute("SELECT name, id FROM tags").fetchall())
+
+    start = time.time()
+    written = 0
+    index = existing
+    try:
+        while index < rows:
+            media_rows, tag_lists = [], []
+            for _ in range(min(batch_size, rows - index)):
+                row, tags = generator.record(index)
+                media_rows.append(row)
+                tag_lists.append(tags)
+                index += 1
+            # AUTOINCREMENT 的下一个 id 取 sqlite_sequence 与现有最大 id 中较大者
+            cursor.execute("SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'media'), 0), "
+                           "COALESCE((SELECT MAX(id) FROM media), 0))")
+            first_id = cursor.fetchone()[0] + 1
+            cursor.executemany('''
+                INSERT INTO media (source, post_url, status, info_hash, title, publish_date,
+                file_size, file_size_bytes, item_number, magnet_link, cover_url, added_at, processed_at, workflow_status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', media_rows)
+            # 同一事务内自增 id 连续，可以直接推算每行的 media_id
+            links = [(first_id + i, tag_ids[t]) for i, tags in enumerate(tag_lists) for t in tags]
+            cursor.executemany("INSERT OR IGNORE INTO media_tags (media_id, tag_id) VALUES (?, ?)", links)
+            conn.commit()
+            written += len(media_rows)
+            if progress:
+                rate = written / max(time.time() - start, 1e-6)
+                print(f"  已生成 {index}/{rows} 行 ({rate:.0f} 行/秒)", flush=True)
+    finally:
+        conn.close()
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="生成指定规模的合成 media/tags/media_tags 数据库。")
+    parser.add_argument("--rows", type=int, default=100000, help="目标行数 (默认: 100000)，已有数据时只补足差额")
+    parser.add_argument("--db", default=None, help="数据库路径 (默认: benchmarks/results/synthetic_<rows>.db)")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子 (默认: 42)")
+    parser.add_argument("--batch-size", type=int, default=20000, help="每个事务写入的行数 (默认: 20000)")
+    args = parser.parse_args()
+
+    db_path = args.db or synthetic_db_path(args.rows)
+    start = time.time()
+    written = generate_db(db_path, args.rows, seed=args.seed, batch_size=args.batch_size)
+    print(f"完成: 写入 {written} 行，用时 {time.time() - start:.1f} s，数据库 {db_path} "
+          f"({os.path.getsize(db_path) / 1024 / 1024:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
+import argparse
 import logging
 import subprocess
 import sys
 import os
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from task_runner import TaskRunner
+from budget import get_budget_config, has_limits
+from job_executor import task_site
+from fanout import DEFAULT_FANOUT_CONFIG, DEFAULT_SCRAPER_ARGS, SharedBudget, select_sites, plan_sites
+from utils import load_config
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -9,13 +19,28 @@ logger = logging.getLogger(__name__)
 
 PYTHON_EXEC = sys.executable
 
-def run_script(script_path, args):
-    """运行脚本并等待结束"""
+_runner = None
+
+# run_task.py 的预算参数 -> budget 配置项，从任务参数中移除后再传给各阶段
+BUDGET_ARGS = {'--max-seconds': 'max_seconds', '--max-rss-mb': 'max_rss_mb', '--max-pages': 'max_pages', '--max-items': 'max_items'}
+
+def get_runner(default_spares=1):
+    """进程内共享的预热工作进程池 (网页端常驻时各任务复用同一个)；备用进程数可用 MAGNETO_TASK_SPARES 覆盖"""
+    global _runner
+    if _runner is None:
+        _runner = TaskRunner(spares=int(os.environ.get("MAGNETO_TASK_SPARES", default_spares)))
+    return _runner
+
+def _resolve_script(script_path):
     if not os.path.exists(script_path) and not os.path.dirname(script_path):
         potential_path = os.path.join("scripts", script_path)
         if os.path.exists(potential_path):
             script_path = potential_path
+    return script_path
 
+def run_script(script_path, args):
+    """运行脚本并等待结束"""
+    script_path = _resolve_script(script_path)
     cmd = [PYTHON_EXEC, script_path] + args
     logger.info(f"🚀 开始运行: {' '.join(cmd)}")
     try:
@@ -26,6 +51,87 @@ def run_script(script_path, args):
         logger.error(f"❌ {script_path} 执行失败，退出码: {e.returncode}")
         return False
 
+def _log_stage_result(result):
+    if result['ok']:
+        logger.info(f"✅ {result['stage']} 执行完毕 (启动 {result['startup_ms']} ms"
+                    f"{'' if result['warm'] else ', 工作进程尚未预热完成'}, 耗时 {result['seconds']} s)。")
+    else:
+        logger.error(f"❌ {result['stage']} 执行失败: {result['error']}")
+    return result
+
+def run_stage(stage, args, budget_limits=None, config_overrides=None):
+    """在预热的工作进程中运行一个阶段并等待结束，返回结构化结果 (含 stats)"""
+    logger.info(f"🚀 开始运行: {stage} {' '.join(args)}")
+    return _log_stage_result(get_runner().run(stage, args, budget_limits, config_overrides))
+
+def start_stage(stage, args, budget_limits=None, config_overrides=None):
+    """在预热的工作进程中启动一个阶段，立即返回 StageRun (调用 wait() 取结果)"""
+    logger.info(f"🚀 后台启动: {stage} {' '.join(args)}")
+    return get_runner().submit(stage, args, budget_limits, config_overrides)
+
+def split_budget_args(args):
+    """从任务参数中取出 --max-seconds 等预算参数，返回 (其余参数, 预算覆盖项)"""
+    rest, overrides = [], {}
+    args = list(args or [])
+    i = 0
+    while i < len(args):
+        key = BUDGET_ARGS.get(args[i])
+        if key and i + 1 < len(args):
+            try:
+                value = float(args[i + 1])
+                overrides[key] = int(value) if value.is_integer() else value
+            except ValueError:
+                logger.warning(f"忽略无法解析的预算参数: {args[i]} {args[i + 1]}")
+            i += 2
+            continue
+        rest.append(args[i])
+        i += 1
+    return rest, overrides
+
+def resolve_budget(command, args, overrides=None):
+    """站点配置 budget 段与命令行覆盖项合并后的预算；都未设置限制时返回 None"""
+    try:
+        limits = get_budget_config(load_config(task_site(command, args)))
+    except SystemExit:
+        # 配置文件不存在时任务本身会报错，这里只使用命令行参数
+        limits = get_budget_config({})
+    limits.update(overrides or {})
+    return limits if has_limits(limits) else None
+
+def _remaining_budget(budget_limits, start_time):
+    """串行的后续阶段只能使用剩余的运行时间"""
+    if not budget_limits or not budget_limits.get('max_seconds'):
+        return budget_limits
+    return {**budget_limits, 'max_seconds': max(budget_limits['max_seconds'] - (time.time() - start_time), 1)}
+
+def _task_result(task, stages, start_time):
+    return {'task': task, 'ok': all(r['ok'] for r in stages), 'seconds': round(time.time() - start_time, 3), 'stages': stages}
+
+def log_sehuatang_summary(site, fetch_stats, process_stats, start_time, stream_mode):
+    """汇总 列表抓取 + 详情处理 两个阶段的结果"""
+    duration = time.time() - start_time
+    width = 62
+    title = " 流式更新总结 " if stream_mode else " 更新总结 "
+    summary = f"""
+    \n{title:=^{width}}
+    - 目标网站: {site}
+    - 总耗时: {time.strftime('%H时%M分%S秒', time.gmtime(duration))}
+
+    --- 阶段 1: 抓取 URL ---
+    - 成功抓取页面: {fetch_stats.get('pages_fetched', 0)}
+    - 抓取失败页面: {fetch_stats.get('pages_failed', 0)}
+    - 发现帖子 URL: {fetch_stats.get('urls_found', 0)}
+    - 新增待处理 URL: {fetch_stats.get('urls_added', 0)}
+
+    --- 阶段 2: 处理详情 ---
+    - 计划处理URL: {process_stats.get('planned', 0)}
+    - ✅ 成功更新记录: {process_stats.get('UPDATED', 0)}
+    - ⏩ 检测到重复记录: {process_stats.get('DUPLICATE', 0)}
+    - ❌ 处理失败记录: {process_stats.get('FAILED', 0)}
+    \n{'=' * width}
+    """
+    logger.info(summary)
+
 def get_site_from_args(args, default_site):
     """辅助函数：从参数列表中提取 --site 的值"""
     if args and "--site" in args:
@@ -37,7 +143,7 @@ def get_site_from_args(args, default_site):
             pass
     return default_site
 
-def task_sehuatang_update(extra_args=None):
+def task_sehuatang_update(extra_args=None, budget_limits=None, config_overrides=None):
     """色花堂更新"""
     # 1. 确定目标站点名称
     current_site = get_site_from_args(extra_args, "sehuatang")
@@ -46,6 +152,14 @@ def task_sehuatang_update(extra_args=None):
     # 只有 process_details.py 支持 --retry-failed
     is_retry_mode = extra_args and "--retry-failed" in extra_args
 
+    # 3. 【流式模式】列表抓取与详情处理同时进行
+    if extra_args and "--stream" in extra_args and not is_retry_mode:
+        return task_sehuatang_stream([a for a in extra_args if a != "--stream"], budget_limits, config_overrides)
+
+    start_time = time.time()
+    stages = []
+    fetch_stats = {}
+
     # --- 阶段 1: 抓取 URL ---
     if is_retry_mode:
         logger.info(">>> 检测到重试模式 (--retry-failed)，跳过阶段 1 (抓取列表)。")
@@ -59,11 +173,13 @@ def task_sehuatang_update(extra_args=None):
             fetch_args = ["--site", current_site, "--page", "1-2"]
 
         logger.info(f">>> 阶段 1: 抓取 URL (Site: {current_site})")
-        success = run_script("scripts/fetch_urls.py", fetch_args)
+        result = run_stage("fetch_urls", fetch_args, budget_limits, config_overrides)
+        stages.append(result)
+        fetch_stats = result['stats']
         
-        if not success:
+        if not result['ok']:
             logger.error("阶段 1 失败，终止后续任务。")
-            return
+            return _task_result("sehuatang", stages, start_time)
 
     # --- 阶段 2: 处理详情/重试 ---
     if is_retry_mode:
@@ -74,9 +190,46 @@ def task_sehuatang_update(extra_args=None):
         logger.info(f">>> 阶段 2: 处理新发现的任务 (Site: {current_site})")
         process_args = ["--site", current_site]
     
-    run_script("scripts/process_details.py", process_args)
+    result = run_stage("process_details", process_args, _remaining_budget(budget_limits, start_time), config_overrides)
+    stages.append(result)
+    log_sehuatang_summary(current_site, fetch_stats, result['stats'], start_time, stream_mode=False)
+    return _task_result("sehuatang", stages, start_time)
+
+def task_sehuatang_stream(extra_args=None, budget_limits=None, config_overrides=None):
+    """
+    色花堂流式更新: fetch_urls 与 process_details 在两个预热工作进程中同时运行。
+    fetch_urls 每提交一批 URL，process_details 即可开始处理；
+    标记文件在 fetch_urls 结束后删除，process_details 处理完剩余任务后退出。
+    """
+    current_site = get_site_from_args(extra_args, "sehuatang")
+    fetch_args = list(extra_args) if extra_args else ["--page", "1-2"]
+    if "--site" not in fetch_args:
+        fetch_args = ["--site", current_site] + fetch_args
 
-def task_javbee_update(extra_args=None):
+    os.makedirs("logs", exist_ok=True)
+    # 绝对路径: 工作进程的当前目录固定为项目根目录，可能与本进程不同；
+    # 文件名末尾是本进程 pid，本进程异常退出来不及删除标记时 process_details 据此结束 (见 producer_running)
+    marker = os.path.abspath(os.path.join("logs", f".fetch_running_{current_site}_{os.getpid()}"))
+    open(marker, 'w').close()
+    start_time = time.time()
+
+    logger.info(f">>> 流式模式: 同时启动 URL 抓取与详情处理 (Site: {current_site})")
+    try:
+        fetch_run = start_stage("fetch_urls", fetch_args, budget_limits, config_overrides)
+        process_run = start_stage("process_details", ["--site", current_site, "--follow", marker], budget_limits, config_overrides)
+        fetch_result = _log_stage_result(fetch_run.wait())
+        if not fetch_result['ok']:
+            logger.error("详情处理将完成已提交的任务后退出。")
+    finally:
+        # 通知 process_details: 上游已结束
+        try: os.remove(marker)
+        except OSError: pass
+
+    process_result = _log_stage_result(process_run.wait())
+    log_sehuatang_summary(current_site, fetch_result['stats'], process_result['stats'], start_time, stream_mode=True)
+    return _task_result("sehuatang", [fetch_result, process_result], start_time)
+
+def task_javbee_update(extra_args=None, budget_limits=None, config_overrides=None):
     """Javbee 更新"""
     current_site = get_site_from_args(extra_args, "javbee")
     cmd_args = ["--site", current_site]
@@ -85,35 +238,190 @@ def task_javbee_update(extra_args=None):
             cmd_args = extra_args
         else:
             cmd_args.extend(extra_args)
-    run_script("scripts/scrape_javbee.py", cmd_args) 
+    start_time = time.time()
+    return _task_result("javbee", [run_stage("scrape_javbee", cmd_args, budget_limits, config_overrides)], start_time)
 
-def task_nyaa_update(extra_args=None):
+def task_nyaa_update(extra_args=None, budget_limits=None, config_overrides=None):
     """Nyaa 更新"""
     if not extra_args:
         extra_args = ["--site", "nyaa", "--start-page", "1", "--end-page", "auto"]
-    run_script("scripts/scrape_nyaa.py", extra_args)
+    start_time = time.time()
+    return _task_result("nyaa", [run_stage("scrape_nyaa", extra_args, budget_limits, config_overrides)], start_time)
+
+def task_import_torrents(extra_args=None, budget_limits=None):
+    """批量导入本地 .torrent 目录"""
+    if not extra_args or "--dir" not in extra_args:
+        logger.error("导入任务需要 --dir <目录> 参数。")
+        return None
+    cmd_args = list(extra_args)
+    if "--site" not in cmd_args:
+        cmd_args = ["--site", "javbee"] + cmd_args
+    start_time = time.time()
+    return _task_result("import_torrents", [run_stage("import_torrents", cmd_args, budget_limits)], start_time)
+
+def task_spool_load(extra_args=None, budget_limits=None):
+    """将抓取脚本写入 spool 的记录入库 (带 --follow 时持续运行)"""
+    cmd_args = list(extra_args or [])
+    if "--site" not in cmd_args:
+        cmd_args = ["--site", "nyaa"] + cmd_args
+    start_time = time.time()
+    return _task_result("spool_load", [run_stage("spool_loader", cmd_args, budget_limits)], start_time)
 
-def task_retag(site_name):
+def task_browser_pool(extra_args=None):
+    """启动常驻浏览器池 (前台运行，直到收到 shutdown 或 Ctrl+C)；常驻服务不经过预热进程池"""
+    run_script("scripts/browser_pool.py", list(extra_args) if extra_args else ["serve"])
+
+def task_retag(site_name, budget_limits=None):
     """运行标签重新解析任务"""
     logger.info(f">>> 开始对 {site_name} 进行标签重整 (Retag)...")
-    run_script("scripts/retag.py", ["--site", site_name])
+    start_time = time.time()
+    return _task_result("retag", [run_stage("retag", ["--site", site_name], budget_limits)], start_time)
+
+def _parse_run_all_args(extra_args):
+    parser = argparse.ArgumentParser(prog="run_task.py run_all", description="并发运行全部站点，共用一份资源预算。")
+    parser.add_argument("--sites", help="只运行这些站点，逗号分隔 (默认: 配置目录下全部)")
+    parser.add_argument("--exclude", help="跳过这些站点，逗号分隔")
+    parser.add_argument("--max-browsers", type=int,
+                        default=int(os.environ.get("MAGNETO_MAX_BROWSER_JOBS", DEFAULT_FANOUT_CONFIG['max_browsers'])),
+                        help="同时运行的浏览器总数 (默认: MAGNETO_MAX_BROWSER_JOBS 或 1)")
+    parser.add_argument("--max-http", type=int, default=DEFAULT_FANOUT_CONFIG['max_http'],
+                        help=f"requests 站点同时进行的请求总数 (默认: {DEFAULT_FANOUT_CONFIG['max_http']})")
+    parser.add_argument("--per-host-rate", type=float, default=DEFAULT_FANOUT_CONFIG['per_host_rate'],
+                        help=f"同一主机上所有站点合计的请求数/秒 (默认: {DEFAULT_FANOUT_CONFIG['per_host_rate']})")
+    return parser.parse_args(extra_args or [])
+
+def _stage_counts(result):
+    """汇总一个站点各阶段的 新增/重复/失败 条数 (process_details 的 UPDATED 记为新增)"""
+    counts = {'added': 0, 'duplicate': 0, 'failed': 0}
+    for stage in result.get('stages', []):
+        stats = stage.get('stats') or {}
+        counts['added'] += stats.get('ADDED', 0) + stats.get('UPDATED', 0)
+        counts['duplicate'] += stats.get('DUPLICATE', 0)
+        counts['failed'] += stats.get('FAILED', 0)
+    return counts
+
+def log_run_all_summary(site_results, skipped, limits, start_time):
+    """各站点结果合并为一个汇总框"""
+    duration = time.time() - start_time
+    width = 62
+    totals = {'added': 0, 'duplicate': 0, 'failed': 0}
+    lines = []
+    for result in site_results:
+        counts = _stage_counts(result)
+        for key in totals:
+            totals[key] += counts[key]
+        status = "✅" if result['ok'] else "❌"
+        lines.append(f"    {status} {result['site']} ({result['scraper']}): 新增 {counts['added']}, 重复 {counts['duplicate']}, "
+                     f"失败 {counts['failed']}, 耗时 {result.get('seconds', 0):.0f}s, 排队 {result['waited_seconds']:.0f}s")
+    lines += [f"    ⏭️ {site}: {reason}" for site, reason in skipped]
+    site_lines = "\n".join(lines)
+    summary = f"""
+    \n{' 全部站点更新总结 ':=^{width}}
+    - 站点数: {len(site_results)} (成功 {sum(1 for r in site_results if r['ok'])}, 跳过 {len(skipped)})
+    - 共享预算: 浏览器 {limits['max_browsers']}, HTTP 并发 {limits['max_http']}, 单主机 {limits['per_host_rate']} 请求/秒
+    - 总耗时: {time.strftime('%H时%M分%S秒', time.gmtime(duration))}
+    - ✅ 新增/更新记录: {totals['added']}
+    - ⏩ 重复记录: {totals['duplicate']}
+    - ❌ 失败记录: {totals['failed']}
+
+    --- 各站点 ---
+{site_lines}
+    \n{'=' * width}
+    """
+    logger.info(summary)
+
+SCRAPER_TASKS = {'sehuatang': task_sehuatang_update, 'javbee': task_javbee_update, 'nyaa': task_nyaa_update}
+
+def task_run_all(extra_args=None, budget_overrides=None):
+    """
+    并发运行配置目录下的全部站点 (按配置判断使用的爬虫，见 fanout.detect_scraper)，共用一份资源预算:
+    浏览器总数 --max-browsers、HTTP 并发总数 --max-http、同一主机合计速率 --per-host-rate。
+    名额不足的站点排队等待；--max-seconds 等预算参数分别作用于每个站点。
+    经执行器提交时占用将要运行的全部站点 (见 job_executor.task_sites)，期间这些站点的其他任务排队等待。
+    """
+    try:
+        opts = _parse_run_all_args(extra_args)
+    except SystemExit:
+        logger.error(f"run_all 参数无效: {' '.join(extra_args or [])}")
+        return None
+    limits = {'max_browsers': opts.max_browsers, 'max_http': opts.max_http, 'per_host_rate': opts.per_host_rate}
+    plans, skipped = plan_sites(select_sites(opts.sites, opts.exclude), limits)
+    logger.info(f">>> 全部站点: {len(plans)} 个，共享预算 {limits}")
+    for plan in plans:
+        rate = f", {plan['rate']} 请求/秒" if 'rate' in plan else ""
+        logger.info(f"    {plan['site']}: {plan['scraper']} (主机 {plan['host']}, 浏览器 {plan['browsers']}, "
+                    f"HTTP 并发 {plan['http']}{rate})")
+    for site, reason in skipped:
+        logger.warning(f"    跳过 {site}: {reason}")
+
+    shared = SharedBudget(limits['max_browsers'], limits['max_http'])
+    get_runner()  # 在启动各站点线程之前创建共享的预热进程池
+    start_time = time.time()
+    results = {}
+
+    def run_site(plan):
+        args = ["--site", plan['site']] + DEFAULT_SCRAPER_ARGS[plan['scraper']]
+        budget_limits = resolve_budget(plan['scraper'], args, budget_overrides)
+        held = shared.acquire(plan['browsers'], plan['http'])
+        waited = time.time() - start_time
+        try:
+            result = SCRAPER_TASKS[plan['scraper']](args, budget_limits, {plan['site']: plan['overrides']})
+        except Exception as e:
+            logger.error(f"站点 {plan['site']} 异常: {e}")
+            result = {'task': plan['scraper'], 'ok': False, 'error': str(e), 'stages': []}
+        finally:
+            shared.release(held)
+        results[plan['site']] = {**result, 'site': plan['site'], 'scraper': plan['scraper'], 'waited_seconds': round(waited, 3)}
+
+    threads = [threading.Thread(target=run_site, args=(plan,), name=f"run_all-{plan['site']}") for plan in plans]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    site_results = [results[plan['site']] for plan in plans]
+    log_run_all_summary(site_results, skipped, limits, start_time)
+    return {'task': 'run_all', 'ok': all(r['ok'] for r in site_results), 'seconds': round(time.time() - start_time, 3),
+            'stages': [stage for r in site_results for stage in r['stages']], 'sites': site_results,
+            'skipped': [{'site': site, 'reason': reason} for site, reason in skipped]}
+
+def run_command(command, extra_args=None):
+    """
+    按命令名分派任务 (命令行与网页端共用)，返回任务结果字典。
+    参数中可带 --max-seconds / --max-rss-mb / --max-pages / --max-items，覆盖站点配置的 budget 段。
+    """
+    extra_args, overrides = split_budget_args(extra_args)
+    if command == "browser_pool":
+        return task_browser_pool(extra_args)
+    if command == "run_all":
+        return task_run_all(extra_args, overrides)
+    budget_limits = resolve_budget(command, extra_args, overrides)
+    if budget_limits:
+        limits = {k: v for k, v in budget_limits.items() if v and k in BUDGET_ARGS.values()}
+        logger.info(f"任务预算: {limits} (宽限 {budget_limits['grace_seconds']}s)")
+    if command == "sehuatang":
+        return task_sehuatang_update(extra_args, budget_limits)
+    elif command == "javbee":
+        return task_javbee_update(extra_args, budget_limits)
+    elif command == "nyaa":
+        return task_nyaa_update(extra_args, budget_limits)
+    elif command == "import_torrents":
+        return task_import_torrents(extra_args, budget_limits)
+    elif command == "spool_load":
+        return task_spool_load(extra_args, budget_limits)
+    elif command == "retag":
+        target_site = extra_args[0] if extra_args else "javbee"
+        return task_retag(target_site, budget_limits)
+    else:
+        logger.error(f"未知的命令: {command}")
+        return None
 
 if __name__ == "__main__":
+    # 命令行单次运行: 不保留备用进程，否则取走备用进程后会立即再预热一个，直到退出都用不上
+    get_runner(default_spares=0)
     if len(sys.argv) > 1:
-        command = sys.argv[1]
-        extra_args = sys.argv[2:] 
-        
-        if command == "sehuatang":
-            task_sehuatang_update(extra_args)
-        elif command == "javbee":
-            task_javbee_update(extra_args)
-        elif command == "nyaa":
-            task_nyaa_update(extra_args)
-        elif command == "retag":
-            target_site = sys.argv[2] if len(sys.argv) > 2 else "javbee"
-            task_retag(target_site)
-        else:
-            logger.error(f"未知的命令: {command}")
+        result = run_command(sys.argv[1], sys.argv[2:])
     else:
         logger.info("未提供参数，默认执行 Sehuatang 更新任务...")
-        task_sehuatang_update()
\ No newline at end of file
+        result = run_command("sehuatang")
+    sys.exit(0 if result is None or result['ok'] else 1)
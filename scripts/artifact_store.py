@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import logging
+import os
+import time
+
+import database
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_ROOT = os.path.join("logs", "artifacts")
+
+DEFAULT_ARTIFACT_CONFIG = {
+    'max_total_mb': 200,
+    'max_age_days': 14,
+    'screenshot_every': 10,
+    'enforce_every': 50,
+}
+
+def get_artifact_config(config):
+    """
+    读取站点配置中的 failure_artifacts 段:
+        failure_artifacts:
+          max_total_mb: 200     # 该站点失败现场文件的总大小上限，超出后从最旧的开始删除
+          max_age_days: 14      # 超过天数的文件和索引记录一并删除
+          screenshot_every: 10  # 每 N 个不同的失败页面截一张图 (相同页面不重复截图)，0 为不截图
+          enforce_every: 50     # 每记录 N 次检查一次预算
+    """
+    return {**DEFAULT_ARTIFACT_CONFIG, **(config.get('failure_artifacts') or {})}
+
+def artifact_dir(site_name):
+    return os.path.join(ARTIFACT_ROOT, site_name)
+
+class FailureArtifactStore:
+    """
+    失败现场存储: 页面源码 gzip 压缩并按内容哈希去重，截图按比例抽样，
+    总大小和保存天数受预算约束，索引写入站点数据库 failure_artifacts 表 (按 post_url 查询)。
+    """
+    def __init__(self, config):
+        self.db_path = config['database_file']
+        self.source = config['site_name']
+        self.settings = get_artifact_config(config)
+        self.root = artifact_dir(self.source)
+        os.makedirs(os.path.join(self.root, "html"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "screenshots"), exist_ok=True)
+        self.recorded = 0
+        self.distinct_pages = 0
+        self.enforce_budget()
+
+    def _write_html(self, html):
+        data = (html or "").encode("utf-8", errors="replace")
+        html_hash = hashlib.sha1(data).hexdigest()
+        rel_path = os.path.join("html", f"{html_hash}.html.gz")
+        abs_path = os.path.join(self.root, rel_path)
+        if os.path.exists(abs_path):
+            # 相同的失败页面 (如统一的错误页/验证页) 只保存一份
+            os.utime(abs_path)
+            return html_hash, rel_path, False
+        with gzip.open(abs_path, "wb", compresslevel=6) as f:
+            f.write(data)
+        return html_hash, rel_path, True
+
+    def _write_screenshot(self, driver, html_hash):
+        rel_path = os.path.join("screenshots", f"{html_hash}.png")
+        try:
+            with open(os.path.join(self.root, rel_path), "wb") as f:
+                f.write(driver.get_screenshot_as_png())
+            return rel_path
+        except Exception as e:
+            logger.error(f"保存截图失败: {e}")
+            return None
+
+    def record(self, post_url, reason, html=None, driver=None):
+        """保存一次失败现场；driver 不为空且命中抽样时附带截图"""
+        try:
+            if html is None and driver is not None:
+                html = driver.page_source
+        except Exception:
+            html = None
+        try:
+            html_hash, html_path, is_new = self._write_html(html)
+            screenshot_path = None
+            if is_new:
+                every = self.settings['screenshot_every']
+                if driver is not None and every and self.distinct_pages % every == 0:
+                    screenshot_path = self._write_screenshot(driver, html_hash)
+                self.distinct_pages += 1
+            database.add_failure_artifact(self.db_path, self.source, post_url, reason, html_hash, html_path, screenshot_path)
+            logger.error(f"失败现场已保存: {html_path}{' (新页面)' if is_new else ' (与已有页面相同)'}"
+                         f"{', 截图 ' + screenshot_path if screenshot_path else ''}")
+        except Exception as e:
+            logger.error(f"保存失败现场出错: {e}")
+            return
+        self.recorded += 1
+        if self.recorded % max(1, self.settings['enforce_every']) == 0:
+            self.enforce_budget()
+
+    def enforce_budget(self):
+        """删除超龄文件，再按修改时间从旧到新删除直到总大小低于上限"""
+        max_age = self.settings['max_age_days'] * 86400
+        max_bytes = self.settings['max_total_mb'] * 1024 * 1024
+        now = time.time()
+        files = []
+        for sub in ("html", "screenshots"):
+            try:
+                entries = list(os.scandir(os.path.join(self.root, sub)))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_file():
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, os.path.join(sub, entry.name)))
+        files.sort()
+
+        evicted = []
+        total = sum(size for _, size, _ in files)
+        for mtime, size, rel_path in files:
+            if now - mtime <= max_age and total <= max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, rel_path))
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted.append(rel_path)
+        try:
+            database.prune_failure_artifacts(self.db_path, self.settings['max_age_days'], evicted)
+        except Exception as e:
+            logger.error(f"清理失败现场索引出错: {e}")
+        if evicted:
+            logger.info(f"失败现场超出预算，已删除 {len(evicted)} 个文件，剩余 {total / 1024 / 1024:.1f} MB。")
@@ -0,0 +1,115 @@
+# Chrome/Selenium 相关的辅助函数 (从 utils 拆出): 只有使用浏览器的脚本导入本模块，
+# 纯 requests 的抓取脚本与 retag 启动时不再加载 selenium
+import logging
+import os
+import sys
+from urllib.parse import urlparse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+
+import proxy_pool
+
+logger = logging.getLogger(__name__)
+
+# 各类资源的文件扩展名，由 build_blocked_url_patterns 生成 Network.setBlockedURLs 匹配模式
+RESOURCE_BLOCK_EXTENSIONS = {
+    'images': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'],
+    'media': ['mp4', 'webm', 'm3u8', 'ts', 'mp3', 'ogg', 'flv'],
+    'fonts': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+    'stylesheets': ['css'],
+}
+
+# 常见广告/统计域名，blocked_domains 未配置时使用
+DEFAULT_BLOCKED_DOMAINS = [
+    'googletagmanager.com', 'google-analytics.com', 'googlesyndication.com', 'doubleclick.net',
+    'adservice.google.com', 'hm.baidu.com', 'cnzz.com', 'histats.com', 'exoclick.com', 'juicyads.com',
+]
+
+# 只读取 DOM 用不到的 Chrome 功能
+LEAN_CHROME_ARGS = [
+    "--disable-extensions", "--disable-background-networking", "--disable-sync", "--disable-default-apps",
+    "--disable-component-update", "--disable-client-side-phishing-detection", "--no-first-run",
+    "--mute-audio", "--disable-gpu", "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication",
+]
+
+def get_browser_options(config):
+    """
+    读取站点配置中的 browser 段，缺省值即“精简加载”:
+        browser:
+          block_images: true
+          block_media: true
+          block_fonts: true
+          block_stylesheets: false
+          blocked_domains: [...]   # 第三方域名，留空使用内置广告/统计列表
+          disable_features: true
+    """
+    defaults = {'block_images': True, 'block_media': True, 'block_fonts': True, 'block_stylesheets': False,
+                'blocked_domains': None, 'disable_features': True}
+    return {**defaults, **((config or {}).get('browser') or {})}
+
+def build_blocked_url_patterns(browser_options):
+    patterns = []
+    for resource_type, extensions in RESOURCE_BLOCK_EXTENSIONS.items():
+        if browser_options.get(f'block_{resource_type}'):
+            # setBlockedURLs 的通配符匹配完整 URL，带查询串或片段的资源 (x.png?v=1, font.woff2#iefix) 需单独匹配
+            for ext in extensions:
+                patterns.extend([f"*.{ext}", f"*.{ext}?*", f"*.{ext}#*"])
+    domains = browser_options.get('blocked_domains')
+    if domains is None:
+        domains = DEFAULT_BLOCKED_DOMAINS
+    for domain in domains:
+        patterns.extend([f"*://{domain}/*", f"*://*.{domain}/*"])
+    return patterns
+
+def apply_resource_blocking(driver, browser_options):
+    """通过 CDP 网络拦截屏蔽不需要的资源，返回生效的匹配模式"""
+    patterns = build_blocked_url_patterns(browser_options)
+    if patterns:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    return patterns
+
+def setup_driver(config=None, lean=True, extra_args=None):
+    """
+    启动 Chrome。传入站点配置时按其 browser 段屏蔽图片/媒体/字体/第三方域名并关闭无用功能；
+    lean=False 时保持完整加载 (用于测量对比)。extra_args 为追加的 Chrome 启动参数。
+    """
+    browser_options = get_browser_options(config) if lean else {}
+    options = Options()
+    options.page_load_strategy = 'eager'
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    if browser_options.get('disable_features'):
+        for arg in LEAN_CHROME_ARGS:
+            options.add_argument(arg)
+    for arg in extra_args or []:
+        options.add_argument(arg)
+    pool = proxy_pool.get_pool(config) if config else None
+    proxy_url = pool.browser_proxy() if pool else None
+    if proxy_url:
+        options.add_argument(f"--proxy-server={proxy_url}")
+    if browser_options.get('block_images'):
+        # 图片不解码也不下载，但 <img> 的 src/file 等属性仍在 DOM 中，可正常提取封面地址
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    chromedriver_path = os.environ.get("CHROMEDRIVER_PATH", "/usr/bin/chromedriver")
+    try:
+        service = Service(chromedriver_path)
+        driver = webdriver.Chrome(service=service, options=options)
+        driver.set_page_load_timeout(60)
+        driver.set_script_timeout(60)
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"})
+        patterns = apply_resource_blocking(driver, browser_options) if browser_options else []
+        via = f", 代理 {urlparse(proxy_url).netloc}" if proxy_url else ""
+        logger.info(f"成功启动 WebDriver (已应用基础反检测设置，屏蔽规则 {len(patterns)} 条{via})。")
+        return driver
+    except Exception as e:
+        logger.error(f"启动 WebDriver 失败: {e}")
+        sys.exit(1)
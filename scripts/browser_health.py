@@ -0,0 +1,144 @@
+import logging
+import statistics
+from collections import deque
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RECYCLE_CONFIG = {
+    'max_rss_mb': 1500,
+    'max_renderers': 8,
+    'max_cpu_percent': None,
+    'cpu_high_checks': 3,
+    'latency_factor': 3.0,
+    'latency_window': 10,
+    'baseline_pages': 5,
+    'max_pages': 0,
+}
+
+def get_recycle_config(config):
+    """
+    读取站点配置中的 browser_recycle 段，任一阈值被越过即重启浏览器:
+        browser_recycle:
+          max_rss_mb: 1500        # 浏览器进程树常驻内存上限
+          max_renderers: 8        # renderer 进程数上限
+          max_cpu_percent: null   # 进程树 CPU 占用上限 (连续 cpu_high_checks 次超过才触发)，null 为不检查
+          cpu_high_checks: 3
+          latency_factor: 3.0     # 最近 latency_window 页的加载耗时中位数超过基线的倍数
+          latency_window: 10
+          baseline_pages: 5       # 浏览器启动后前几页的耗时作为基线
+          max_pages: 0            # 兜底的最大页数，0 为不限制
+    """
+    return {**DEFAULT_RECYCLE_CONFIG, **(config.get('browser_recycle') or {})}
+
+def driver_root_pid(driver):
+    """本地启动的浏览器取 chromedriver 进程；从浏览器池租用的取池中 chromedriver 进程"""
+    pid = getattr(driver, '_magneto_browser_pid', None)
+    if pid:
+        return pid
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+def _process_kind(proc):
+    try:
+        cmdline = proc.cmdline()
+        name = proc.name()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return 'other'
+    for arg in cmdline:
+        if arg.startswith('--type='):
+            return arg[len('--type='):]
+    return 'chromedriver' if 'chromedriver' in name else 'browser'
+
+class BrowserHealthMonitor:
+    """
+    监控一个浏览器进程树 (RSS、CPU、renderer 数) 和页面加载耗时趋势，
+    判断是否需要重启。每次重启浏览器后调用 reset()。
+    """
+    def __init__(self, config, driver=None):
+        self.thresholds = get_recycle_config(config)
+        self.latencies = deque(maxlen=max(1, int(self.thresholds['latency_window'])))
+        self.reset(driver)
+
+    def reset(self, driver=None):
+        self.root_pid = driver_root_pid(driver) if driver else None
+        self.pages = 0
+        self.baseline = []
+        self.latencies.clear()
+        self.cpu_high = 0
+        self._procs = {}
+
+    def record_page(self, seconds):
+        self.pages += 1
+        if len(self.baseline) < self.thresholds['baseline_pages']:
+            self.baseline.append(seconds)
+        else:
+            self.latencies.append(seconds)
+
+    def snapshot(self):
+        """当前进程树资源占用: {'rss_mb', 'cpu_percent', 'renderers', 'by_kind': {kind: (count, rss_mb)}}"""
+        result = {'rss_mb': 0.0, 'cpu_percent': 0.0, 'renderers': 0, 'by_kind': {}}
+        if not self.root_pid:
+            return result
+        try:
+            root = psutil.Process(self.root_pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return result
+        alive = {}
+        for proc in procs:
+            # 复用 Process 对象，cpu_percent 才能给出两次采样之间的占用
+            proc = self._procs.get(proc.pid, proc)
+            try:
+                rss_mb = proc.memory_info().rss / (1024 * 1024)
+                cpu = proc.cpu_percent(None)
+            except psutil.NoSuchProcess:
+                continue
+            alive[proc.pid] = proc
+            kind = _process_kind(proc)
+            count, kind_rss = result['by_kind'].get(kind, (0, 0.0))
+            result['by_kind'][kind] = (count + 1, kind_rss + rss_mb)
+            result['rss_mb'] += rss_mb
+            result['cpu_percent'] += cpu
+            if kind == 'renderer':
+                result['renderers'] += 1
+        self._procs = alive
+        return result
+
+    def latency_trend(self):
+        """(基线中位数, 最近窗口中位数)，样本不足时返回 None"""
+        if len(self.baseline) < self.thresholds['baseline_pages'] or len(self.latencies) < self.latencies.maxlen:
+            return None
+        return statistics.median(self.baseline), statistics.median(self.latencies)
+
+    def check(self):
+        """越过阈值时返回 (原因, 资源快照)，否则返回 (None, 资源快照)"""
+        t = self.thresholds
+        snap = self.snapshot()
+        if t['max_rss_mb'] and snap['rss_mb'] > t['max_rss_mb']:
+            return f"内存 {snap['rss_mb']:.0f} MB 超过上限 {t['max_rss_mb']} MB", snap
+        if t['max_renderers'] and snap['renderers'] > t['max_renderers']:
+            return f"renderer 进程 {snap['renderers']} 个超过上限 {t['max_renderers']}", snap
+        if t['max_cpu_percent']:
+            self.cpu_high = self.cpu_high + 1 if snap['cpu_percent'] > t['max_cpu_percent'] else 0
+            if self.cpu_high >= t['cpu_high_checks']:
+                return f"CPU 占用连续 {self.cpu_high} 次超过 {t['max_cpu_percent']}% (当前 {snap['cpu_percent']:.0f}%)", snap
+        trend = self.latency_trend()
+        if trend and t['latency_factor']:
+            baseline, recent = trend
+            if baseline > 0 and recent > baseline * t['latency_factor']:
+                return f"页面加载变慢: 最近 {len(self.latencies)} 页中位数 {recent:.1f}s，基线 {baseline:.1f}s", snap
+        if t['max_pages'] and self.pages >= t['max_pages']:
+            return f"已加载 {self.pages} 页，达到上限 {t['max_pages']}", snap
+        return None, snap
+
+    def describe(self, snap=None):
+        """用于重启日志的内存概况"""
+        snap = snap or self.snapshot()
+        parts = [f"{kind}×{count} {rss:.0f} MB" for kind, (count, rss) in sorted(snap['by_kind'].items(), key=lambda kv: -kv[1][1])]
+        trend = self.latency_trend()
+        latency = f"，加载中位数 {trend[1]:.1f}s/基线 {trend[0]:.1f}s" if trend else ""
+        return f"总计 {snap['rss_mb']:.0f} MB, CPU {snap['cpu_percent']:.0f}%, 已加载 {self.pages} 页 ({', '.join(parts) or '无进程'}){latency}"
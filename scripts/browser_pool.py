@@ -0,0 +1,455 @@
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+import psutil
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+
+from browser_health import BrowserHealthMonitor
+from browser import setup_driver, apply_resource_blocking, get_browser_options
+from utils import setup_logging, load_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_CONFIG = {
+    'enabled': False,
+    'address': "127.0.0.1:6127",
+    'size': 1,
+    'max_leases': 200,
+    'lease_timeout': 3600,
+    'lease_wait': 30,
+}
+
+def get_pool_config(config):
+    """
+    读取站点配置中的 browser_pool 段:
+        browser_pool:
+          enabled: true
+          address: "127.0.0.1:6127"  # 守护进程监听地址
+          size: 1                    # 该站点预热的浏览器数量
+          max_leases: 200            # 单个浏览器最多出借次数
+          lease_timeout: 3600        # 租约超时 (秒)，客户端异常退出时回收
+          lease_wait: 30             # 客户端等待空闲浏览器的最长时间 (秒)
+    内存/renderer/CPU 阈值与脚本本地启动时相同，读取 browser_recycle 段。
+    守护进程与客户端都需要设置相同的环境变量 MAGNETO_POOL_AUTHKEY，未设置时守护进程拒绝启动，客户端改为本地启动浏览器。
+    """
+    return {**DEFAULT_POOL_CONFIG, **(config.get('browser_pool') or {})}
+
+# 单条请求/响应 (一行 JSON) 的长度上限
+MAX_MESSAGE_BYTES = 64 * 1024
+# 连接建立后必须在该时间内发来请求
+REQUEST_TIMEOUT = 10
+
+def _authkey():
+    """共享密钥，未设置时返回 None (没有默认值)"""
+    key = os.environ.get("MAGNETO_POOL_AUTHKEY")
+    return key.encode() if key else None
+
+def _sign(key, nonce):
+    return hmac.new(key, nonce.encode(), hashlib.sha256).hexdigest()
+
+def _send_json(stream, message):
+    stream.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+    stream.flush()
+
+def _recv_json(stream):
+    line = stream.readline(MAX_MESSAGE_BYTES + 1)
+    if not line:
+        raise EOFError("连接已关闭")
+    if len(line) > MAX_MESSAGE_BYTES or not line.endswith(b'\n'):
+        raise ValueError("消息过长或不完整")
+    return json.loads(line)
+
+def _parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def pass_age_gate(driver, config):
+    """打开站点首页并点击一次“满18岁”确认，Cookie 留在该浏览器中供后续租用者复用"""
+    selectors = (config.get('selectors') or {}).get('fetch_urls') or {}
+    enter_button = selectors.get('enter_button')
+    if not enter_button:
+        return
+    try:
+        driver.get(config['base_url'])
+        buttons = driver.find_elements(By.CSS_SELECTOR, enter_button)
+        if buttons:
+            driver.execute_script("arguments[0].click();", buttons[0])
+            time.sleep(1)
+        logger.info(f"[{config['site_name']}] 已完成年龄确认。")
+    except Exception as e:
+        logger.warning(f"[{config['site_name']}] 年龄确认失败，租用者将自行处理: {e}")
+
+class BrowserSession:
+    """守护进程持有的一个已预热浏览器，客户端通过 remote debugging 端口附着"""
+    def __init__(self, site, driver, debug_port, config):
+        self.id = uuid.uuid4().hex[:8]
+        self.site = site
+        self.driver = driver
+        self.debug_port = debug_port
+        self.created_at = time.time()
+        self.leases = 0
+        self.lease_id = None
+        self.leased_at = None
+        self.client_pid = None
+        self.monitor = BrowserHealthMonitor(config, driver)
+
+    @property
+    def debugger_address(self):
+        return f"127.0.0.1:{self.debug_port}"
+
+    @property
+    def browser_pid(self):
+        return self.monitor.root_pid
+
+    def rss_mb(self):
+        return self.monitor.snapshot()['rss_mb']
+
+    def is_responsive(self):
+        try:
+            return self.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def quit(self):
+        try: self.driver.quit()
+        except Exception: pass
+
+class BrowserPool:
+    def __init__(self):
+        self.configs = {}
+        self.sessions = {}
+        self.cond = threading.Condition()
+        self.closed = False
+
+    def add_site(self, site):
+        with self.cond:
+            if site in self.configs:
+                return
+            try:
+                config = load_config(site)
+            except SystemExit:
+                raise ValueError(f"无法加载网站配置: {site}")
+            self.configs[site] = config
+            self.sessions[site] = []
+        for _ in range(get_pool_config(config)['size']):
+            self._launch_async(site)
+
+    def _launch(self, site):
+        config = self.configs[site]
+        port = _free_port()
+        try:
+            driver = setup_driver(config, extra_args=[f"--remote-debugging-port={port}"])
+        except SystemExit:
+            logger.error(f"[{site}] 预热浏览器启动失败。")
+            return None
+        pass_age_gate(driver, config)
+        driver.get("about:blank")
+        session = BrowserSession(site, driver, port, config)
+        with self.cond:
+            if self.closed:
+                session.quit()
+                return None
+            self.sessions[site].append(session)
+            self.cond.notify_all()
+        logger.info(f"[{site}] 浏览器 {session.id} 就绪 (调试端口 {port})。")
+        return session
+
+    def _launch_async(self, site):
+        threading.Thread(target=self._launch, args=(site,), name=f"launch-{site}", daemon=True).start()
+
+    def _recycle(self, session, reason):
+        """移出池并在后台重启一个替代浏览器"""
+        with self.cond:
+            if session in self.sessions.get(session.site, []):
+                self.sessions[session.site].remove(session)
+        logger.info(f"[{session.site}] 回收浏览器 {session.id}: {reason}。内存概况: {session.monitor.describe()}, 已出借 {session.leases} 次")
+        session.quit()
+        if not self.closed:
+            self._launch_async(session.site)
+
+    def _recycle_reason(self, session):
+        pool_config = get_pool_config(self.configs[session.site])
+        reason, _ = session.monitor.check()
+        if reason:
+            return reason
+        if session.leases >= pool_config['max_leases']:
+            return f"出借次数达到上限 {pool_config['max_leases']}"
+        if not session.is_responsive():
+            return "浏览器无响应"
+        return None
+
+    def lease(self, site, client_pid, wait):
+        self.add_site(site)
+        deadline = time.time() + wait
+        with self.cond:
+            while True:
+                idle = [s for s in self.sessions[site] if s.lease_id is None]
+                if idle:
+                    session = idle[0]
+                    session.lease_id = uuid.uuid4().hex
+                    session.leased_at = time.time()
+                    session.client_pid = client_pid
+                    session.leases += 1
+                    return {'lease_id': session.lease_id, 'debugger_address': session.debugger_address,
+                            'session': session.id, 'browser_pid': session.browser_pid}
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+
+    def release(self, lease_id, healthy=True, reason=None):
+        with self.cond:
+            session = next((s for sessions in self.sessions.values() for s in sessions if s.lease_id == lease_id), None)
+        if session is None:
+            return False
+        if not healthy:
+            self._recycle(session, reason or "租用者报告异常")
+            return True
+        recycle_reason = self._recycle_reason(session)
+        if recycle_reason:
+            self._recycle(session, recycle_reason)
+            return True
+        with self.cond:
+            session.lease_id = session.leased_at = session.client_pid = None
+            self.cond.notify_all()
+        return True
+
+    def check_health(self):
+        """回收超时/客户端已退出的租约，以及不健康的空闲浏览器"""
+        now = time.time()
+        with self.cond:
+            sessions = [s for sessions in self.sessions.values() for s in sessions]
+        for session in sessions:
+            pool_config = get_pool_config(self.configs[session.site])
+            if session.lease_id is not None:
+                if session.client_pid and not psutil.pid_exists(session.client_pid):
+                    self._recycle(session, f"租用进程 {session.client_pid} 已退出")
+                elif now - session.leased_at > pool_config['lease_timeout']:
+                    self._recycle(session, "租约超时")
+                continue
+            reason = self._recycle_reason(session)
+            if reason:
+                self._recycle(session, reason)
+
+    def status(self):
+        with self.cond:
+            return {site: [{'id': s.id, 'leased': s.lease_id is not None, 'leases': s.leases,
+                            'age_seconds': round(time.time() - s.created_at), 'rss_mb': round(s.rss_mb())}
+                           for s in sessions]
+                    for site, sessions in self.sessions.items()}
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            sessions = [s for sessions in self.sessions.values() for s in sessions]
+            self.sessions = {site: [] for site in self.sessions}
+            self.cond.notify_all()
+        for session in sessions:
+            session.quit()
+
+def _handle_connection(pool, conn, stop_event, key):
+    """
+    协议: 每个连接一问一答，消息均为一行 JSON (不使用 pickle，收到的数据不会被当作对象执行)。
+    守护进程先发送随机 nonce，客户端在请求中带上 HMAC-SHA256(密钥, nonce)，校验通过后才执行请求。
+    """
+    stream = conn.makefile('rwb')
+    try:
+        conn.settimeout(REQUEST_TIMEOUT)
+        nonce = uuid.uuid4().hex
+        _send_json(stream, {'nonce': nonce})
+        message = _recv_json(stream)
+        if not isinstance(message, dict) or not hmac.compare_digest(str(message.get('auth', '')), _sign(key, nonce)):
+            logger.warning(f"拒绝来自 {conn.getpeername()} 的请求: 认证失败。")
+            _send_json(stream, {'error': "认证失败"})
+            return
+        # lease 可能等待空闲浏览器 lease_wait 秒
+        conn.settimeout(None)
+        op = message.get('op')
+        if op == 'lease':
+            reply = pool.lease(message['site'], message.get('pid'), message.get('wait', 30))
+        elif op == 'release':
+            reply = pool.release(message['lease_id'], message.get('healthy', True), message.get('reason'))
+        elif op == 'status':
+            reply = pool.status()
+        elif op == 'shutdown':
+            stop_event.set()
+            reply = True
+        else:
+            reply = {'error': f"未知操作: {op}"}
+        _send_json(stream, reply)
+    except (EOFError, OSError):
+        pass
+    except ValueError as e:
+        logger.warning(f"无法解析的请求: {e}")
+        try: _send_json(stream, {'error': "无法解析的请求"})
+        except Exception: pass
+    except Exception as e:
+        logger.error(f"处理请求失败: {e}", exc_info=True)
+        try: _send_json(stream, {'error': str(e)})
+        except Exception: pass
+    finally:
+        try: stream.close()
+        except OSError: pass
+        conn.close()
+
+def serve(address, sites, check_interval=30):
+    key = _authkey()
+    if not key:
+        logger.error("未设置环境变量 MAGNETO_POOL_AUTHKEY，浏览器池拒绝启动 (客户端需设置相同的值)。")
+        raise SystemExit(1)
+    pool = BrowserPool()
+    for site in sites:
+        pool.add_site(site)
+    stop_event = threading.Event()
+
+    def health_loop():
+        while not stop_event.wait(check_interval):
+            try: pool.check_health()
+            except Exception as e: logger.error(f"健康检查出错: {e}")
+    threading.Thread(target=health_loop, name="health-check", daemon=True).start()
+
+    listener = socket.create_server(_parse_address(address))
+    logger.info(f"浏览器池已启动，监听 {address}，预热站点: {', '.join(sites) or '无 (按需加载)'}")
+
+    def accept_loop():
+        while not stop_event.is_set():
+            try:
+                conn, _ = listener.accept()
+            except Exception:
+                continue
+            threading.Thread(target=_handle_connection, args=(pool, conn, stop_event, key), daemon=True).start()
+    threading.Thread(target=accept_loop, name="accept", daemon=True).start()
+
+    try:
+        stop_event.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("正在关闭浏览器池...")
+        listener.close()
+        pool.close()
+
+# --- 客户端 ---
+
+def _request(address, message):
+    """发送一个请求并返回响应；未设置密钥时抛出 PermissionError (与连接失败一样由调用方回退)"""
+    key = _authkey()
+    if not key:
+        raise PermissionError("未设置环境变量 MAGNETO_POOL_AUTHKEY")
+    with socket.create_connection(_parse_address(address)) as conn:
+        with conn.makefile('rwb') as stream:
+            challenge = _recv_json(stream)
+            _send_json(stream, {**message, 'auth': _sign(key, challenge['nonce'])})
+            return _recv_json(stream)
+
+def lease_driver(config):
+    """
+    向浏览器池租用一个已预热、已通过年龄确认的浏览器并附着。
+    池未启用、不可达或无空闲浏览器时返回 None。
+    """
+    pool_config = get_pool_config(config)
+    if not pool_config['enabled']:
+        return None
+    try:
+        lease = _request(pool_config['address'], {'op': 'lease', 'site': config['site_name'],
+                                                  'pid': os.getpid(), 'wait': pool_config['lease_wait']})
+    except (OSError, EOFError, ValueError) as e:
+        logger.warning(f"浏览器池 {pool_config['address']} 不可用 ({e})，改为本地启动浏览器。")
+        return None
+    if not lease or 'error' in lease:
+        logger.warning(f"浏览器池未出借浏览器 ({(lease or {}).get('error', '无空闲浏览器')})，改为本地启动浏览器。")
+        return None
+
+    options = Options()
+    options.debugger_address = lease['debugger_address']
+    try:
+        service = Service(os.environ.get("CHROMEDRIVER_PATH", "/usr/bin/chromedriver"))
+        driver = webdriver.Chrome(service=service, options=options)
+        driver.set_page_load_timeout(60)
+        driver.set_script_timeout(60)
+        # CDP 设置只对当前调试会话生效，附着后重新应用
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"})
+        apply_resource_blocking(driver, get_browser_options(config))
+    except Exception as e:
+        logger.warning(f"附着浏览器 {lease['session']} 失败 ({e})，改为本地启动浏览器。")
+        _request(pool_config['address'], {'op': 'release', 'lease_id': lease['lease_id'], 'healthy': False, 'reason': f"附着失败: {e}"})
+        return None
+    driver._magneto_lease = (pool_config['address'], lease['lease_id'])
+    # 健康监控按池中浏览器的进程树统计，而不是本地 chromedriver
+    driver._magneto_browser_pid = lease.get('browser_pid')
+    logger.info(f"已从浏览器池租用浏览器 {lease['session']}。")
+    return driver
+
+def release_driver(driver, healthy=True, reason=None):
+    """归还租用的浏览器: 只断开本地 chromedriver，不关闭池中的 Chrome"""
+    address, lease_id = driver._magneto_lease
+    if healthy:
+        try: driver.get("about:blank")
+        except Exception: healthy, reason = False, "归还前页面无响应"
+    try: driver.service.stop()
+    except Exception: pass
+    try:
+        _request(address, {'op': 'release', 'lease_id': lease_id, 'healthy': healthy, 'reason': reason})
+    except (OSError, EOFError, ValueError) as e:
+        logger.warning(f"归还浏览器失败: {e}")
+
+def open_driver(config):
+    """优先从浏览器池租用，不可用时本地启动"""
+    return lease_driver(config) or setup_driver(config)
+
+def close_driver(driver, healthy=True, reason=None):
+    if getattr(driver, '_magneto_lease', None):
+        release_driver(driver, healthy, reason)
+    else:
+        driver.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻浏览器池: 预热并出借已通过年龄确认的 Chrome。")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="启动守护进程")
+    p_serve.add_argument("--site", "-s", action="append", default=[], help="启动时预热的网站标识，可重复指定")
+    p_serve.add_argument("--address", default=DEFAULT_POOL_CONFIG['address'], help="监听地址 host:port")
+    p_serve.add_argument("--check-interval", type=int, default=30, help="健康检查间隔 (秒)")
+    for name, help_text in (("status", "查看池状态"), ("shutdown", "关闭守护进程")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--address", default=DEFAULT_POOL_CONFIG['address'], help="守护进程地址 host:port")
+    args = parser.parse_args()
+
+    setup_logging("info", args.command, "browser_pool")
+    if args.command == "serve":
+        serve(args.address, args.site, args.check_interval)
+        return
+    try:
+        reply = _request(args.address, {'op': args.command})
+    except (OSError, EOFError, ValueError) as e:
+        logger.error(f"无法连接浏览器池 {args.address}: {e}")
+        raise SystemExit(1)
+    if isinstance(reply, dict) and 'error' in reply:
+        logger.error(f"浏览器池拒绝请求: {reply['error']}")
+        raise SystemExit(1)
+    if args.command == "status":
+        for site, sessions in reply.items():
+            logger.info(f"[{site}] {len(sessions)} 个浏览器")
+            for s in sessions:
+                logger.info(f"    {s['id']}: {'出借中' if s['leased'] else '空闲'}, 出借 {s['leases']} 次, 运行 {s['age_seconds']} 秒, 内存 {s['rss_mb']} MB")
+    else:
+        logger.info("已发送关闭请求。")
+
+if __name__ == "__main__":
+    main()
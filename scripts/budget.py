@@ -0,0 +1,133 @@
+import logging
+import signal
+import threading
+import time
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_CONFIG = {
+    'max_seconds': None,
+    'max_rss_mb': None,
+    'max_pages': None,
+    'max_items': None,
+    'grace_seconds': 60,
+    'check_interval': 2,
+}
+
+def get_budget_config(config):
+    """
+    读取站点配置中的 budget 段 (run_task.py 的 --max-seconds 等参数可逐项覆盖):
+        budget:
+          max_seconds: 7200     # 单个任务的最长运行时间
+          max_rss_mb: 3000      # 工作进程及其子进程 (浏览器等) 的内存总和上限
+          max_pages: 500        # 最多抓取的页面数
+          max_items: 20000      # 最多处理的条目数
+          grace_seconds: 60     # 要求停止后等待任务自行收尾的时间，超时后强制结束进程树
+          check_interval: 2     # 监督进程的检查间隔 (秒)
+    未设置的项不限制。
+    """
+    return {**DEFAULT_BUDGET_CONFIG, **(config.get('budget') or {})}
+
+def has_limits(budget):
+    return bool(budget) and any(budget.get(k) for k in ('max_seconds', 'max_rss_mb', 'max_pages', 'max_items'))
+
+class StopRequested(BaseException):
+    """
+    第二次收到停止信号时在主线程抛出，借助各层 finally 收尾。
+    继承 BaseException，避免被抓取循环里的 except Exception 吞掉。
+    """
+
+_stop_event = threading.Event()
+_progress_lock = threading.Lock()
+_progress = {'pages': 0, 'items': 0}
+_reporter = None
+_last_report = 0.0
+
+def stop_requested():
+    """抓取循环在页面/批次边界处检查，为 True 时提交当前批次、保留检查点后退出"""
+    return _stop_event.is_set()
+
+def request_stop():
+    _stop_event.set()
+
+def _handle_stop_signal(signum, frame):
+    # 信号处理函数中不写日志: 主线程可能正在写同一个日志文件 (BufferedWriter 不可重入)，
+    # 由各脚本在检查到停止标记时记录
+    if _stop_event.is_set():
+        raise StopRequested("再次收到停止信号，中断当前操作")
+    _stop_event.set()
+
+def install_stop_handler():
+    """在工作进程主线程中安装 SIGTERM 处理: 第一次只设置停止标记，第二次抛出 StopRequested"""
+    signal.signal(signal.SIGTERM, _handle_stop_signal)
+
+def reset(reporter=None):
+    """开始新任务前清空停止标记与进度；reporter(progress) 用于把进度发给监督进程"""
+    global _reporter, _last_report
+    _stop_event.clear()
+    with _progress_lock:
+        _progress.update(pages=0, items=0)
+        _reporter = reporter
+        _last_report = 0.0
+
+def report_progress(pages=0, items=0):
+    """累计已抓取的页面数/条目数，最多每秒向监督进程报告一次"""
+    global _last_report
+    with _progress_lock:
+        _progress['pages'] += pages
+        _progress['items'] += items
+        now = time.time()
+        if _reporter is not None and now - _last_report >= 1:
+            _last_report = now
+            try:
+                _reporter(dict(_progress))
+            except Exception as e:
+                logger.debug(f"报告进度失败: {e}")
+
+def get_progress():
+    with _progress_lock:
+        return dict(_progress)
+
+def process_tree_rss_mb(pid):
+    """进程及其所有子进程 (chromedriver/Chrome 等) 的常驻内存总和"""
+    try:
+        root = psutil.Process(pid)
+        procs = [root] + root.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0.0
+    total = 0
+    for proc in procs:
+        try:
+            total += proc.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total / 1024 / 1024
+
+def kill_process_tree(pid):
+    """先结束子进程再结束根进程，返回被结束的进程数"""
+    try:
+        root = psutil.Process(pid)
+        procs = root.children(recursive=True) + [root]
+    except psutil.NoSuchProcess:
+        return 0
+    for proc in procs:
+        try:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(procs, timeout=5)
+    return len(procs)
+
+def check_budget(budget, elapsed, rss_mb, progress):
+    """返回超出的第一项限制的说明，未超出返回 None"""
+    if budget.get('max_seconds') and elapsed > budget['max_seconds']:
+        return f"运行时间 {elapsed:.0f}s 超过上限 {budget['max_seconds']}s"
+    if budget.get('max_rss_mb') and rss_mb > budget['max_rss_mb']:
+        return f"内存 {rss_mb:.0f} MB 超过上限 {budget['max_rss_mb']} MB"
+    if budget.get('max_pages') and progress.get('pages', 0) >= budget['max_pages']:
+        return f"已抓取 {progress['pages']} 页，达到上限 {budget['max_pages']}"
+    if budget.get('max_items') and progress.get('items', 0) >= budget['max_items']:
+        return f"已处理 {progress['items']} 条，达到上限 {budget['max_items']}"
+    return None
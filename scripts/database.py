@@ -1,10 +1,18 @@
 import sqlite3
 import logging
 import re
-from datetime import datetime
+import json
+import time
+from datetime import datetime, timedelta
 import os
 
 logger = logging.getLogger(__name__)
+
+# 多线程/多进程并发写入时，等待写锁的最长秒数 (sqlite3 默认仅 5 秒)
+DB_TIMEOUT = 30
+
+def _connect(db_path):
+    return sqlite3.connect(db_path, timeout=DB_TIMEOUT)
 ###
 
 def parse_size_str_to_bytes(size_str):
@@ -44,9 +52,32 @@ def parse_size_str_to_bytes(size_str):
     except Exception:
         return 0
 
+def format_size_bytes(size_bytes):
+    """
+    将整数字节转换为可读的大小字符串 (1024进制)，如 1288490188 -> '1.20 GiB'。
+    输出格式可被 parse_size_str_to_bytes 反向解析。
+    """
+    if not size_bytes or size_bytes < 0:
+        return '0 B'
+    size = float(size_bytes)
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024:
+            return f"{int(size)} B" if unit == 'B' else f"{size:.2f} {unit}"
+        size /= 1024
+    return f"{size:.2f} TiB"
+
+def _extract_info_hash(magnet):
+    """从磁力链接中提取小写的 info_hash，提取失败返回 None"""
+    if magnet and 'btih:' in magnet:
+        match = re.search(r'btih:([a-fA-F0-9]+)', magnet)
+        if match: return match.group(1).lower()
+    return None
+
 def init_db(db_path):
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
+    # WAL 模式: 写入时不阻塞网页端的读查询，适合单写多读
+    cursor.execute('PRAGMA journal_mode=WAL')
     
     # --- 【核心简化】---
     # 不再检查和修改旧表，直接创建包含所有字段的最终版表结构
@@ -82,6 +113,95 @@ def init_db(db_path):
             PRIMARY KEY(media_id, tag_id)
         )
     ''')
+    # 抓取检查点: 每个站点 + 模式一行，用于中断后 --resume 续跑
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_state (
+            site TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            range_key TEXT,
+            config_hash TEXT,
+            completed_pages TEXT,
+            cursor TEXT,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY(site, mode)
+        )
+    ''')
+    # 高水位标记: 每个来源 + 抓取范围 (scope) 记录已见过的最新位置 (最新 post_url / nyaa id / 帖子 tid)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS high_water_marks (
+            source TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            mark TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY(source, scope)
+        )
+    ''')
+    # 失败现场索引: 文件存放在 logs/artifacts/<site>/ 下，路径相对该目录；文件被预算淘汰后路径置空
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS failure_artifacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            post_url TEXT NOT NULL,
+            reason TEXT,
+            html_hash TEXT,
+            html_path TEXT,
+            screenshot_path TEXT,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_failure_artifacts_post_url ON failure_artifacts(post_url)')
+    # 运行记录: 每次抓取脚本运行一行，耗时按 抓取/解析/数据库 拆分 (流水线模式下各阶段并行，三者之和可能大于总耗时)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            job_type TEXT NOT NULL,
+            args TEXT,
+            started_at TEXT NOT NULL,
+            finished_at TEXT NOT NULL,
+            duration_seconds REAL,
+            exit_status TEXT NOT NULL,
+            error TEXT,
+            added INTEGER DEFAULT 0,
+            duplicate INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            total_found INTEGER DEFAULT 0,
+            pages_fetched INTEGER DEFAULT 0,
+            items_per_sec REAL,
+            fetch_seconds REAL,
+            parse_seconds REAL,
+            db_seconds REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_job_runs_started_at ON job_runs(started_at)')
+    # 远程工作进程的租约: 每个被领取的 URL 一行 (expires_at 为 time.time() 秒数)；
+    # 提交结果后保留 result 一段时间，同一租约重复提交时直接返回原结果；
+    # retry 为 1 表示该 URL 是作为失败任务重试领取的，保留期内不再重试领取
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS work_leases (
+            source TEXT NOT NULL,
+            post_url TEXT NOT NULL,
+            lease_id TEXT NOT NULL,
+            worker TEXT,
+            expires_at REAL NOT NULL,
+            result TEXT,
+            retry INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(source, post_url)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_work_leases_lease_id ON work_leases(lease_id)')
+    # spool 段的入库进度: 每个段一行，byte_offset 与该批记录在同一事务中更新，保证每条记录只入库一次；
+    # 段全部入库后 done 置 1 并保留该行，并发的另一个 loader 不会把已删除的段当作从头开始
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS spool_offsets (
+            source TEXT NOT NULL,
+            segment TEXT NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY(source, segment)
+        )
+    ''')
     conn.commit()
     conn.close()
     logger.info(f"数据库 '{db_path}' 初始化成功。")
@@ -89,7 +209,7 @@ def init_db(db_path):
 def batch_update_workflow_status(db_path, ids, new_status):
     if not ids:
         return 0
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     placeholders = ', '.join('?' for _ in ids)
     query = f"UPDATE media SET workflow_status = ? WHERE id IN ({placeholders})"
@@ -103,17 +223,37 @@ def batch_update_workflow_status(db_path, ids, new_status):
 
 ###
 def add_urls(db_path, urls, source):
-    if not urls: return
-    conn = sqlite3.connect(db_path)
+    """批量写入新 URL (已存在的忽略)，返回实际新增的数量"""
+    if not urls: return 0
+    conn = _connect(db_path)
     cursor = conn.cursor()
     new_urls_data = [(source, url, 'NEW', datetime.now().isoformat()) for url in urls]
     cursor.executemany('INSERT OR IGNORE INTO media (source, post_url, status, added_at) VALUES (?, ?, ?, ?)', new_urls_data)
-    if cursor.rowcount > 0: logger.info(f"成功向数据库 '{db_path}' 添加了 {cursor.rowcount} 个新URL。")
+    added = max(cursor.rowcount, 0)
+    if added > 0: logger.info(f"成功向数据库 '{db_path}' 添加了 {added} 个新URL。")
     conn.commit()
     conn.close()
+    return added
+
+def filter_new_urls(db_path, source, urls):
+    """返回 urls 中数据库里尚不存在的那部分 (保持原顺序)"""
+    if not urls: return []
+    conn = _connect(db_path)
+    try:
+        existing = set()
+        url_list = list(urls)
+        # SQLite 单条语句的参数数量有限，分块查询
+        for start in range(0, len(url_list), 500):
+            chunk = url_list[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            rows = conn.execute(f"SELECT post_url FROM media WHERE source = ? AND post_url IN ({placeholders})", [source] + chunk)
+            existing.update(row[0] for row in rows)
+    finally:
+        conn.close()
+    return [url for url in urls if url not in existing]
 
 def get_unprocessed_urls(db_path, source):
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     cursor.execute('SELECT post_url FROM media WHERE source = ? AND status = "NEW"', (source,))
     urls = [row[0] for row in cursor.fetchall()]
@@ -121,7 +261,7 @@ def get_unprocessed_urls(db_path, source):
     return urls
 
 def get_failed_urls(db_path, source):
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     cursor.execute('SELECT post_url FROM media WHERE source = ? AND status = "FAILED"', (source,))
     urls = [row[0] for row in cursor.fetchall()]
@@ -129,7 +269,7 @@ def get_failed_urls(db_path, source):
     return urls
 
 def mark_url_failed(db_path, post_url, source):
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     cursor.execute("UPDATE media SET status = 'FAILED' WHERE source = ? AND post_url = ?", (source, post_url))
     conn.commit()
@@ -148,11 +288,7 @@ def _execute_tag_update(cursor, media_id, tags_list):
 
 def update_post_with_tags(db_path, post_url, source, details, tags_list):
     magnet = details.get('magnet_link')
-    info_hash = None
-    if magnet and 'btih:' in magnet:
-        match = re.search(r'btih:([a-fA-F0-9]+)', magnet)
-        if match: info_hash = match.group(1).lower()
-            
+    info_hash = _extract_info_hash(magnet)
     if not info_hash:
         mark_url_failed(db_path, post_url, source)
         return 'FAILED'
@@ -160,7 +296,7 @@ def update_post_with_tags(db_path, post_url, source, details, tags_list):
     size_str = details.get('size', '')
     size_bytes = parse_size_str_to_bytes(size_str)
 
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     try:
         cursor.execute("SELECT id FROM media WHERE info_hash = ? AND post_url != ?", (info_hash, post_url))
@@ -198,10 +334,7 @@ def update_post_with_tags(db_path, post_url, source, details, tags_list):
 
 def add_processed_post_with_tags(db_path, source, details, tags_list):
     magnet = details.get('magnet_link')
-    info_hash = None
-    if magnet and 'btih:' in magnet:
-        match = re.search(r'btih:([a-fA-F0-9]+)', magnet)
-        if match: info_hash = match.group(1).lower()
+    info_hash = _extract_info_hash(magnet)
     if not info_hash:
         logger.warning(f"缺少 info_hash，跳过记录: {details.get('title')}")
         return 'FAILED'
@@ -209,7 +342,7 @@ def add_processed_post_with_tags(db_path, source, details, tags_list):
     size_str = details.get('size', '')
     size_bytes = parse_size_str_to_bytes(size_str)
 
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     now = datetime.now().isoformat()
     try:
@@ -234,8 +367,334 @@ def add_processed_post_with_tags(db_path, source, details, tags_list):
     finally:
         conn.close()
 
+def add_processed_posts_bulk(db_path, source, records):
+    """
+    在单个事务中批量写入已处理记录 (records 为 [(details, tags), ...])。
+    依靠 UNIQUE(info_hash) / UNIQUE(source, post_url) 去重，
+    返回与 records 一一对应的结果列表: 'ADDED' / 'DUPLICATE' / 'FAILED'。
+    """
+    if not records: return []
+    conn = _connect(db_path)
+    try:
+        results = _insert_processed_posts(conn.cursor(), source, records)
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"批量写入完成: 新增 {results.count('ADDED')} 条, 重复 {results.count('DUPLICATE')} 条。")
+    return results
+
+def _insert_processed_posts(cursor, source, records):
+    """在调用方的事务中逐条 INSERT OR IGNORE，返回结果列表 (不提交)"""
+    results = []
+    now = datetime.now().isoformat()
+    for details, tags_list in records:
+        magnet = details.get('magnet_link')
+        info_hash = _extract_info_hash(magnet)
+        if not info_hash:
+            logger.warning(f"缺少 info_hash，跳过记录: {details.get('title')}")
+            results.append('FAILED')
+            continue
+        size_str = details.get('size', '')
+        # 调用方已知精确字节数时 (如 .torrent 文件列表求和) 直接使用
+        size_bytes = details.get('size_bytes') or parse_size_str_to_bytes(size_str)
+        cursor.execute('''
+            INSERT OR IGNORE INTO media (source, post_url, status, info_hash, title, publish_date,
+            file_size, file_size_bytes, item_number, magnet_link, cover_url, added_at, processed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            source, details.get('post_url'), 'PROCESSED', info_hash, details.get('title'),
+            details.get('date'), size_str, size_bytes,
+            details.get('item_number'), magnet,
+            details.get('cover_image_url'), now, now
+        ))
+        if cursor.rowcount == 0:
+            results.append('DUPLICATE')
+            continue
+        _execute_tag_update(cursor, cursor.lastrowid, tags_list)
+        results.append('ADDED')
+    return results
+
+def get_spool_offset(db_path, source, segment):
+    """段已入库的字节偏移，没有记录时为 0；段已全部入库时返回 None"""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT byte_offset, done FROM spool_offsets WHERE source = ? AND segment = ?", (source, segment)).fetchone()
+        if row and row[1]:
+            return None
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+def ingest_spool_batch(db_path, source, segment, start_offset, end_offset, records):
+    """
+    在一个事务中写入 spool 段 [start_offset, end_offset) 内的记录并把该段的进度推进到 end_offset。
+    数据库中的进度与 start_offset 不一致 (另一个 loader 已写入这一段) 或该段已全部入库时不写入，返回 None；否则返回结果列表。
+    """
+    conn = _connect(db_path)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute("SELECT byte_offset, done FROM spool_offsets WHERE source = ? AND segment = ?", (source, segment)).fetchone()
+        if (row and row[1]) or (row[0] if row else 0) != start_offset:
+            conn.rollback()
+            return None
+        results = _insert_processed_posts(conn.cursor(), source, records)
+        conn.execute("INSERT OR REPLACE INTO spool_offsets (source, segment, byte_offset, updated_at) VALUES (?, ?, ?, ?)",
+                     (source, segment, end_offset, datetime.now().isoformat()))
+        conn.commit()
+        return results
+    finally:
+        conn.close()
+
+def finish_spool_segment(db_path, source, segment, end_offset, retention_days=7):
+    """
+    在删除 (或归档) 段文件之前调用: 进度等于 end_offset 时把该段标记为已全部入库，返回 True；
+    已由另一个 loader 标记时同样返回 True；进度不一致 (另一个 loader 仍在写入) 时返回 False。
+    顺带清理 retention_days 天前完成的段记录。
+    """
+    conn = _connect(db_path)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute("SELECT byte_offset, done FROM spool_offsets WHERE source = ? AND segment = ?", (source, segment)).fetchone()
+        if row and row[1]:
+            conn.rollback()
+            return True
+        if (row[0] if row else 0) != end_offset:
+            conn.rollback()
+            return False
+        now = datetime.now()
+        conn.execute("INSERT OR REPLACE INTO spool_offsets (source, segment, byte_offset, done, updated_at) VALUES (?, ?, ?, 1, ?)",
+                     (source, segment, end_offset, now.isoformat()))
+        conn.execute("DELETE FROM spool_offsets WHERE source = ? AND done = 1 AND updated_at < ?",
+                     (source, (now - timedelta(days=retention_days)).isoformat()))
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
+def save_crawl_state(db_path, site, mode, range_key, config_hash, completed_pages=None, cursor_data=None):
+    """写入 (覆盖) 抓取检查点；completed_pages 为已完成页码列表，cursor_data 为任意可 JSON 序列化的游标"""
+    conn = _connect(db_path)
+    try:
+        conn.execute('''
+            INSERT OR REPLACE INTO crawl_state (site, mode, range_key, config_hash, completed_pages, cursor, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (site, mode, range_key, config_hash, json.dumps(sorted(completed_pages or [])),
+              json.dumps(cursor_data), datetime.now().isoformat()))
+        conn.commit()
+    finally:
+        conn.close()
+
+def load_crawl_state(db_path, site, mode, range_key, config_hash):
+    """
+    读取抓取检查点。抓取范围或配置指纹与检查点不一致时视为过期，删除后返回 None。
+    返回: {'completed_pages': set, 'cursor': ..., 'updated_at': str}
+    """
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT range_key, config_hash, completed_pages, cursor, updated_at FROM crawl_state WHERE site = ? AND mode = ?",
+            (site, mode)).fetchone()
+        if not row:
+            return None
+        if row[0] != range_key or row[1] != config_hash:
+            reason = "抓取范围" if row[0] != range_key else "配置"
+            logger.info(f"检查点 ({site}/{mode}) 的{reason}已变化，视为过期并丢弃。")
+            conn.execute("DELETE FROM crawl_state WHERE site = ? AND mode = ?", (site, mode))
+            conn.commit()
+            return None
+        return {'completed_pages': set(json.loads(row[2] or '[]')), 'cursor': json.loads(row[3] or 'null'), 'updated_at': row[4]}
+    finally:
+        conn.close()
+
+def clear_crawl_state(db_path, site, mode):
+    conn = _connect(db_path)
+    try:
+        conn.execute("DELETE FROM crawl_state WHERE site = ? AND mode = ?", (site, mode))
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_high_water_mark(db_path, source, scope):
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT mark FROM high_water_marks WHERE source = ? AND scope = ?", (source, scope)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+def set_high_water_mark(db_path, source, scope, mark):
+    conn = _connect(db_path)
+    try:
+        conn.execute("INSERT OR REPLACE INTO high_water_marks (source, scope, mark, updated_at) VALUES (?, ?, ?, ?)",
+                     (source, scope, str(mark), datetime.now().isoformat()))
+        conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"高水位标记已更新 ({source}/{scope}): {mark}")
+
+def add_failure_artifact(db_path, source, post_url, reason, html_hash, html_path, screenshot_path=None):
+    conn = _connect(db_path)
+    try:
+        conn.execute('''
+            INSERT INTO failure_artifacts (source, post_url, reason, html_hash, html_path, screenshot_path, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (source, post_url, reason, html_hash, html_path, screenshot_path, datetime.now().isoformat()))
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_failure_artifacts(db_path, post_url=None, limit=200):
+    """按时间倒序返回失败现场记录；post_url 为子串匹配"""
+    conn = _connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        sql = "SELECT * FROM failure_artifacts"
+        params = []
+        if post_url:
+            sql += " WHERE post_url LIKE ?"
+            params.append(f"%{post_url}%")
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+def prune_failure_artifacts(db_path, max_age_days, evicted_paths=()):
+    """删除超龄记录，并清空已被淘汰文件的路径"""
+    conn = _connect(db_path)
+    try:
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        conn.execute("DELETE FROM failure_artifacts WHERE created_at < ?", (cutoff,))
+        for path in evicted_paths:
+            conn.execute("UPDATE failure_artifacts SET html_path = NULL WHERE html_path = ?", (path,))
+            conn.execute("UPDATE failure_artifacts SET screenshot_path = NULL WHERE screenshot_path = ?", (path,))
+        conn.commit()
+    finally:
+        conn.close()
+
+JOB_RUN_COLUMNS = ['source', 'job_type', 'args', 'started_at', 'finished_at', 'duration_seconds', 'exit_status', 'error',
+                   'added', 'duplicate', 'failed', 'total_found', 'pages_fetched', 'items_per_sec',
+                   'fetch_seconds', 'parse_seconds', 'db_seconds']
+
+def add_job_run(db_path, run):
+    """写入一条运行记录，run 为以 JOB_RUN_COLUMNS 为键的字典 (缺少的键写入 NULL)"""
+    conn = _connect(db_path)
+    try:
+        conn.execute(f"INSERT INTO job_runs ({', '.join(JOB_RUN_COLUMNS)}) VALUES ({', '.join('?' * len(JOB_RUN_COLUMNS))})",
+                     [run.get(column) for column in JOB_RUN_COLUMNS])
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_job_runs(db_path, job_type=None, limit=100):
+    """按时间倒序返回运行记录"""
+    conn = _connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        sql = "SELECT * FROM job_runs"
+        params = []
+        if job_type:
+            sql += " WHERE job_type = ?"
+            params.append(job_type)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+def claim_urls(db_path, source, lease_id, worker, limit, lease_seconds, retry_failed=False, retention_seconds=86400):
+    """
+    为 lease_id 领取最多 limit 个待处理 (或失败待重试) 且未被其他租约占用的 URL，返回 URL 列表。
+    过期未提交的租约在此处回收，其 URL 可被重新领取；BEGIN IMMEDIATE 保证并发领取不会拿到同一 URL。
+    retry_failed 时每个失败的 URL 在结果保留期内只重试一次，再次失败的不会被反复领取。
+    """
+    now = time.time()
+    conn = _connect(db_path)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute("DELETE FROM work_leases WHERE source = ? AND "
+                     "((result IS NULL AND expires_at < ?) OR (result IS NOT NULL AND expires_at < ?))",
+                     (source, now, now - retention_seconds))
+        # 正在处理中的 URL 不可领取；重试时还要跳过保留期内已经重试过的
+        busy = "result IS NULL OR retry = 1" if retry_failed else "result IS NULL"
+        rows = conn.execute(f'''
+            SELECT post_url FROM media WHERE source = ? AND status = ?
+            AND post_url NOT IN (SELECT post_url FROM work_leases WHERE source = ? AND ({busy}))
+            ORDER BY id LIMIT ?
+        ''', (source, 'FAILED' if retry_failed else 'NEW', source, limit)).fetchall()
+        urls = [row[0] for row in rows]
+        conn.executemany("INSERT OR REPLACE INTO work_leases (source, post_url, lease_id, worker, expires_at, result, retry) "
+                         "VALUES (?, ?, ?, ?, ?, NULL, ?)",
+                         [(source, url, lease_id, worker, now + lease_seconds, int(retry_failed)) for url in urls])
+        conn.commit()
+        return urls
+    finally:
+        conn.close()
+
+def renew_lease(db_path, lease_id, lease_seconds):
+    """心跳续期: 返回仍由该租约持有 (未提交、未过期) 的 URL 数；已过期的租约不再续期，由下次领取回收"""
+    now = time.time()
+    conn = _connect(db_path)
+    try:
+        count = conn.execute("UPDATE work_leases SET expires_at = ? WHERE lease_id = ? AND result IS NULL AND expires_at >= ?",
+                             (now + lease_seconds, lease_id, now)).rowcount
+        conn.commit()
+        return count
+    finally:
+        conn.close()
+
+def release_lease(db_path, lease_id):
+    """归还租约中尚未提交的 URL，它们可以立即被重新领取"""
+    conn = _connect(db_path)
+    try:
+        count = conn.execute("DELETE FROM work_leases WHERE lease_id = ? AND result IS NULL", (lease_id,)).rowcount
+        conn.commit()
+        return count
+    finally:
+        conn.close()
+
+def get_work_lease(db_path, source, post_url):
+    conn = _connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute("SELECT * FROM work_leases WHERE source = ? AND post_url = ?", (source, post_url)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+def complete_lease(db_path, source, post_url, lease_id, worker, result):
+    """记录 URL 的提交结果 (覆盖该 URL 上可能存在的其他租约)，从提交时刻开始计算保留时间"""
+    conn = _connect(db_path)
+    try:
+        # 保留领取时记录的 retry 标记
+        conn.execute("INSERT OR REPLACE INTO work_leases (source, post_url, lease_id, worker, expires_at, result, retry) "
+                     "VALUES (?, ?, ?, ?, ?, ?, COALESCE((SELECT retry FROM work_leases WHERE source = ? AND post_url = ?), 0))",
+                     (source, post_url, lease_id, worker, time.time(), result, source, post_url))
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_url_status(db_path, source, post_url):
+    """URL 在 media 表中的 status；记录不存在 (如已作为重复删除) 时返回 None"""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT status FROM media WHERE source = ? AND post_url = ?", (source, post_url)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+def get_active_leases(db_path, source):
+    """各工作进程当前持有的 URL 数: [(worker, 数量, 最早过期时间)]"""
+    conn = _connect(db_path)
+    try:
+        return conn.execute("SELECT worker, COUNT(*), MIN(expires_at) FROM work_leases "
+                            "WHERE source = ? AND result IS NULL AND expires_at >= ? GROUP BY worker ORDER BY worker",
+                            (source, time.time())).fetchall()
+    finally:
+        conn.close()
+
 def get_total_count(db_path):
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) FROM media")
     count = cursor.fetchone()[0]
@@ -243,7 +702,7 @@ def get_total_count(db_path):
     return count
     
 def get_all_media_for_retag(db_path):
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     cursor.execute('SELECT id, title FROM media')
     items = cursor.fetchall()
@@ -251,7 +710,7 @@ def get_all_media_for_retag(db_path):
     return items
 
 def update_tags_for_media_id(db_path, media_id, tags_list):
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     _execute_tag_update(cursor, media_id, tags_list)
     conn.commit()
@@ -259,7 +718,7 @@ def update_tags_for_media_id(db_path, media_id, tags_list):
 
 def get_all_tags(db_path):
     """从数据库获取所有不重复的 tag 列表"""
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     try:
         cursor.execute("SELECT name FROM tags ORDER BY name")
@@ -270,11 +729,61 @@ def get_all_tags(db_path):
         conn.close()
     return tags
 
+MEDIA_SORT_COLUMNS = ['publish_date', 'added_at', 'file_size', 'item_number', 'title', 'source', 'workflow_status']
+
+def build_media_listing_query(search_term='', search_scope='all', source='', tag='', workflow_status='',
+                              start_date='', end_date='', sort_by='publish_date', sort_order='DESC'):
+    """
+    构建首页列表的筛选/排序查询 (不含 LIMIT/OFFSET)，供网页端和数据库基准共用。
+    返回 (query, params, sort_by, sort_order)，后两者为校验后的实际排序参数。
+    """
+    query = "SELECT * FROM media WHERE 1=1"
+    params = []
+
+    if search_term:
+        if search_scope == 'title':
+            query += " AND title LIKE ?"
+            params.append(f"%{search_term}%")
+        elif search_scope == 'item_number':
+            query += " AND item_number LIKE ?"
+            params.append(f"%{search_term}%")
+        else:
+            query += " AND (title LIKE ? OR item_number LIKE ?)"
+            params.extend([f"%{search_term}%", f"%{search_term}%"])
+
+    if source:
+        query += " AND source = ?"
+        params.append(source)
+
+    if tag:
+        query += " AND id IN (SELECT media_id FROM media_tags JOIN tags ON tags.id = media_tags.tag_id WHERE tags.name = ?)"
+        params.append(tag)
+
+    if workflow_status:
+        query += " AND workflow_status = ?"
+        params.append(workflow_status)
+
+    if start_date:
+        query += " AND date(publish_date) >= date(?)"
+        params.append(start_date)
+    if end_date:
+        query += " AND date(publish_date) <= date(?)"
+        params.append(end_date)
+
+    if sort_by not in MEDIA_SORT_COLUMNS: sort_by = 'publish_date'
+    if sort_order.upper() not in ['ASC', 'DESC']: sort_order = 'DESC'
+
+    if sort_by == 'file_size':
+        query += f" ORDER BY file_size_bytes {sort_order}"
+    else:
+        query += f" ORDER BY {sort_by} {sort_order}"
+    return query, params, sort_by, sort_order
+
 def delete_media_by_ids(db_path, ids):
     """根据 ID 列表批量删除记录"""
     if not ids:
         return 0
-    conn = sqlite3.connect(db_path)
+    conn = _connect(db_path)
     cursor = conn.cursor()
     
     # 动态构建 SQL 语句: DELETE FROM media WHERE id IN (?, ?, ...)
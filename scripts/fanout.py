@@ -0,0 +1,128 @@
+import glob
+import logging
+import os
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+from pipeline import get_pipeline_config
+from utils import load_config
+
+logger = logging.getLogger(__name__)
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPTS_DIR)
+
+SCRAPERS = ('sehuatang', 'javbee', 'nyaa')
+
+DEFAULT_FANOUT_CONFIG = {
+    'max_browsers': 1,     # 同时运行的浏览器 (Selenium) 总数
+    'max_http': 4,         # 所有 requests 站点同时进行的请求总数
+    'per_host_rate': 1.0,  # 同一主机上所有站点合计的请求数/秒
+}
+
+# run_all 未指定参数时各爬虫的默认参数 (与单独运行时的默认值一致)
+DEFAULT_SCRAPER_ARGS = {
+    'sehuatang': ['--page', '1-2'],
+    'javbee': [],
+    'nyaa': ['--start-page', '1', '--end-page', 'auto'],
+}
+
+def config_dir():
+    return os.environ.get("MAGNETO_CONFIG_DIR") or os.path.join(PROJECT_ROOT, 'configs')
+
+def discover_sites():
+    """配置目录中的全部站点名 (按文件名排序)"""
+    return sorted(os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(config_dir(), '*.yaml')))
+
+def select_sites(only=None, exclude=None):
+    """run_all 要运行的站点: only 为逗号分隔的站点名 (默认配置目录下全部)，去掉 exclude 中的站点"""
+    excluded = set(exclude.split(',')) if exclude else set()
+    return [s for s in (only.split(',') if only else discover_sites()) if s not in excluded]
+
+def detect_scraper(config):
+    """
+    站点使用的爬虫: 优先读取配置中的 scraper 项，否则按配置特征判断:
+    有 fid (论坛板块) 为 sehuatang，有 url_date_format (按日期翻页) 为 javbee，列表选择器含 item_row 为 nyaa。
+    无法判断时返回 None。
+    """
+    scraper = config.get('scraper')
+    if scraper:
+        return scraper if scraper in SCRAPERS else None
+    if config.get('fid'):
+        return 'sehuatang'
+    if config.get('url_date_format'):
+        return 'javbee'
+    if (config.get('selectors') or {}).get('item_row'):
+        return 'nyaa'
+    return None
+
+def _http_concurrency(config):
+    """requests 站点同时进行的请求数: 流水线模式为 fetch_workers，否则为 1"""
+    pipeline_config = get_pipeline_config(config)
+    return pipeline_config['fetch_workers'] if pipeline_config else 1
+
+def plan_sites(sites, limits):
+    """
+    为每个站点确定爬虫、占用的共享资源以及需要覆盖的配置项，返回 (计划列表, 被跳过的站点及原因)。
+    - 浏览器站点 (sehuatang) 各占 1 个浏览器名额；
+    - requests 站点按并发数占用 HTTP 名额，并发数超过 max_http 时压低流水线的 fetch_workers；
+    - 同一主机上的站点平分 per_host_rate，各站点取其与自身 request_delay 对应速率中较小者。
+    """
+    plans, skipped = [], []
+    for site in sites:
+        try:
+            config = load_config(site)
+        except SystemExit:
+            skipped.append((site, "配置文件无法加载"))
+            continue
+        scraper = detect_scraper(config)
+        if scraper is None:
+            skipped.append((site, "无法判断使用的爬虫 (可在配置中设置 scraper: sehuatang/javbee/nyaa)"))
+            continue
+        plans.append({'site': site, 'scraper': scraper, 'config': config,
+                      'host': urlparse(config.get('base_url', '')).hostname or site})
+
+    sites_per_host = Counter(p['host'] for p in plans if p['scraper'] != 'sehuatang')
+    for plan in plans:
+        config = plan.pop('config')
+        overrides = {}
+        if plan['scraper'] == 'sehuatang':
+            plan['browsers'], plan['http'] = 1, 0
+        else:
+            plan['browsers'] = 0
+            plan['http'] = min(_http_concurrency(config), limits['max_http'])
+            if get_pipeline_config(config) and plan['http'] < _http_concurrency(config):
+                overrides['pipeline'] = {**config['pipeline'], 'fetch_workers': plan['http']}
+            own_rate = 1.0 / max(config.get('request_delay', 1), 0.01)
+            share = limits['per_host_rate'] / sites_per_host[plan['host']]
+            plan['rate'] = round(min(own_rate, share), 3)
+            if share < own_rate:
+                overrides['request_delay'] = round(1.0 / share, 3)
+                overrides['rate_limit_per_second'] = share
+        plan['overrides'] = overrides
+    return plans, skipped
+
+class SharedBudget:
+    """多个站点共用的浏览器与 HTTP 并发名额: acquire() 等到所需名额全部空出后一次性占用"""
+    def __init__(self, max_browsers, max_http):
+        self.capacity = {'browsers': max(1, max_browsers), 'http': max(1, max_http)}
+        self.in_use = {'browsers': 0, 'http': 0}
+        self._cond = threading.Condition()
+
+    def _fits(self, need):
+        return all(self.in_use[k] + need[k] <= self.capacity[k] for k in need)
+
+    def acquire(self, browsers=0, http=0):
+        need = {'browsers': min(browsers, self.capacity['browsers']), 'http': min(http, self.capacity['http'])}
+        with self._cond:
+            self._cond.wait_for(lambda: self._fits(need))
+            for k in need:
+                self.in_use[k] += need[k]
+        return need
+
+    def release(self, need):
+        with self._cond:
+            for k in need:
+                self.in_use[k] -= need[k]
+            self._cond.notify_all()
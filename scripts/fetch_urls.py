@@ -1,13 +1,24 @@
-import argparse, os, logging, time
+import argparse, os, logging, time, re
 from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from utils import setup_driver, setup_logging, load_config
+from utils import setup_logging, load_config, config_fingerprint
 import database
+import budget
+from browser_pool import open_driver, close_driver
+from browser_health import BrowserHealthMonitor
+from run_metrics import RunMetrics
 
 logger = logging.getLogger(__name__)
 
+# 帖子 URL 中的 tid: thread-123456-1-1.html 或 forum.php?mod=viewthread&tid=123456
+THREAD_ID_PATTERN = re.compile(r'(?:thread-|[?&]tid=)(\d+)')
+
+def extract_thread_id(url):
+    match = THREAD_ID_PATTERN.search(url)
+    return int(match.group(1)) if match else None
+
 def extract_unique_urls(html_content, base_url, selectors):
     soup = BeautifulSoup(html_content, 'html.parser')
     thread_items = soup.select(selectors['thread_list_item'])
@@ -46,67 +57,267 @@ def fetch_html_with_selenium(url, driver, selectors):
         logger.error(f"页面加载失败: {url} - {e}")
         return None
 
+def compact_page_ranges(pages):
+    """[1, 2, 3, 7] -> '1-3,7'，作为检查点的抓取范围标识"""
+    parts = []
+    for page in sorted(set(pages)):
+        if parts and page == parts[-1][1] + 1:
+            parts[-1][1] = page
+        else:
+            parts.append([page, page])
+    return ','.join(f"{a}-{b}" if a != b else str(a) for a, b in parts)
+
 class Orchestrator:
-    def __init__(self, config, page_ranges, incremental_mode):
+    def __init__(self, config, page_ranges, incremental_mode, resume=False, auto_depth=False, metrics=None):
         self.config = config
         self.page_ranges = page_ranges
         self.incremental_mode = incremental_mode
+        self.resume = resume
+        self.auto_depth = auto_depth
+        # (mode, range_key)，增量模式只抓 1 页，不记录检查点
+        self.checkpoint = None
+        # 全站模式下本次运行时的总页数，随检查点保存，续跑时据此换算页码
+        self.total_pages = None
+        self.config_hash = config_fingerprint(config, ['base_url', 'fid', 'selectors'])
         self.driver = None
+        self.monitor = BrowserHealthMonitor(config)
         self.selectors = config['selectors']['fetch_urls']
+        self.stats = {'pages_fetched': 0, 'pages_failed': 0, 'urls_found': 0, 'urls_added': 0}
+        self.metrics = metrics or RunMetrics(config, 'fetch_urls')
+        # 收到停止请求 (预算超限) 后提前结束，检查点保留供 --resume 续跑
+        self.stopped = False
     def run(self):
         try:
-            self.driver = setup_driver()
-            if self.page_ranges: self._process_pages(self.page_ranges)
-            elif self.incremental_mode: self._process_pages([1])
+            self.driver = open_driver(self.config)
+            self.monitor.reset(self.driver)
+            if self.page_ranges:
+                self.checkpoint = ('pages', compact_page_ranges(self.page_ranges))
+                self._process_pages(self.page_ranges, auto_depth=self.auto_depth)
+            elif self.incremental_mode: self._process_incremental()
+            elif self.auto_depth:
+                # 未指定范围时，自动深度模式最多翻 auto_depth_max_pages 页
+                self._process_pages(list(range(1, self.config.get('auto_depth_max_pages', 50) + 1)), auto_depth=True)
             else:
-                first_page_url = f"{self.config['base_url']}/forum.php?mod=forumdisplay&fid={self.config.get('fid')}&page=1"
-                first_page_html = fetch_html_with_selenium(first_page_url, self.driver, self.selectors)
+                first_page_url = self._page_url(1)
+                first_page_html = self._fetch_page(first_page_url)
                 max_pages = extract_max_page(first_page_html, self.selectors)
                 logger.info(f"确定最大页码为 {max_pages}")
+                # 全站抓取的页码会随新帖增加而整体后移: 检查点记录当时的总页数，续跑时按总页数的变化换算已完成的页码
+                self.checkpoint = ('full', 'full')
+                self.total_pages = max_pages
                 self._process_pages(list(range(max_pages, 0, -1)))
         finally:
-            if self.driver: self.driver.quit()
-    def _process_pages(self, page_list):
+            if self.driver: close_driver(self.driver)
+    def _fetch_page(self, url):
+        """抓取一个列表页；浏览器越过健康阈值时先重启"""
+        reason, snap = self.monitor.check()
+        if reason:
+            logger.info(f"重启浏览器: {reason}。内存概况: {self.monitor.describe(snap)}")
+            close_driver(self.driver, healthy=False, reason=reason)
+            self.driver = open_driver(self.config)
+            self.monitor.reset(self.driver)
+        start = time.time()
+        with self.metrics.timer('fetch'):
+            html = fetch_html_with_selenium(url, self.driver, self.selectors)
+        if html:
+            self.monitor.record_page(time.time() - start)
+        return html
+
+    def _page_url(self, page_num):
+        return f"{self.config['base_url']}/forum.php?mod=forumdisplay&fid={self.config.get('fid')}&page={page_num}"
+
+    def _process_incremental(self):
+        """
+        增量模式: 以上次见过的最大帖子 tid 作为高水位标记，从第 1 页往后翻，
+        直到某页不再出现比标记更新的帖子为止 (最多 incremental_max_pages 页)。
+        没有标记时 (首次运行) 只抓第 1 页。
+        """
+        db_path = self.config['database_file']
+        source = self.config['site_name']
+        scope = f"fid:{self.config.get('fid')}"
+        use_mark = self.config.get('high_water_mark', True)
+        mark = database.get_high_water_mark(db_path, source, scope) if use_mark else None
+        mark = int(mark) if mark else None
+        max_pages = self.config.get('incremental_max_pages', 10) if mark else 1
+        logger.info(f"增量模式: 高水位 tid={mark or '无'}，最多抓取 {max_pages} 页。")
+
+        newest = mark
+        reached_mark = mark is None
+        for page_num in range(1, max_pages + 1):
+            target_url = self._page_url(page_num)
+            logger.info(f"正在抓取页面 ({page_num}/{max_pages}): {target_url}")
+            html = self._fetch_page(target_url)
+            if not html:
+                self.stats['pages_failed'] += 1
+                break
+            with self.metrics.timer('parse'):
+                page_urls = extract_unique_urls(html, self.config['base_url'], self.selectors)
+            self.stats['pages_fetched'] += 1
+            self.stats['urls_found'] += len(page_urls)
+            with self.metrics.timer('db'):
+                self.stats['urls_added'] += database.add_urls(db_path, page_urls, source)
+            budget.report_progress(pages=1, items=len(page_urls))
+
+            thread_ids = [tid for tid in map(extract_thread_id, page_urls) if tid]
+            if thread_ids:
+                newest = max([newest or 0] + thread_ids)
+            if mark is not None and not any(tid > mark for tid in thread_ids):
+                logger.info(f"第 {page_num} 页没有比高水位 (tid {mark}) 更新的帖子，停止翻页。")
+                reached_mark = True
+                break
+            if budget.stop_requested():
+                # 未衔接上次的位置，标记保持不变，下次运行会重新翻到这里
+                logger.warning(f"收到停止请求，增量抓取在第 {page_num} 页后停止，高水位标记保持不变。")
+                self.stopped = True
+                break
+        else:
+            if not reached_mark:
+                logger.warning(f"已抓取 {max_pages} 页仍未到达高水位标记，标记保持不变；如需补齐请使用 --page 指定范围。")
+
+        # 只有确认已衔接上次的位置且没有失败页时才推进标记，避免跳过未抓取的区间
+        if use_mark and reached_mark and not self.stats['pages_failed'] and newest and newest != mark:
+            database.set_high_water_mark(db_path, source, scope, newest)
+
+    def _load_completed_pages(self):
+        if not self.checkpoint or not self.resume:
+            return set()
+        mode, range_key = self.checkpoint
+        state = database.load_crawl_state(self.config['database_file'], self.config['site_name'], mode, range_key, self.config_hash)
+        if not state:
+            logger.info("没有可用的检查点，从头开始抓取。")
+            return set()
+        if mode == 'full':
+            return self._shift_completed_pages(state)
+        logger.info(f"从检查点续跑 ({state['updated_at']}): 已完成 {len(state['completed_pages'])} 页，上次停在第 {state['cursor']} 页。")
+        return state['completed_pages']
+
+    def _shift_completed_pages(self, state):
+        """
+        全站模式: 检查点之后的新帖会把旧帖子整体推到更大的页码上 (删帖则相反)，页码不能直接沿用。
+        按总页数的变化 shift 换算，总页数只能反映整页的偏移，实际偏移在 shift-1 到 shift 之间，
+        因此现在的第 p 页只有在原来的 p-shift-1 ~ p-shift+1 页都已完成时才跳过，边界页重新抓取。
+        """
+        cursor = state['cursor']
+        if not isinstance(cursor, dict) or not cursor.get('max_pages'):
+            logger.info("检查点没有记录总页数 (旧版本保存)，无法换算页码，从头开始抓取。")
+            return set()
+        old_max = cursor['max_pages']
+        shift = self.total_pages - old_max
+        done = state['completed_pages']
+        completed = set()
+        for page in range(1, self.total_pages + 1):
+            sources = [old for old in (page - shift - 1, page - shift, page - shift + 1) if 1 <= old <= old_max]
+            if (page - shift) in done and all(old in done for old in sources):
+                completed.add(page)
+        logger.info(f"从检查点续跑 ({state['updated_at']}): 当时共 {old_max} 页，现在 {self.total_pages} 页 (偏移 {shift:+d})，"
+                    f"已完成 {len(done)} 页，换算后跳过 {len(completed)} 页，上次停在原第 {cursor['page']} 页。")
+        return completed
+
+    def _save_checkpoint(self, completed_pages, cursor_page):
+        if not self.checkpoint: return
+        mode, range_key = self.checkpoint
+        cursor = {'page': cursor_page, 'max_pages': self.total_pages} if mode == 'full' else cursor_page
+        database.save_crawl_state(self.config['database_file'], self.config['site_name'], mode, range_key,
+                                  self.config_hash, completed_pages, cursor)
+
+    def _process_pages(self, page_list, auto_depth=False):
         all_urls_batch = []
         db_path = self.config['database_file']
-        for i, page_num in enumerate(sorted(list(page_list), reverse=True)):
-            target_url = f"{self.config['base_url']}/forum.php?mod=forumdisplay&fid={self.config.get('fid')}&page={page_num}"
-            logger.info(f"正在抓取页面 ({i+1}/{len(page_list)}): {target_url}")
-            html = fetch_html_with_selenium(target_url, self.driver, self.selectors)
-            if html: all_urls_batch.extend(extract_unique_urls(html, self.config['base_url'], self.selectors))
-            if (i + 1) % self.config.get('batch_pages', 10) == 0 or (i + 1 == len(page_list)):
+        completed_pages = self._load_completed_pages()
+        pending_pages = set()
+        if completed_pages:
+            page_list = [p for p in page_list if p not in completed_pages]
+            logger.info(f"跳过已完成的页面，剩余 {len(page_list)} 页。")
+        # 自动深度模式从最新的页面 (页码小) 往后翻，普通模式保持从旧到新
+        ordered_pages = sorted(page_list) if auto_depth else sorted(page_list, reverse=True)
+        batch_pages = self.config.get('batch_pages', 10)
+        stop_pages = self.config.get('auto_depth_stop_pages', 2)
+        consecutive_stale_pages = 0
+        for i, page_num in enumerate(ordered_pages):
+            target_url = self._page_url(page_num)
+            logger.info(f"正在抓取页面 ({i+1}/{len(ordered_pages)}): {target_url}")
+            html = self._fetch_page(target_url)
+            if html:
+                with self.metrics.timer('parse'):
+                    page_urls = extract_unique_urls(html, self.config['base_url'], self.selectors)
+                if auto_depth:
+                    # 与数据库及尚未提交的本批 URL 比较，判断本页是否带来新帖子
+                    batch_set = set(all_urls_batch)
+                    with self.metrics.timer('db'):
+                        new_urls = [u for u in database.filter_new_urls(db_path, self.config['site_name'], page_urls) if u not in batch_set]
+                    consecutive_stale_pages = 0 if new_urls else consecutive_stale_pages + 1
+                    logger.info(f"第 {page_num} 页新帖子: {len(new_urls)}/{len(page_urls)}，连续无新帖页数: {consecutive_stale_pages}/{stop_pages}")
+                all_urls_batch.extend(page_urls)
+                self.stats['pages_fetched'] += 1
+                self.stats['urls_found'] += len(page_urls)
+                pending_pages.add(page_num)
+                budget.report_progress(pages=1, items=len(page_urls))
+            else:
+                self.stats['pages_failed'] += 1
+            reached_depth = auto_depth and consecutive_stale_pages >= stop_pages
+            self.stopped = budget.stop_requested()
+            if (i + 1) % batch_pages == 0 or (i + 1 == len(ordered_pages)) or reached_depth or self.stopped:
                 if all_urls_batch:
-                    database.add_urls(db_path, all_urls_batch, self.config['site_name'])
+                    with self.metrics.timer('db'):
+                        self.stats['urls_added'] += database.add_urls(db_path, all_urls_batch, self.config['site_name'])
                     all_urls_batch = []
+                # 只有 URL 已提交的页面才算完成，失败页面在续跑时会重新抓取
+                completed_pages |= pending_pages
+                pending_pages = set()
+                self._save_checkpoint(completed_pages, page_num)
+            if reached_depth:
+                logger.info(f"已连续 {stop_pages} 页没有新帖子，自动深度模式在第 {page_num} 页停止 (跳过剩余 {len(ordered_pages) - i - 1} 页)。")
+                break
+            if self.stopped:
+                logger.warning(f"收到停止请求，已提交当前批次并保存检查点，在第 {page_num} 页停止 (剩余 {len(ordered_pages) - i - 1} 页可用 --resume 续跑)。")
+                break
+        if self.checkpoint and self.stats['pages_failed'] == 0 and not self.stopped:
+            database.clear_crawl_state(db_path, self.config['site_name'], self.checkpoint[0])
+            logger.info("抓取范围已全部完成，检查点已清除。")
 
-if __name__ == "__main__":
+def parse_page_range(page_str):
+    if not page_str: return None
+    pages = set()
+    for part in page_str.split(','):
+        part = part.strip()
+        if '-' in part:
+            try:
+                start, end = map(int, part.split('-'))
+                pages.update(range(start, end + 1))
+            except ValueError: logger.warning(f"无法解析: '{part}'")
+        else:
+            try: pages.add(int(part))
+            except ValueError: logger.warning(f"无法解析: '{part}'")
+    return list(pages)
+
+def main(argv=None):
+    """命令行入口；也可由 task_runner 在预热进程中直接调用，返回统计字典"""
     parser = argparse.ArgumentParser(description="抓取帖子 URL 并保存到指定数据库。")
     parser.add_argument("--site", "-s", required=True, help="网站标识")
     parser.add_argument("--page", help="指定页面范围")
     parser.add_argument("--incremental", action="store_true", help="增量模式")
-    args = parser.parse_args()
+    parser.add_argument("--resume", action="store_true", help="从上次中断的检查点继续 (抓取范围或配置变化时检查点自动失效)")
+    parser.add_argument("--auto-depth", action="store_true", help="自动深度: 从小页码往后翻，连续 auto_depth_stop_pages 页没有新帖子即停止")
+    args = parser.parse_args(argv)
 
     config = load_config(args.site)
     db_path = config['database_file']
     setup_logging(config['log_level'], config['site_name'], "fetch_urls")
     database.init_db(db_path)
-    
-    def parse_page_range(page_str):
-        if not page_str: return None
-        pages = set()
-        for part in page_str.split(','):
-            part = part.strip()
-            if '-' in part:
-                try:
-                    start, end = map(int, part.split('-'))
-                    pages.update(range(start, end + 1))
-                except ValueError: logger.warning(f"无法解析: '{part}'")
-            else:
-                try: pages.add(int(part))
-                except ValueError: logger.warning(f"无法解析: '{part}'")
-        return list(pages)
 
     page_ranges = parse_page_range(args.page)
-    orchestrator = Orchestrator(config=config, page_ranges=page_ranges, incremental_mode=args.incremental)
-    orchestrator.run()
-    logger.info("URL 抓取任务完成。")
+    metrics = RunMetrics(config, "fetch_urls", argv)
+    orchestrator = Orchestrator(config=config, page_ranges=page_ranges, incremental_mode=args.incremental, resume=args.resume,
+                                auto_depth=args.auto_depth, metrics=metrics)
+    try:
+        orchestrator.run()
+    finally:
+        stats = orchestrator.stats
+        # 运行记录按 新增/重复 统计 URL
+        run = metrics.finish({'ADDED': stats['urls_added'], 'DUPLICATE': stats['urls_found'] - stats['urls_added'],
+                              'total_found': stats['urls_found']})
+    logger.info(f"URL 抓取任务完成。统计: {orchestrator.stats}，吞吐: {metrics.describe(run)}")
+    return orchestrator.stats
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HTTP_CONFIG = {
+    'pool_connections': 10,
+    'pool_maxsize': 16,
+    'pool_block': True,
+    'retries': 3,
+    'backoff_factor': 0.5,
+    'backoff_jitter': 0.5,
+    'status_forcelist': [],
+}
+
+def get_http_config(config):
+    """
+    读取站点配置中的 http 段 (requests 的连接池与重试策略):
+        http:
+          pool_connections: 10   # 缓存连接池的主机数 (站点本身、图床、种子下载域名等)
+          pool_maxsize: 16       # 每个主机保持的 keep-alive 连接数，同时是每主机的并发连接上限
+          pool_block: true       # 连接用完时等待空闲连接，而不是临时新建再丢弃
+          retries: 3             # 连接错误/读取超时的重试次数
+          backoff_factor: 0.5    # 指数退避: 0.5s, 1s, 2s ...
+          backoff_jitter: 0.5    # 每次退避再加上 0~0.5s 的随机抖动，避免并发线程同时重试
+          status_forcelist: []   # 需要重试的状态码 (默认不重试，429/5xx 由各脚本的翻页逻辑与代理池处理)
+    """
+    return {**DEFAULT_HTTP_CONFIG, **(config.get('http') or {})}
+
+def build_retry(settings):
+    # 只重试幂等的 GET/HEAD；状态码重试结束后返回最后一次响应，由调用方 raise_for_status
+    return Retry(
+        total=settings['retries'],
+        connect=settings['retries'],
+        read=settings['retries'],
+        status=settings['retries'] if settings['status_forcelist'] else 0,
+        status_forcelist=settings['status_forcelist'] or None,
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        backoff_factor=settings['backoff_factor'],
+        backoff_jitter=settings['backoff_jitter'],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+def build_session(settings, headers=None):
+    """
+    新建按 settings 调整过连接池与重试策略的 session。
+    Accept-Encoding 使用 requests 的默认值 (gzip/deflate，安装 brotli/zstandard 时自动加入 br/zstd)，不要覆盖。
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=settings['pool_connections'], pool_maxsize=settings['pool_maxsize'],
+                          pool_block=settings['pool_block'], max_retries=build_retry(settings))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(config, headers=None):
+    """
+    同一进程内同一站点共用一个 session: 列表页、.torrent 下载与多日并发的各下载器复用同一组 keep-alive 连接。
+    headers 在首次创建时设置；各请求不同的头 (如 Referer) 应在请求时传入，不要修改共享 session 的 headers。
+    """
+    settings = get_http_config(config)
+    with _sessions_lock:
+        entry = _sessions.get(config['site_name'])
+        if entry is None or entry[0] != settings:
+            entry = _sessions[config['site_name']] = (settings, build_session(settings, headers))
+            logger.debug(f"[{config['site_name']}] 新建 HTTP session: {settings}")
+        return entry[1]
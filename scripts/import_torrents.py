@@ -0,0 +1,171 @@
+import argparse
+import os
+import time
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import bencodepy
+
+import database
+import budget
+from utils import setup_logging, load_config, normalize_date, parse_tags_from_title, extract_item_number
+
+logger = logging.getLogger(__name__)
+
+def find_torrent_files(root_dir):
+    """递归遍历目录，返回所有 .torrent 文件的绝对路径"""
+    paths = []
+    for dirpath, _, filenames in os.walk(root_dir):
+        for name in filenames:
+            if name.lower().endswith('.torrent'):
+                paths.append(os.path.abspath(os.path.join(dirpath, name)))
+    return sorted(paths)
+
+def read_torrent_meta(torrent_path):
+    """
+    解析单个 .torrent 文件 (在进程池中执行)。
+    info_hash 的计算方式与 JavbeeDownloader.torrent_to_magnet 保持一致。
+    """
+    try:
+        with open(torrent_path, 'rb') as f:
+            metadata = bencodepy.decode(f.read())
+        info_data = metadata[b'info']
+        info_hash = hashlib.sha1(bencodepy.encode(info_data)).hexdigest()
+
+        name = info_data.get(b'name.utf-8') or info_data.get(b'name', b'')
+        try:
+            title = name.decode('utf-8')
+        except UnicodeDecodeError:
+            title = name.decode('utf-8', errors='replace')
+
+        # 多文件种子: 对文件列表求和；单文件种子: 直接取 length
+        if b'files' in info_data:
+            size_bytes = sum(item.get(b'length', 0) for item in info_data[b'files'])
+        else:
+            size_bytes = info_data.get(b'length', 0)
+
+        return {
+            'path': torrent_path,
+            'info_hash': info_hash,
+            'title': title or os.path.splitext(os.path.basename(torrent_path))[0],
+            'size_bytes': size_bytes,
+            'creation_date': metadata.get(b'creation date'),
+        }
+    except Exception as e:
+        return {'path': torrent_path, 'error': str(e)}
+
+def build_record(meta, tag_rules):
+    """将解析结果转换为 add_processed_posts_bulk 需要的 (details, tags)"""
+    title = meta['title']
+    details = {
+        'post_url': f"file://{meta['path']}",
+        'title': title,
+        'date': normalize_date(meta['creation_date']) if meta.get('creation_date') else None,
+        'size': database.format_size_bytes(meta['size_bytes']),
+        'size_bytes': meta['size_bytes'],
+        'item_number': extract_item_number(title),
+        'magnet_link': f"magnet:?xt=urn:btih:{meta['info_hash']}&dn={title}",
+        'cover_image_url': '',
+    }
+    return details, parse_tags_from_title(title, tag_rules)
+
+def import_directory(config, torrent_dir, workers=None, batch_size=500):
+    db_path = config['database_file']
+    source = config['site_name']
+    tag_rules = config.get('tag_rules', {})
+    stats = {'ADDED': 0, 'DUPLICATE': 0, 'FAILED': 0, 'total_found': 0}
+
+    paths = find_torrent_files(torrent_dir)
+    stats['total_found'] = len(paths)
+    logger.info(f"在 {torrent_dir} 中发现 {len(paths)} 个 .torrent 文件。")
+    if not paths:
+        return stats
+
+    batch = []
+    seen_hashes = set()
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for meta in pool.map(read_torrent_meta, paths, chunksize=64):
+            processed += 1
+            if 'error' in meta:
+                logger.error(f"解析 .torrent 失败: {meta['path']} - {meta['error']}")
+                stats['FAILED'] += 1
+            elif meta['info_hash'] in seen_hashes:
+                # 同一批归档中的重复种子，无需交给数据库判断
+                stats['DUPLICATE'] += 1
+            else:
+                seen_hashes.add(meta['info_hash'])
+                batch.append(build_record(meta, tag_rules))
+
+            if len(batch) >= batch_size:
+                for result in database.add_processed_posts_bulk(db_path, source, batch):
+                    stats[result] += 1
+                budget.report_progress(items=len(batch))
+                batch = []
+                logger.info(f"已处理 {processed}/{len(paths)} 个文件...")
+                if budget.stop_requested():
+                    logger.warning(f"收到停止请求，已提交 {processed}/{len(paths)} 个文件，其余文件不再解析 (重新导入时已导入的种子按重复跳过)。")
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    break
+
+    if batch:
+        for result in database.add_processed_posts_bulk(db_path, source, batch):
+            stats[result] += 1
+    return stats
+
+def main(argv=None):
+    """命令行入口；也可由 task_runner 在预热进程中直接调用，返回统计字典"""
+    parser = argparse.ArgumentParser(description="批量导入本地 .torrent 文件目录到指定数据库。")
+    parser.add_argument("--site", "-s", required=True, help="网站标识")
+    parser.add_argument("--dir", "-d", required=True, help=".torrent 文件所在目录 (递归扫描)")
+    parser.add_argument("--workers", type=int, default=None, help="解析进程数 (默认: CPU 核数)")
+    parser.add_argument("--batch-size", type=int, default=500, help="每个数据库事务写入的记录数 (默认: 500)")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.site)
+    db_path = config['database_file']
+    setup_logging(config['log_level'], config['site_name'], "import_torrents")
+    database.init_db(db_path)
+
+    if not os.path.isdir(args.dir):
+        logger.error(f"目录不存在: {args.dir}")
+        return None
+
+    stats = {'ADDED': 0, 'DUPLICATE': 0, 'FAILED': 0, 'total_found': 0}
+    start_time = time.time()
+    try:
+        stats = import_directory(config, args.dir, args.workers, args.batch_size)
+    finally:
+        end_time = time.time()
+        duration = end_time - start_time
+        total_in_db = database.get_total_count(db_path)
+
+        width = 62
+        title = " 种子导入总结 "
+        top_line = f"{title:=^{width}}"
+        bottom_line = "=" * width
+        summary = f"""
+        \n{top_line}
+        - 目标网站: {config['site_name']}
+        - 导入目录: {os.path.abspath(args.dir)}
+        - 开始时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}
+        - 结束时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}
+        - 总耗时: {time.strftime('%H时%M分%S秒', time.gmtime(duration))}
+
+        --- 处理结果 ---
+        - 发现种子文件: {stats['total_found']}
+        - ✅ 成功新增记录: {stats['ADDED']}
+        - ⏩ 检测到重复记录: {stats['DUPLICATE']}
+        - ❌ 解析/写入失败: {stats['FAILED']}
+
+        --- 数据库状态 ---
+        - 数据库文件: {db_path}
+        - 数据库总记录数: {total_in_db}
+        \n{bottom_line}
+        """
+        logger.info(summary)
+    return stats
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from fanout import select_sites
+from utils import load_config
+
+logger = logging.getLogger(__name__)
+
+OVERLAP_POLICIES = ('queue', 'skip', 'coalesce')
+
+DEFAULT_SCHEDULING_CONFIG = {
+    'overlap_policy': 'coalesce',
+    'max_queued': 5,
+}
+
+# 使用 Selenium 的任务，受 max_browser_jobs 全局上限约束 (run_all 包含色花堂站点)
+BROWSER_TASKS = {'sehuatang', 'run_all'}
+
+# 一次运行多个站点的任务: 没有对应的站点配置，按默认策略调度，同一时间只运行一个，
+# 运行期间同时占用它将运行的各站点 (见 task_sites)
+MULTI_SITE_TASKS = {'run_all'}
+
+# 与所属站点的抓取任务并行运行的任务: 使用单独的执行器键 "<前缀>:<站点>"
+# (spool_load --follow 常驻入库，不能占住站点让该站点的抓取一直排队)
+SEPARATE_SLOT_TASKS = {'spool_load': 'spool'}
+
+# 未指定 --site 时 run_task.py 各命令使用的默认站点
+DEFAULT_TASK_SITES = {'sehuatang': 'sehuatang', 'javbee': 'javbee', 'nyaa': 'nyaa', 'retag': 'javbee', 'import_torrents': 'javbee', 'spool_load': 'nyaa'}
+
+def get_scheduling_config(config):
+    """
+    读取站点配置中的 scheduling 段:
+        scheduling:
+          overlap_policy: coalesce  # 同一站点已有任务在运行时: queue 排队 / skip 丢弃 / coalesce 与相同的等待任务合并 (不同的任务照常排队)
+          max_queued: 5             # queue/coalesce 策略下该站点最多排队的任务数
+    """
+    settings = {**DEFAULT_SCHEDULING_CONFIG, **(config.get('scheduling') or {})}
+    if settings['overlap_policy'] not in OVERLAP_POLICIES:
+        logger.warning(f"未知的 overlap_policy '{settings['overlap_policy']}'，使用 {DEFAULT_SCHEDULING_CONFIG['overlap_policy']}。")
+        settings['overlap_policy'] = DEFAULT_SCHEDULING_CONFIG['overlap_policy']
+    return settings
+
+def task_site(task_type, task_args):
+    """任务作用的站点 (即写入的数据库)，与 run_task.py 的参数解析规则一致"""
+    args = list(task_args or [])
+    if task_type == 'retag':
+        return args[0] if args else DEFAULT_TASK_SITES['retag']
+    if "--site" in args and args.index("--site") + 1 < len(args):
+        return args[args.index("--site") + 1]
+    return DEFAULT_TASK_SITES.get(task_type, task_type)
+
+def _option(args, name):
+    """从参数列表中取出 --name 值 (或 --name=值) 形式的参数，没有时返回 None"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            return args[i + 1]
+        if arg.startswith(f"{name}="):
+            return arg.split('=', 1)[1]
+    return None
+
+def task_sites(task_type, task_args):
+    """
+    任务运行期间占用的执行器站点: 普通任务为 task_site，SEPARATE_SLOT_TASKS 为 "<前缀>:<站点>"；
+    run_all 为其自身以及它将运行的全部站点 (与 run_task.task_run_all 的 --sites/--exclude 规则一致)
+    """
+    site = task_site(task_type, task_args)
+    if task_type in SEPARATE_SLOT_TASKS:
+        return [f"{SEPARATE_SLOT_TASKS[task_type]}:{site}"]
+    if task_type not in MULTI_SITE_TASKS:
+        return [site]
+    args = list(task_args or [])
+    return [site] + select_sites(_option(args, '--sites'), _option(args, '--exclude'))
+
+def _site_scheduling_config(site):
+    if site in MULTI_SITE_TASKS:
+        return dict(DEFAULT_SCHEDULING_CONFIG)
+    try:
+        return get_scheduling_config(load_config(site))
+    except SystemExit:
+        # 配置文件不存在时任务本身会失败，这里按默认策略排队即可
+        return dict(DEFAULT_SCHEDULING_CONFIG)
+
+class Job:
+    def __init__(self, task_type, task_args, site, source):
+        self.task_type = task_type
+        self.task_args = list(task_args or [])
+        self.site = site
+        self.sites = task_sites(task_type, task_args)
+        self.source = source
+        self.is_browser = task_type in BROWSER_TASKS
+        self.submitted_at = time.time()
+        self.coalesced = 0
+
+    def describe(self):
+        return {'task': self.task_type, 'args': self.task_args, 'site': self.site, 'source': self.source,
+                'browser': self.is_browser, 'coalesced': self.coalesced,
+                'submitted_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.submitted_at))}
+
+class JobExecutor:
+    """
+    异步任务执行器: submit() 立即返回，任务在后台线程中通过 run_func(task_type, task_args) 执行
+    (run_task.run_command，各阶段在预热工作进程中运行)，调度器线程不再被整个抓取过程占用。
+    - 同一站点同时只运行一个任务 (共用同一个 SQLite 文件)，重叠时按站点的 overlap_policy 排队/丢弃/合并；
+      run_all 同时占用它将运行的各站点，与这些站点的单独任务互斥；
+    - 使用浏览器的任务同时最多 max_browser_jobs 个，所有任务同时最多 max_jobs 个，超出的排队等待。
+    """
+    def __init__(self, run_func, max_jobs=4, max_browser_jobs=1, history=50):
+        self.run_func = run_func
+        self.max_jobs = max(1, max_jobs)
+        self.max_browser_jobs = max(1, max_browser_jobs)
+        self._lock = threading.Lock()
+        self._running = {}    # site -> Job (run_all 以其占用的每个站点为键各登记一次)
+        self._pending = []    # 按提交顺序等待的 Job
+        self.results = deque(maxlen=history)
+
+    def submit(self, task_type, task_args=None, source='manual', policy=None):
+        """
+        提交任务，返回 (状态, 说明)。状态为:
+          started 已开始 / queued 排队等待 / coalesced 与已在等待的相同任务 (类型与参数一致) 合并 / skipped 已丢弃
+        """
+        site = task_site(task_type, task_args)
+        job = Job(task_type, task_args, site, source)
+        settings = _site_scheduling_config(site)
+        policy = policy or settings['overlap_policy']
+        with self._lock:
+            waiting = [j for j in self._pending if set(j.sites) & set(job.sites)]
+            # 只与同一任务站点 (同为 run_all 或同一站点) 的等待任务合并/计数
+            same_site = [j for j in waiting if j.site == site]
+            # 只合并完全相同的任务 (类型与参数一致)，不同的任务不能被替换掉
+            same_task = [j for j in same_site if j.task_type == job.task_type and j.task_args == job.task_args]
+            if any(s in self._running for s in job.sites) or waiting:
+                if policy == 'skip':
+                    status = 'skipped'
+                elif policy == 'coalesce' and same_task:
+                    same_task[0].coalesced += 1
+                    status = 'coalesced'
+                elif len(same_site) >= settings['max_queued']:
+                    status = 'skipped'
+                else:
+                    self._pending.append(job)
+                    status = 'queued'
+            else:
+                self._pending.append(job)
+                status = 'queued'
+            started = self._dispatch_locked()
+        if job in started:
+            status = 'started'
+        message = {
+            'started': f"站点 {site} 的任务已开始",
+            'queued': f"站点 {site} 已有任务在运行或已达并发上限，已排队等待",
+            'coalesced': f"站点 {site} 已有相同的任务在等待，已与之合并",
+            'skipped': f"站点 {site} 已有任务在运行或等待，本次触发已丢弃 (策略: {policy})",
+        }[status]
+        log = logger.warning if status == 'skipped' else logger.info
+        log(f"[{source}] {task_type} {' '.join(job.task_args)}: {message}")
+        return status, message
+
+    def _dispatch_locked(self):
+        """按提交顺序启动所有满足条件的等待任务，调用方需持有锁"""
+        started = []
+        running = self._running_jobs()
+        browser_running = sum(1 for j in running if j.is_browser)
+        # 排在前面、仍在等待的任务占用的站点: 后提交的重叠任务不能越过它先启动
+        blocked = set()
+        for job in list(self._pending):
+            if len(running) >= self.max_jobs:
+                break
+            if any(s in self._running or s in blocked for s in job.sites) or (
+                    job.is_browser and browser_running >= self.max_browser_jobs):
+                blocked.update(job.sites)
+                continue
+            self._pending.remove(job)
+            for s in job.sites:
+                self._running[s] = job
+            running.append(job)
+            browser_running += job.is_browser
+            started.append(job)
+            threading.Thread(target=self._run, args=(job,), name=f"job-{job.site}", daemon=True).start()
+        return started
+
+    def _run(self, job):
+        started_at = time.time()
+        try:
+            result = self.run_func(job.task_type, job.task_args)
+        except Exception as e:
+            logger.error(f"任务 {job.task_type} ({job.site}) 异常: {e}")
+            result = {'task': job.task_type, 'ok': False, 'error': str(e), 'stages': []}
+        finished_at = time.time()
+        with self._lock:
+            for s in job.sites:
+                if self._running.get(s) is job:
+                    del self._running[s]
+            self.results.appendleft({**(result or {'task': job.task_type, 'ok': False, 'stages': []}), **job.describe(),
+                                     'queued_seconds': round(started_at - job.submitted_at, 3),
+                                     'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started_at)),
+                                     'finished_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(finished_at))})
+            self._dispatch_locked()
+
+    def _running_jobs(self):
+        """正在运行的任务 (去掉 run_all 在多个站点下的重复登记)，调用方需持有锁"""
+        return list({id(j): j for j in self._running.values()}.values())
+
+    def status(self):
+        with self._lock:
+            return {
+                'max_jobs': self.max_jobs,
+                'max_browser_jobs': self.max_browser_jobs,
+                'running': [j.describe() for j in self._running_jobs()],
+                'pending': [j.describe() for j in self._pending],
+            }
+
+_executor = None
+
+def init_executor(run_func, max_jobs=None, max_browser_jobs=None):
+    """创建进程内共享的执行器；上限默认读取 MAGNETO_MAX_JOBS / MAGNETO_MAX_BROWSER_JOBS 环境变量"""
+    global _executor
+    _executor = JobExecutor(
+        run_func,
+        max_jobs=max_jobs or int(os.environ.get("MAGNETO_MAX_JOBS", "4")),
+        max_browser_jobs=max_browser_jobs or int(os.environ.get("MAGNETO_MAX_BROWSER_JOBS", "1")),
+    )
+    return _executor
+
+def get_executor():
+    return _executor
+
+def run_scheduled_job(task_type, task_args=None):
+    """APScheduler 的任务函数: 只提交到执行器，立即返回"""
+    if _executor is None:
+        logger.error(f"任务执行器尚未初始化，定时任务 {task_type} 未执行。")
+        return None
+    return _executor.submit(task_type, task_args, source='scheduler')[0]
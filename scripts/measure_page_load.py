@@ -0,0 +1,89 @@
+import argparse
+import time
+import logging
+
+from browser import setup_driver, build_blocked_url_patterns, get_browser_options
+from utils import setup_logging, load_config
+
+logger = logging.getLogger(__name__)
+
+# 通过 Performance API 汇总导航与子资源的传输字节数、耗时
+PAGE_METRICS_JS = """
+const nav = performance.getEntriesByType('navigation')[0] || {};
+const resources = performance.getEntriesByType('resource');
+let resourceBytes = 0;
+for (const r of resources) { resourceBytes += (r.transferSize || 0); }
+return {
+    dom_content_loaded_ms: nav.domContentLoadedEventEnd || 0,
+    load_ms: nav.loadEventEnd || nav.duration || 0,
+    document_bytes: nav.transferSize || 0,
+    resource_bytes: resourceBytes,
+    resource_count: resources.length,
+};
+"""
+
+def measure_url(driver, url):
+    """加载单个页面，返回墙钟耗时与 Performance API 指标"""
+    start = time.time()
+    driver.get(url)
+    wall_ms = (time.time() - start) * 1000
+    metrics = driver.execute_script(PAGE_METRICS_JS) or {}
+    metrics['wall_ms'] = wall_ms
+    metrics['total_bytes'] = metrics.get('document_bytes', 0) + metrics.get('resource_bytes', 0)
+    return metrics
+
+def measure(config, urls, repeat, lean):
+    """用完整加载或精简加载的浏览器依次测量所有 URL，返回每个 URL 的平均指标"""
+    driver = setup_driver(config, lean=lean)
+    results = {}
+    try:
+        # 关闭缓存，保证多次测量的字节数可比
+        driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+        for url in urls:
+            samples = []
+            for _ in range(repeat):
+                try:
+                    samples.append(measure_url(driver, url))
+                except Exception as e:
+                    logger.error(f"测量 {url} 失败: {e}")
+            if samples:
+                results[url] = {key: sum(s.get(key, 0) for s in samples) / len(samples) for key in samples[0]}
+    finally:
+        driver.quit()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="对比完整加载与精简加载 (资源屏蔽) 下的页面字节数和耗时。")
+    parser.add_argument("--site", "-s", required=True, help="网站标识 (读取其 browser 配置)")
+    parser.add_argument("--url", action="append", help="要测量的页面 URL，可重复指定；默认使用配置中的 base_url")
+    parser.add_argument("--repeat", type=int, default=3, help="每个页面的测量次数 (默认: 3)")
+    args = parser.parse_args()
+
+    config = load_config(args.site)
+    setup_logging(config['log_level'], config['site_name'], "measure_page_load")
+    urls = args.url or [config['base_url']]
+    patterns = build_blocked_url_patterns(get_browser_options(config))
+    logger.info(f"精简模式屏蔽规则 {len(patterns)} 条，每个页面测量 {args.repeat} 次。")
+
+    full = measure(config, urls, args.repeat, lean=False)
+    lean = measure(config, urls, args.repeat, lean=True)
+
+    width = 62
+    lines = [f"{' 页面加载测量结果 ':=^{width}}"]
+    for url in urls:
+        if url not in full or url not in lean:
+            lines.append(f"- {url}: 测量失败")
+            continue
+        f, l = full[url], lean[url]
+        saved_bytes = f['total_bytes'] - l['total_bytes']
+        saved_ms = f['wall_ms'] - l['wall_ms']
+        ratio = (saved_bytes / f['total_bytes'] * 100) if f['total_bytes'] else 0
+        lines.append(f"- {url}")
+        lines.append(f"    完整加载: {f['total_bytes'] / 1024:.1f} KiB, {f['resource_count']:.0f} 个资源, {f['wall_ms']:.0f} ms")
+        lines.append(f"    精简加载: {l['total_bytes'] / 1024:.1f} KiB, {l['resource_count']:.0f} 个资源, {l['wall_ms']:.0f} ms")
+        lines.append(f"    节省: {saved_bytes / 1024:.1f} KiB ({ratio:.1f}%), {saved_ms:.0f} ms")
+    lines.append("=" * width)
+    logger.info("\n" + "\n".join(lines))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_SENTINEL = object()
+
+DEFAULT_PIPELINE_CONFIG = {"fetch_workers": 2, "parse_workers": 2, "queue_size": 4}
+
+def get_pipeline_config(config, force=False):
+    """
+    读取站点配置中的 pipeline 段，未启用时返回 None。
+    配置示例:
+        pipeline:
+          enabled: true
+          fetch_workers: 2
+          parse_workers: 2
+          queue_size: 4
+    """
+    raw = config.get('pipeline') or {}
+    if not force and not raw.get('enabled'):
+        return None
+    return {**DEFAULT_PIPELINE_CONFIG, **{k: v for k, v in raw.items() if k != 'enabled'}}
+
+class PagePipeline:
+    """
+    分页抓取流水线: 抓取线程 -> 解析线程池 -> 单一数据库写入 (调用 run 的线程)。
+
+    - fetch_func(page_num) -> 原始内容，失败返回 None
+    - parse_func(page_num, raw) -> 记录列表 [(details, tags), ...]，失败/空页返回 None 或 []
+    - write_func(page_num, records) -> 'CONTINUE' 或 'STOP'
+
+    写入阶段严格按页码顺序执行，保证“连续重复”等判断与顺序抓取一致。
+    各阶段之间为有界队列，同时用信号量限制在途页面总数，内存占用不随页数增长；
+    write_func 返回 'STOP' 后，抓取线程不再领取新页面，已在途的页面被丢弃。
+    """
+    def __init__(self, fetch_func, parse_func, write_func, fetch_workers=2, parse_workers=2, queue_size=4):
+        self.fetch_func = fetch_func
+        self.parse_func = parse_func
+        self.write_func = write_func
+        self.fetch_workers = max(1, int(fetch_workers))
+        self.parse_workers = max(1, int(parse_workers))
+        self.queue_size = max(1, int(queue_size))
+
+        self._stop = threading.Event()
+        self._page_lock = threading.Lock()
+        self._next_page = None
+        self._end_page = None
+        self._in_flight = threading.Semaphore(self.fetch_workers + self.parse_workers + 2 * self.queue_size)
+        self._fetched_queue = queue.Queue(maxsize=self.queue_size)
+        self._parsed_queue = queue.Queue(maxsize=self.queue_size)
+
+    def stop(self):
+        self._stop.set()
+
+    def _take_page(self):
+        with self._page_lock:
+            if self._stop.is_set() or self._next_page > self._end_page:
+                return None
+            page_num = self._next_page
+            self._next_page += 1
+            return page_num
+
+    def _fetch_worker(self):
+        while True:
+            self._in_flight.acquire()
+            page_num = self._take_page()
+            if page_num is None:
+                self._in_flight.release()
+                return
+            try:
+                raw = self.fetch_func(page_num)
+            except Exception as e:
+                logger.error(f"[流水线] 抓取第 {page_num} 页出错: {e}")
+                raw = None
+            self._fetched_queue.put((page_num, raw))
+
+    def _parse_worker(self):
+        while True:
+            item = self._fetched_queue.get()
+            if item is _SENTINEL:
+                return
+            page_num, raw = item
+            records = None
+            if raw is not None and not self._stop.is_set():
+                try:
+                    records = self.parse_func(page_num, raw)
+                except Exception as e:
+                    logger.error(f"[流水线] 解析第 {page_num} 页出错: {e}")
+            self._parsed_queue.put((page_num, records))
+
+    def _close_stages(self, fetchers, parsers):
+        for t in fetchers: t.join()
+        for _ in parsers: self._fetched_queue.put(_SENTINEL)
+        for t in parsers: t.join()
+        self._parsed_queue.put(_SENTINEL)
+
+    def run(self, start_page, end_page=float('inf')):
+        """运行流水线直到页码耗尽或收到停止信号，返回最后一个写入的页码"""
+        self._next_page = start_page
+        self._end_page = end_page
+        fetchers = [threading.Thread(target=self._fetch_worker, name=f"fetch-{i}", daemon=True) for i in range(self.fetch_workers)]
+        parsers = [threading.Thread(target=self._parse_worker, name=f"parse-{i}", daemon=True) for i in range(self.parse_workers)]
+        for t in fetchers + parsers: t.start()
+        closer = threading.Thread(target=self._close_stages, args=(fetchers, parsers), name="pipeline-closer", daemon=True)
+        closer.start()
+
+        pending = {}
+        expected = start_page
+        last_written = None
+        try:
+            while True:
+                item = self._parsed_queue.get()
+                if item is _SENTINEL:
+                    break
+                page_num, records = item
+                pending[page_num] = records
+                # 按页码顺序写入；乱序到达的页面暂存，等待前序页面
+                while expected in pending:
+                    records = pending.pop(expected)
+                    if not self._stop.is_set():
+                        if self.write_func(expected, records) == 'STOP':
+                            logger.info(f"[流水线] 第 {expected} 页触发停止信号，取消后续抓取。")
+                            self._stop.set()
+                        last_written = expected
+                    expected += 1
+                    self._in_flight.release()
+        finally:
+            self._stop.set()
+            # 写入端异常退出时继续排空队列，避免上游线程阻塞在 put 上
+            while closer.is_alive():
+                try:
+                    if self._parsed_queue.get(timeout=0.1) is not _SENTINEL:
+                        self._in_flight.release()
+                except queue.Empty:
+                    pass
+        return last_written
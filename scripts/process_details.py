@@ -10,8 +10,13 @@ from urllib.parse import urljoin
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from utils import setup_driver, setup_logging, load_config, normalize_date, parse_tags_from_title
+from utils import setup_logging, load_config, normalize_date, parse_tags_from_title
 import database
+import budget
+from browser_pool import open_driver, close_driver
+from browser_health import BrowserHealthMonitor
+from artifact_store import FailureArtifactStore
+from run_metrics import RunMetrics
 
 logger = logging.getLogger(__name__)
 
@@ -78,7 +83,7 @@ def extract_data(html_content, url, selectors, base_url, tag_rules):
         logger.error(f"提取数据失败: {url} - {e}", exc_info=True)
         return None, None
 
-def fetch_html_selenium(url, driver, selectors):
+def fetch_html_selenium(url, driver, selectors, artifact_store=None):
     try:
         driver.get(url)
         time.sleep(0.5)
@@ -99,95 +104,151 @@ def fetch_html_selenium(url, driver, selectors):
 
     except Exception as e:
         logger.error(f"[Selenium] 失败: {url} - {e}")
-        timestamp = time.strftime('%Y%m%d_%H%M%S')
-        
-        # 1. 保存截图
-        try:
-            img_path = os.path.join("logs", f"failed_process_{timestamp}.png")
-            driver.save_screenshot(img_path)
-            logger.error(f"失败截图已保存: {img_path}")
-        except Exception as se:
-            logger.error(f"保存截图失败: {se}")
-            
-        # 2. 【新增】保存 HTML 源码用于调试
-        try:
-            html_path = os.path.join("logs", f"failed_source_{timestamp}.html")
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(driver.page_source)
-            logger.error(f"失败页面源码已保存: {html_path}")
-        except Exception as se:
-            logger.error(f"保存源码失败: {se}")
-            
+        # 保存失败现场 (压缩源码 + 抽样截图)，便于在后台按 URL 查看
+        if artifact_store:
+            artifact_store.record(url, f"页面加载失败: {type(e).__name__}", driver=driver)
         return None
 
-def main():
-    BROWSER_RESTART_INTERVAL = 25
+def producer_running(marker):
+    """
+    上游是否仍在抓取: 标记文件存在，且文件名末尾记录的编排进程 (run_task.py / app) 仍在运行。
+    编排进程被 SIGKILL/SIGTERM 或重启时来不及删除标记，以进程是否存在为准。
+    """
+    if not marker or not os.path.exists(marker):
+        return False
+    try:
+        pid = int(os.path.basename(marker).rsplit('_', 1)[1])
+    except (IndexError, ValueError):
+        return True
+    try:
+        alive = psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        alive = False
+    if not alive:
+        logger.warning(f"编排进程 {pid} 已退出但标记文件仍在，视为上游已结束: {marker}")
+        try: os.remove(marker)
+        except OSError: pass
+        return False
+    return True
+
+def iter_pending_urls(db_path, source, retry_failed=False, follow_marker=None, poll_interval=5):
+    """
+    逐批产出待处理的 URL。
+    上游 fetch_urls 仍在抓取期间 (见 producer_running)，处理完当前批次后
+    继续轮询数据库中新提交的 URL；标记文件删除或编排进程退出后再查询最后一轮即结束。
+    """
+    get_urls = database.get_failed_urls if retry_failed else database.get_unprocessed_urls
+    seen = set()
+    while True:
+        running = producer_running(follow_marker)
+        batch = [url for url in get_urls(db_path, source) if url not in seen]
+        if batch:
+            seen.update(batch)
+            yield batch
+        elif running:
+            time.sleep(poll_interval)
+        else:
+            return
+
+def main(argv=None):
+    """命令行入口；也可由 task_runner 在预热进程中直接调用，返回统计字典"""
     parser = argparse.ArgumentParser(description="从数据库读取URL并抓取详情。")
     parser.add_argument("--site", "-s", required=True, help="网站标识")
     parser.add_argument("--retry-failed", action="store_true", help="专门重试之前处理失败的任务")
-    args = parser.parse_args()
+    parser.add_argument("--follow", metavar="MARKER", help="流式模式: 标记文件存在期间持续处理上游新提交的 URL")
+    args = parser.parse_args(argv)
 
     config = load_config(args.site)
     db_path = config['database_file']
     setup_logging(config['log_level'], config['site_name'], "process_details")
     database.init_db(db_path)
     
+    stats = {'UPDATED': 0, 'DUPLICATE': 0, 'FAILED': 0, 'planned': 0}
     if args.retry_failed:
         logger.info(f"开始为 '{config['site_name']}' [重试失败任务], 数据存入 '{db_path}'")
-        urls_to_process = database.get_failed_urls(db_path, config['site_name'])
-        if not urls_to_process:
+        if not database.get_failed_urls(db_path, config['site_name']):
             logger.info("数据库中没有需要重试的失败任务。")
-            return
-        logger.info(f"发现 {len(urls_to_process)} 个失败任务需要重试。")
+            return stats
+    elif args.follow:
+        logger.info(f"开始为 '{config['site_name']}' [流式处理新任务], 上游标记: {args.follow}, 数据存入 '{db_path}'")
     else:
         logger.info(f"开始为 '{config['site_name']}' [处理新任务], 数据存入 '{db_path}'")
-        urls_to_process = database.get_unprocessed_urls(db_path, config['site_name'])
-        if not urls_to_process:
+        if not database.get_unprocessed_urls(db_path, config['site_name']):
             logger.info("数据库中没有待处理的新任务。")
-            return
-        logger.info(f"发现 {len(urls_to_process)} 个待处理的新任务。")
+            return stats
 
-    stats = {'UPDATED': 0, 'DUPLICATE': 0, 'FAILED': 0}
     start_time = time.time()
+    metrics = RunMetrics(config, "process_details", argv)
     
     selectors = config['selectors']['process_details']
     tag_rules = config.get('tag_rules', {})
     driver = None
-    processed_in_session = 0 
+    monitor = BrowserHealthMonitor(config)
+    artifact_store = FailureArtifactStore(config)
     parent_process = psutil.Process(os.getpid())
 
+    processed = 0
+    pending_batches = iter_pending_urls(db_path, config['site_name'], args.retry_failed,
+                                        args.follow, config.get('follow_poll_interval', 5))
+
     try:
-        for i, url in enumerate(urls_to_process):
-            if driver is None or processed_in_session >= BROWSER_RESTART_INTERVAL:
-                if driver: driver.quit()
-                driver = setup_driver()
-                processed_in_session = 0
-            
-            logger.info(f"--- 处理进度 ({i+1}/{len(urls_to_process)}) ---")
-            html = fetch_html_selenium(url, driver, selectors)
-            processed_in_session += 1
-            
-            if not html:
-                database.mark_url_failed(db_path, url, config['site_name'])
-                stats['FAILED'] += 1
-                driver.quit(); driver = None
-                continue
-            
-            details, tags = extract_data(html, url, selectors, config['base_url'], tag_rules)
-            if details and details.get('magnet_link') and details['magnet_link'] != 'N/A':
-                result = database.update_post_with_tags(db_path, url, config['site_name'], details, tags)
-                if result in stats: 
-                    stats[result] += 1
-            else:
-                database.mark_url_failed(db_path, url, config['site_name'])
-                stats['FAILED'] += 1
+        for urls_to_process in pending_batches:
+            stats['planned'] += len(urls_to_process)
+            logger.info(f"发现 {len(urls_to_process)} 个{'失败任务需要重试' if args.retry_failed else '待处理的新任务'}。")
+            for url in urls_to_process:
+                if budget.stop_requested():
+                    break
+                if driver is not None:
+                    reason, snap = monitor.check()
+                    if reason:
+                        logger.info(f"重启浏览器: {reason}。内存概况: {monitor.describe(snap)}")
+                        close_driver(driver, healthy=False, reason=reason); driver = None
+                if driver is None:
+                    driver = open_driver(config)
+                    monitor.reset(driver)
+                
+                processed += 1
+                budget.report_progress(pages=1, items=1)
+                logger.info(f"--- 处理进度 ({processed}/{stats['planned']}) ---")
+                page_start = time.time()
+                with metrics.timer('fetch'):
+                    html = fetch_html_selenium(url, driver, selectors, artifact_store)
+                
+                if not html:
+                    with metrics.timer('db'):
+                        database.mark_url_failed(db_path, url, config['site_name'])
+                    stats['FAILED'] += 1
+                    logger.info(f"重启浏览器: 页面加载失败。内存概况: {monitor.describe()}")
+                    close_driver(driver, healthy=False, reason="页面加载失败"); driver = None
+                    continue
+                # 失败页面会等满超时，不计入耗时趋势
+                monitor.record_page(time.time() - page_start)
+                
+                with metrics.timer('parse'):
+                    details, tags = extract_data(html, url, selectors, config['base_url'], tag_rules)
+                if details and details.get('magnet_link') and details['magnet_link'] != 'N/A':
+                    with metrics.timer('db'):
+                        result = database.update_post_with_tags(db_path, url, config['site_name'], details, tags)
+                    if result in stats: 
+                        stats[result] += 1
+                else:
+                    artifact_store.record(url, "未提取到磁力链接", html=html)
+                    with metrics.timer('db'):
+                        database.mark_url_failed(db_path, url, config['site_name'])
+                    stats['FAILED'] += 1
+            if budget.stop_requested():
+                # 每条记录已单独提交，未处理的 URL 仍为 PENDING，下次运行继续
+                logger.warning(f"收到停止请求，已处理 {processed}/{stats['planned']} 个 URL，其余留待下次运行。")
+                break
     finally:
-        if driver: driver.quit()
+        if driver: close_driver(driver)
+        artifact_store.enforce_budget()
         for child in parent_process.children(recursive=True):
             try: child.kill()
             except psutil.NoSuchProcess: pass
         logger.info("残留进程清理完毕。")
 
+        run = metrics.finish(stats)
         end_time = time.time()
         duration = end_time - start_time
         total_in_db = database.get_total_count(db_path)
@@ -203,9 +264,10 @@ def main():
         - 开始时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}
         - 结束时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}
         - 总耗时: {time.strftime('%H时%M分%S秒', time.gmtime(duration))}
+        - 吞吐: {metrics.describe(run)}
 
         --- 处理结果 ---
-        - 计划处理URL: {len(urls_to_process)}
+        - 计划处理URL: {stats['planned']}
         - ✅ 成功更新记录: {stats['UPDATED']}
         - ⏩ 检测到重复记录: {stats['DUPLICATE']}
         - ❌ 处理失败记录: {stats['FAILED']}
@@ -216,6 +278,7 @@ def main():
         \n{bottom_line}
         """
         logger.info(summary)
+    return stats
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,235 @@
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+import http_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROXY_POOL_CONFIG = {
+    'proxies': [],
+    'rate_per_proxy': None,
+    'burst': 1,
+    'max_failures': 3,
+    'eject_seconds': 300,
+    'health_check_url': None,
+    'health_check_timeout': 10,
+    'sticky': False,
+    'browser': True,
+}
+
+# 视为出口 IP 出了问题的状态码: 被封禁/限流，或代理本身报错
+PROXY_FAILURE_STATUS = {403, 407, 429, 502, 503, 504}
+
+def get_proxy_pool_config(config):
+    """
+    读取站点配置中的 proxy_pool 段，没有配置代理时返回 None。
+    配置示例:
+        proxy_pool:
+          proxies: ["http://10.0.0.2:3128", "socks5://10.0.0.3:1080"]
+          rate_per_proxy: 0.5      # 每个代理的请求数/秒 (各自的令牌桶)，默认 1/request_delay，总吞吐随代理数增加
+          burst: 1                 # 令牌桶容量
+          max_failures: 3          # 连续失败 (连接错误或 403/407/429/5xx) 多少次后剔除
+          eject_seconds: 300       # 剔除后多久用 health_check_url 探测，探测通过即恢复
+          health_check_url: ""     # 默认 base_url
+          sticky: false            # true: 同一个下载器固定使用同一代理，每个代理使用独立的 cookie
+          browser: true            # Selenium 启动时轮换使用代理 (Chrome 的 --proxy-server 不支持用户名密码)
+    """
+    settings = {**DEFAULT_PROXY_POOL_CONFIG, **(config.get('proxy_pool') or {})}
+    if not settings['proxies']:
+        return None
+    return settings
+
+class TokenBucket:
+    """线程安全的令牌桶: 每秒补充 rate 个令牌，最多积累 capacity 个；rate 为 0/None 时不限速"""
+    def __init__(self, rate, capacity=1):
+        self.rate = rate or 0
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """再取一个令牌需要等待的秒数 (不消耗令牌)"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+    def reserve(self):
+        """预支一个令牌，返回调用方需要等待的秒数；并发预支时依次排在后面"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+class Proxy:
+    def __init__(self, url, rate, burst):
+        self.url = url
+        parsed = urlparse(url)
+        # 日志中不显示用户名密码
+        self.label = f"{parsed.hostname}:{parsed.port}" if parsed.port else (parsed.hostname or url)
+        self.has_auth = bool(parsed.username)
+        self.bucket = TokenBucket(rate, burst)
+        self.failures = 0
+        self.ejected_until = None
+        self.probing = False
+        self.requests = 0
+        self.errors = 0
+        self.session = None
+
+    @property
+    def proxies(self):
+        return {'http': self.url, 'https': self.url}
+
+class ProxyPool:
+    """
+    单个站点的代理池: 每个代理有自己的令牌桶，请求交给当前最快能取到令牌的可用代理；
+    连续失败 max_failures 次的代理被剔除，eject_seconds 后在后台探测，通过后恢复。
+    所有代理都被剔除时仍按令牌桶轮换使用，任何一次成功都会让该代理恢复。
+    """
+    def __init__(self, config, settings):
+        self.site = config['site_name']
+        self.settings = settings
+        rate = settings['rate_per_proxy'] or 1.0 / max(config.get('request_delay', 1), 0.01)
+        self.rate = rate
+        self.proxies = [Proxy(url, rate, settings['burst']) for url in settings['proxies']]
+        self.health_check_url = settings['health_check_url'] or config['base_url']
+        self.http_settings = http_client.get_http_config(config)
+        # 探测不重试: 一次失败就继续剔除
+        self._probe_session = http_client.build_session({**self.http_settings, 'retries': 0})
+        self._sticky = {}
+        self._browser_index = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, key=None):
+        """选出代理并等到它的令牌；sticky 模式下同一 key 在代理可用期间始终得到同一代理"""
+        self._probe_due()
+        with self._lock:
+            healthy = [p for p in self.proxies if p.ejected_until is None] or self.proxies
+            sticky = self.settings['sticky'] and key is not None
+            proxy = self._sticky.get(key) if sticky else None
+            if proxy not in healthy:
+                proxy = min(healthy, key=lambda p: p.bucket.delay())
+                if sticky:
+                    self._sticky[key] = proxy
+            wait = proxy.bucket.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return proxy
+
+    def report(self, proxy, ok):
+        with self._lock:
+            proxy.requests += 1
+            if ok:
+                proxy.failures = 0
+                if proxy.ejected_until is not None:
+                    proxy.ejected_until = None
+                    logger.info(f"[{self.site}] 代理 {proxy.label} 请求成功，恢复使用。")
+                return
+            proxy.errors += 1
+            proxy.failures += 1
+            if proxy.failures >= self.settings['max_failures'] and proxy.ejected_until is None:
+                proxy.ejected_until = time.time() + self.settings['eject_seconds']
+                logger.warning(f"[{self.site}] 代理 {proxy.label} 连续失败 {proxy.failures} 次，"
+                               f"剔除 {self.settings['eject_seconds']}s 后再探测。")
+                if all(p.ejected_until is not None for p in self.proxies):
+                    logger.warning(f"[{self.site}] 全部代理均已被剔除，继续轮换使用直到有代理恢复。")
+
+    def _probe_due(self):
+        now = time.time()
+        with self._lock:
+            due = [p for p in self.proxies if p.ejected_until is not None and p.ejected_until <= now and not p.probing]
+            for proxy in due:
+                proxy.probing = True
+        for proxy in due:
+            threading.Thread(target=self._probe, args=(proxy,), name=f"proxy-probe-{proxy.label}", daemon=True).start()
+
+    def _probe(self, proxy):
+        try:
+            response = self._probe_session.get(self.health_check_url, proxies=proxy.proxies, timeout=self.settings['health_check_timeout'])
+            ok = response.status_code < 400
+            detail = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            ok, detail = False, str(e)
+        with self._lock:
+            proxy.probing = False
+            if proxy.ejected_until is None:
+                return
+            if ok:
+                proxy.ejected_until = None
+                proxy.failures = 0
+            else:
+                proxy.ejected_until = time.time() + self.settings['eject_seconds']
+        if ok:
+            logger.info(f"[{self.site}] 代理 {proxy.label} 探测通过，恢复使用。")
+        else:
+            logger.warning(f"[{self.site}] 代理 {proxy.label} 探测失败 ({detail})，继续剔除。")
+
+    def _proxy_session(self, proxy, session):
+        """sticky 模式: 每个代理一个 session，复制调用方的 headers，cookie 只在该出口 IP 上使用"""
+        with self._lock:
+            if proxy.session is None:
+                proxy.session = http_client.build_session(self.http_settings, session.headers)
+            return proxy.session
+
+    def get(self, session, url, key=None, **kwargs):
+        """经代理发出 GET 并记录代理的健康状况；连接错误原样抛出"""
+        proxy = self.acquire(key)
+        target = self._proxy_session(proxy, session) if self.settings['sticky'] else session
+        try:
+            response = target.get(url, proxies=proxy.proxies, **kwargs)
+        except requests.RequestException:
+            self.report(proxy, False)
+            raise
+        self.report(proxy, response.status_code not in PROXY_FAILURE_STATUS)
+        return response
+
+    def browser_proxy(self):
+        """浏览器启动时使用的代理地址 (在可用代理中轮换)；未启用或没有可用的无认证代理时返回 None"""
+        if not self.settings['browser']:
+            return None
+        with self._lock:
+            candidates = [p for p in self.proxies if not p.has_auth]
+            healthy = [p for p in candidates if p.ejected_until is None] or candidates
+            if not healthy:
+                logger.warning(f"[{self.site}] 代理均需要用户名密码，Chrome 无法使用，浏览器直连。")
+                return None
+            proxy = healthy[self._browser_index % len(healthy)]
+            self._browser_index += 1
+            return proxy.url
+
+    def describe(self):
+        with self._lock:
+            healthy = sum(1 for p in self.proxies if p.ejected_until is None)
+            detail = ", ".join(f"{p.label} {p.requests} 次/失败 {p.errors}{' (已剔除)' if p.ejected_until else ''}"
+                               for p in self.proxies)
+        return f"{len(self.proxies)} 个代理 (可用 {healthy}, 每个 {self.rate:.2f} 请求/秒): {detail}"
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(config):
+    """
+    同一进程内同一站点共用一个代理池 (多日并发的各下载器共享每个代理的令牌桶与健康状态)；
+    站点没有配置代理时返回 None，调用方按原来的方式直连并限速。
+    """
+    settings = get_proxy_pool_config(config)
+    if settings is None:
+        return None
+    with _pools_lock:
+        pool = _pools.get(config['site_name'])
+        if pool is None or pool.settings != settings:
+            pool = _pools[config['site_name']] = ProxyPool(config, settings)
+            logger.info(f"[{config['site_name']}] 使用代理池: {pool.describe()}")
+        return pool
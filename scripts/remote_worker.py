@@ -0,0 +1,220 @@
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+import psutil
+import requests
+
+import budget
+import http_client
+from utils import setup_logging, DEFAULT_CONFIG
+from browser_pool import open_driver, close_driver
+from browser_health import BrowserHealthMonitor
+from process_details import fetch_html_selenium, extract_data
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER = "http://127.0.0.1:6246"
+
+class WorkClient:
+    """
+    app.py 远程工作进程 API 的客户端。网络错误与 5xx 按指数退避重试:
+    提交与心跳、归还都是幂等的；领取的响应丢失时，那批 URL 在租约过期后会重新分配。
+    """
+    def __init__(self, server, site, worker, token=None, attempts=5):
+        self.base_url = server.rstrip('/')
+        self.site = site
+        self.worker = worker
+        self.attempts = attempts
+        # 只用连接池，重试由 _request 负责 (urllib3 不重试 POST)
+        self.session = http_client.build_session({**http_client.DEFAULT_HTTP_CONFIG, 'retries': 0},
+                                                 {'X-Worker-Token': token} if token else None)
+
+    def _request(self, method, path, payload=None):
+        for attempt in range(1, self.attempts + 1):
+            try:
+                if method == 'GET':
+                    response = self.session.get(f"{self.base_url}{path}", params={'site': self.site}, timeout=30)
+                else:
+                    response = self.session.post(f"{self.base_url}{path}", json={'site': self.site, 'worker': self.worker, **(payload or {})}, timeout=30)
+                if response.status_code < 500:
+                    return response
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+            if attempt == self.attempts:
+                raise RuntimeError(f"请求 {path} 失败 ({self.attempts} 次): {error}")
+            delay = min(30, 2 ** attempt)
+            logger.warning(f"请求 {path} 失败: {error}，{delay}s 后重试 ({attempt}/{self.attempts})。")
+            time.sleep(delay)
+
+    def _json(self, method, path, payload=None):
+        response = self._request(method, path, payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"请求 {path} 被拒绝: HTTP {response.status_code} {response.text[:200]}")
+        return response.json()
+
+    def fetch_config(self):
+        return self._json('GET', '/api/work/config')
+
+    def claim(self, limit, retry_failed=False):
+        return self._json('POST', '/api/work/claim', {'limit': limit, 'retry_failed': retry_failed})
+
+    def heartbeat(self, lease_id):
+        """返回租约是否仍然有效"""
+        return self._request('POST', '/api/work/heartbeat', {'lease_id': lease_id}).status_code == 200
+
+    def submit(self, lease_id, results):
+        return self._json('POST', '/api/work/submit', {'lease_id': lease_id, 'results': results})['results']
+
+    def release(self, lease_id):
+        return self._json('POST', '/api/work/release', {'lease_id': lease_id})['released']
+
+class LeaseKeeper(threading.Thread):
+    """后台每 1/3 租约时长发送一次心跳；租约被回收后设置 lost，主循环不再处理该批剩余的 URL"""
+    def __init__(self, client, lease_id, lease_seconds):
+        super().__init__(name=f"lease-{lease_id[:8]}", daemon=True)
+        self.client = client
+        self.lease_id = lease_id
+        self.interval = max(1.0, lease_seconds / 3)
+        self.lost = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                if not self.client.heartbeat(self.lease_id):
+                    if not self._stopped.is_set():
+                        logger.warning(f"租约 {self.lease_id[:8]} 已失效，停止处理该批剩余的 URL。")
+                        self.lost.set()
+                    return
+            except RuntimeError as e:
+                # 继续尝试: 只要在租约过期前恢复连接，租约就不会丢失
+                logger.warning(f"心跳失败: {e}")
+
+    def stop(self):
+        self._stopped.set()
+
+def main(argv=None):
+    """远程工作进程: 从 app 领取待处理的详情页 URL，本机用浏览器抓取解析，结果提交回 app 入库"""
+    parser = argparse.ArgumentParser(description="远程工作进程: 从 app 领取详情页 URL 并提交抓取结果。")
+    parser.add_argument("--site", "-s", required=True, help="网站标识")
+    parser.add_argument("--server", default=os.environ.get("MAGNETO_SERVER", DEFAULT_SERVER), help=f"app 地址 (默认: $MAGNETO_SERVER 或 {DEFAULT_SERVER})")
+    parser.add_argument("--token", default=os.environ.get("MAGNETO_WORKER_TOKEN"), help="与 app 的 MAGNETO_WORKER_TOKEN 一致的令牌")
+    parser.add_argument("--worker", default=f"{socket.gethostname()}-{os.getpid()}", help="工作进程名称 (默认: 主机名-进程号)")
+    parser.add_argument("--batch", type=int, default=5, help="每次领取的 URL 数 (默认: 5)")
+    parser.add_argument("--retry-failed", action="store_true", help="领取之前处理失败的任务 (结果保留期内每个 URL 只重试一次)")
+    parser.add_argument("--wait", action="store_true", help="没有待处理的 URL 时继续轮询，而不是退出")
+    parser.add_argument("--poll-interval", type=float, default=10, help="--wait 时的轮询间隔 (秒)")
+    args = parser.parse_args(argv)
+
+    client = WorkClient(args.server, args.site, args.worker, args.token)
+    try:
+        remote = client.fetch_config()
+    except RuntimeError as e:
+        print(f"错误: 无法从 {args.server} 获取站点配置: {e}")
+        return {'error': str(e)}
+    config = {**DEFAULT_CONFIG, **remote['config'], 'site_name': args.site}
+    setup_logging(config['log_level'], config['site_name'], "remote_worker")
+    logger.info(f"工作进程 {args.worker} 已连接 {args.server}，站点 '{args.site}'，每批 {args.batch} 个 URL。")
+
+    stats = {'UPDATED': 0, 'DUPLICATE': 0, 'FAILED': 0, 'ALREADY': 0, 'LEASE_LOST': 0, 'planned': 0}
+    start_time = time.time()
+    selectors = config['selectors']['process_details']
+    tag_rules = config.get('tag_rules', {})
+    driver = None
+    monitor = BrowserHealthMonitor(config)
+    parent_process = psutil.Process(os.getpid())
+    keeper = None
+
+    try:
+        while not budget.stop_requested():
+            claimed = client.claim(args.batch, args.retry_failed)
+            if not claimed['urls']:
+                if not args.wait:
+                    logger.info("没有待处理的 URL，工作进程退出。")
+                    break
+                time.sleep(args.poll_interval)
+                continue
+            stats['planned'] += len(claimed['urls'])
+            keeper = LeaseKeeper(client, claimed['lease_id'], claimed['lease_seconds'])
+            keeper.start()
+            logger.info(f"领取 {len(claimed['urls'])} 个 URL (租约 {claimed['lease_id'][:8]}, {claimed['lease_seconds']}s)。")
+
+            for url in claimed['urls']:
+                if keeper.lost.is_set() or budget.stop_requested():
+                    break
+                if driver is not None:
+                    reason, snap = monitor.check()
+                    if reason:
+                        logger.info(f"重启浏览器: {reason}。内存概况: {monitor.describe(snap)}")
+                        close_driver(driver, healthy=False, reason=reason); driver = None
+                if driver is None:
+                    driver = open_driver(config)
+                    monitor.reset(driver)
+
+                budget.report_progress(pages=1, items=1)
+                result = {'url': url}
+                page_start = time.time()
+                html = fetch_html_selenium(url, driver, selectors)
+                if not html:
+                    result['error'] = "页面加载失败"
+                    close_driver(driver, healthy=False, reason="页面加载失败"); driver = None
+                else:
+                    monitor.record_page(time.time() - page_start)
+                    details, tags = extract_data(html, url, selectors, config['base_url'], tag_rules)
+                    if details and details.get('magnet_link') and details['magnet_link'] != 'N/A':
+                        result.update(details=details, tags=tags)
+                    else:
+                        result['error'] = "未提取到磁力链接"
+
+                outcome = client.submit(claimed['lease_id'], [result])[url]
+                stats[outcome] = stats.get(outcome, 0) + 1
+                logger.info(f"已提交 {url}: {outcome}")
+
+            keeper.stop()
+            if keeper.lost.is_set() or budget.stop_requested():
+                # 未处理的 URL 归还给 app，其他工作进程可以立即领取
+                client.release(claimed['lease_id'])
+            keeper = None
+    except KeyboardInterrupt:
+        logger.warning("收到中断信号，归还未处理的 URL 后退出。")
+    except RuntimeError as e:
+        logger.error(f"与 app 通信失败，工作进程退出: {e}")
+    finally:
+        if keeper is not None:
+            keeper.stop()
+            try:
+                client.release(keeper.lease_id)
+            except RuntimeError as e:
+                logger.warning(f"归还租约失败 (过期后自动回收): {e}")
+        if driver: close_driver(driver)
+        for child in parent_process.children(recursive=True):
+            try: child.kill()
+            except psutil.NoSuchProcess: pass
+
+        duration = time.time() - start_time
+        width = 62
+        top_line = f"{' 工作进程总结 ':=^{width}}"
+        bottom_line = "=" * width
+        summary = f"""
+        \n{top_line}
+        - 工作进程: {args.worker} -> {args.server}
+        - 目标网站: {config['site_name']}
+        - 总耗时: {time.strftime('%H时%M分%S秒', time.gmtime(duration))}
+
+        --- 处理结果 ---
+        - 领取URL: {stats['planned']}
+        - ✅ 成功更新记录: {stats['UPDATED']}
+        - ⏩ 检测到重复记录: {stats['DUPLICATE']}
+        - ❌ 处理失败记录: {stats['FAILED']}
+        - ↪ 已由其他进程完成/租约失效: {stats['ALREADY']}/{stats['LEASE_LOST']}
+        \n{bottom_line}
+        """
+        logger.info(summary)
+    return stats
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,15 @@
 import argparse, logging
 from utils import load_config, setup_logging, parse_tags_from_title
 import database
+import budget
 
 logger = logging.getLogger(__name__)
 
-def main():
+def main(argv=None):
+    """命令行入口；也可由 task_runner 在预热进程中直接调用，返回统计字典"""
     parser = argparse.ArgumentParser(description="根据最新规则，重新处理数据库中所有记录的标签。")
     parser.add_argument("--site", "-s", required=True, help="网站标识，用于加载配置文件和确定数据库。")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     config = load_config(args.site)
     db_path = config['database_file']
@@ -15,7 +17,7 @@ def main():
     
     if not tag_rules:
         print(f"错误: 配置文件 'configs/{args.site}.yaml' 中未找到 'tag_rules'。")
-        return
+        return None
 
     setup_logging(config['log_level'], config['site_name'], "retag")
     database.init_db(db_path)
@@ -25,20 +27,26 @@ def main():
     all_media = database.get_all_media_for_retag(db_path)
     if not all_media:
         logger.info("数据库中没有需要处理的记录。")
-        return
+        return {'total': 0, 'retagged': 0}
         
     logger.info(f"找到 {len(all_media)} 条记录，开始重新解析标签...")
     
     count = 0
     for media_id, title in all_media:
+        if budget.stop_requested():
+            logger.warning(f"收到停止请求，已更新 {count}/{len(all_media)} 条记录的标签后停止。")
+            break
         if not title: continue
         new_tags = parse_tags_from_title(title, tag_rules)
         database.update_tags_for_media_id(db_path, media_id, new_tags)
         count += 1
+        budget.report_progress(items=1)
         if count % 100 == 0:
             logger.info(f"已处理 {count}/{len(all_media)} 条记录...")
 
-    logger.info(f"所有 {len(all_media)} 条记录的标签已根据最新规则更新完毕！")
+    if not budget.stop_requested():
+        logger.info(f"所有 {len(all_media)} 条记录的标签已根据最新规则更新完毕！")
+    return {'total': len(all_media), 'retagged': count}
 
 if __name__ == "__main__":
     main()
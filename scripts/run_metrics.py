@@ -0,0 +1,87 @@
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import budget
+import database
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('fetch', 'parse', 'db')
+
+class RunMetrics:
+    """
+    单次运行的吞吐指标: 按 抓取 (网络/浏览器) / 解析 / 数据库 累计耗时，结束时写入 job_runs 表。
+    timer() 可在多个线程中同时使用 (流水线模式、多日并发)，此时各阶段耗时之和可能大于总耗时。
+    """
+    def __init__(self, config, job_type, argv=None):
+        self.db_path = config['database_file']
+        self.source = config['site_name']
+        self.job_type = job_type
+        self.args = ' '.join(sys.argv[1:] if argv is None else argv)
+        self.started_at = time.time()
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.seconds[phase] += elapsed
+
+    def finish(self, stats, error=None):
+        """
+        在脚本的 finally 中调用: 根据正在传播的异常与停止标记判断退出状态，写入运行记录并返回。
+        stats 使用各脚本自己的统计键 (process_details 的 UPDATED 记为 added)。
+        """
+        exc = sys.exc_info()[1]
+        if isinstance(exc, SystemExit) and exc.code in (None, 0):
+            exc = None
+        if exc is not None and not isinstance(exc, budget.StopRequested):
+            exit_status, error = 'failed', error or f"{type(exc).__name__}: {exc}"
+        elif budget.stop_requested() or isinstance(exc, budget.StopRequested):
+            exit_status = 'stopped'
+        else:
+            exit_status = 'failed' if error else 'success'
+
+        stats = stats or {}
+        finished_at = time.time()
+        duration = finished_at - self.started_at
+        added = stats.get('ADDED', stats.get('UPDATED', 0))
+        items = added + stats.get('DUPLICATE', 0) + stats.get('FAILED', 0)
+        run = {
+            'source': self.source,
+            'job_type': self.job_type,
+            'args': self.args,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'finished_at': datetime.fromtimestamp(finished_at).isoformat(timespec='seconds'),
+            'duration_seconds': round(duration, 3),
+            'exit_status': exit_status,
+            'error': error,
+            'added': added,
+            'duplicate': stats.get('DUPLICATE', 0),
+            'failed': stats.get('FAILED', 0),
+            'total_found': stats.get('total_found', stats.get('planned', 0)),
+            # 与预算共用同一份页面计数 (各脚本已通过 budget.report_progress 上报)
+            'pages_fetched': budget.get_progress()['pages'],
+            'items_per_sec': round(items / duration, 2) if duration > 0 else None,
+            **{f"{phase}_seconds": round(seconds, 3) for phase, seconds in self.seconds.items()},
+        }
+        try:
+            database.add_job_run(self.db_path, run)
+        except sqlite3.Error as e:
+            logger.warning(f"写入运行记录失败: {e}")
+        return run
+
+    def describe(self, run):
+        """汇总框中的一行吞吐说明"""
+        split = " / ".join(f"{name} {run[f'{phase}_seconds']:.1f}s" for phase, name in zip(PHASES, ('抓取', '解析', '数据库')))
+        return f"{run['pages_fetched']} 页, {run['items_per_sec'] or 0} 条/秒 ({split})"
@@ -1,6 +1,5 @@
 import argparse
 import os
-import re
 import requests
 import time
 import logging
@@ -8,14 +7,22 @@ import json
 import sys
 import calendar
 import hashlib
+import tempfile
 import bencodepy
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from datetime import datetime, timedelta
 from pathlib import Path
 
 import database
-from utils import setup_logging, load_config, normalize_date, parse_tags_from_title
+import budget
+import http_client
+import proxy_pool
+import spool
+from pipeline import PagePipeline, get_pipeline_config
+from run_metrics import RunMetrics
+from utils import setup_logging, load_config, normalize_date, parse_tags_from_title, extract_item_number, RateLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -25,16 +32,27 @@ HEADERS = {
 }
 
 class JavbeeDownloader:
-    def __init__(self, config):
-        self.session = requests.Session()
-        self.session.headers.update(HEADERS)
+    def __init__(self, config, rate_limiter=None, pipeline_config=None, metrics=None):
         self.config = config
         self.base_url = config['base_url'].rstrip('/')
-        
-        # 动态设置 Referer
-        self.session.headers.update({'Referer': self.base_url})
+        # 同一站点的各下载器 (多日并发) 共用一个带连接池与重试的 session，Referer 固定为站点首页
+        self.session = http_client.get_session(config, {**HEADERS, 'Referer': self.base_url})
         
         self.tag_rules = config.get('tag_rules', {})
+        # 配置了 proxy_pool 时由各代理的令牌桶限速，不再使用全局限速器与每页 sleep
+        self.proxy_pool = proxy_pool.get_pool(config)
+        # 多日并发抓取时由外部传入共享的限速器，替代每页固定 sleep
+        self.rate_limiter = None if self.proxy_pool else rate_limiter
+        # 配置了 spool 时抓取结果追加写入 spool 文件 (各下载器共用)，由 spool_loader 另行入库
+        self.spool = spool.get_writer(config)
+        # 非 None 时使用 抓取/解析/写入 分离的流水线模式
+        self.pipeline_config = pipeline_config
+        # 多日并发抓取时各下载器共用同一份耗时统计
+        self.metrics = metrics or RunMetrics(config, 'scrape_javbee')
+        # 高水位标记 (按系列): 上次运行时该系列最新一条记录的 post_url，再次遇到即停止
+        self.high_water_mark = None
+        self.newest_post_url = None
+        self.any_item_failed = False
         self.download_dir = "torrent_downloads"
         Path(self.download_dir).mkdir(parents=True, exist_ok=True)
 
@@ -72,19 +90,7 @@ class JavbeeDownloader:
         info['date'] = normalize_date(raw_date_str)
         
         # 4. 编号提取
-        standard_match = re.search(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', info['title'], re.IGNORECASE)
-        if standard_match:
-            info['item_number'] = standard_match.group(1).upper()
-        else:
-            compact_match = re.search(r'([A-Z]+)(\d{3,})', info['title'], re.IGNORECASE)
-            if compact_match:
-                prefix = compact_match.group(1).upper()
-                suffix = compact_match.group(2)
-                info['item_number'] = f"{prefix}-{suffix}"
-            elif len(info['title']) < 15: 
-                info['item_number'] = info['title'].strip().upper()
-            else:
-                info['item_number'] = ''
+        info['item_number'] = extract_item_number(info['title'])
 
         # 5. 链接提取
         magnet_sel = sels.get('magnet', 'a[title="Download Magnet"]')
@@ -131,33 +137,35 @@ class JavbeeDownloader:
             logger.error(f"转换 torrent 到 magnet 失败: {e}")
             return None
 
-    def process_item(self, info, tags):
+    def ensure_magnet(self, info):
+        """没有磁链但有 .torrent 链接时，下载种子并转换为磁链；最终是否拿到磁链"""
         filepath = None
         try:
             if not info.get('magnet_link') and info.get('torrent_url'):
-                clean_title = re.sub(r'[\\/*?:"<>|]', '_', info['title'][:50])
-                filename = f"{clean_title}_{int(time.time())}.torrent"
-                filepath = os.path.join(self.download_dir, filename)
-                
                 logger.info(f"正在下载 .torrent 文件: {info['title']}")
                 try:
-                    sleep_time = self.config.get('download_delay', 1) 
-                    if sleep_time > 0: time.sleep(sleep_time)
-                        
-                    response = self.session.get(info['torrent_url'], timeout=30)
+                    # 种子下载与翻页共用限速器 (或代理池)，并发抓取多个日期时总请求速率不变
+                    if self.rate_limiter:
+                        self.rate_limiter.wait()
+                    elif not self.proxy_pool:
+                        sleep_time = self.config.get('download_delay', 1)
+                        if sleep_time > 0: time.sleep(sleep_time)
+
+                    response = self._get(info['torrent_url'])
                     response.raise_for_status()
-                    with open(filepath, 'wb') as f:
+                    # 临时文件名由 tempfile 生成，并发线程下载同名条目时不会互相覆盖
+                    with tempfile.NamedTemporaryFile(dir=self.download_dir, suffix='.torrent', delete=False) as f:
+                        filepath = f.name
                         f.write(response.content)
                     info['magnet_link'] = self.torrent_to_magnet(filepath)
                 except requests.RequestException as e:
                     logger.error(f"下载 .torrent 文件失败 for {info['title']}: {e}")
-                    return 'FAILED'
+                    return False
 
-            if info.get('magnet_link'):
-                return database.add_processed_post_with_tags(self.config['database_file'], self.config['site_name'], info, tags)
-            else:
+            if not info.get('magnet_link'):
                 logger.warning(f"最终未能获取 magnet 链接，跳过: {info['title']}")
-                return 'FAILED'
+                return False
+            return True
 
         finally:
             if filepath and os.path.exists(filepath):
@@ -166,21 +174,99 @@ class JavbeeDownloader:
                 except OSError as e:
                     logger.warning(f"删除临时文件失败 {filepath}: {e}")
 
+    def process_item(self, info, tags):
+        # 补全磁链需要下载 .torrent，计入抓取耗时
+        with self.metrics.timer('fetch'):
+            has_magnet = self.ensure_magnet(info)
+        if not has_magnet:
+            return 'FAILED'
+        with self.metrics.timer('db'):
+            if self.spool:
+                return self.spool.add(info, tags)
+            return database.add_processed_post_with_tags(self.config['database_file'], self.config['site_name'], info, tags)
+
+    def _reached_high_water_mark(self, info):
+        """记录本系列见到的第一条 (最新) post_url，并判断是否已到达上次的高水位"""
+        post_url = info.get('post_url')
+        if self.newest_post_url is None and post_url:
+            self.newest_post_url = post_url
+        return bool(self.high_water_mark) and post_url == self.high_water_mark
+
+    def _begin_series_mark(self, path_suffix, start_page):
+        """只有从第 1 页开始的抓取才使用高水位标记，返回是否启用"""
+        self.high_water_mark = None
+        self.newest_post_url = None
+        # 本系列有条目处理失败 (多为 .torrent 下载失败) 时不推进标记，下次增量抓取会重试这些条目
+        self.any_item_failed = False
+        if not self.config.get('high_water_mark', True) or start_page != 1:
+            return False
+        self.high_water_mark = database.get_high_water_mark(self.config['database_file'], self.config['site_name'], path_suffix)
+        if self.high_water_mark:
+            logger.info(f"系列 {path_suffix} 的高水位标记: {self.high_water_mark}")
+        return True
+
+    def _finish_series_mark(self, path_suffix, use_mark, finished_cleanly):
+        # 只在完整抓到旧数据边界 (或正常翻到末页) 后推进标记，页面请求出错或有条目失败时保持不变
+        if use_mark and finished_cleanly and self.any_item_failed:
+            logger.warning(f"系列 {path_suffix} 有条目处理失败，高水位标记保持不变，下次运行会重试。")
+            return
+        if use_mark and finished_cleanly and self.newest_post_url and self.newest_post_url != self.high_water_mark:
+            database.set_high_water_mark(self.config['database_file'], self.config['site_name'], path_suffix, self.newest_post_url)
+
+    def _get(self, url):
+        """配置了代理池时经代理发出请求 (sticky 模式下同一下载器固定使用同一代理)，否则直连"""
+        if self.proxy_pool:
+            return self.proxy_pool.get(self.session, url, key=id(self), timeout=30)
+        return self.session.get(url, timeout=30)
+
+    def fetch_page_html(self, url, wait=True):
+        """只负责网络请求 (流水线模式的抓取阶段)；wait=False 时由调用方负责限速"""
+        logger.info(f"正在抓取页面: {url}")
+        if wait and self.rate_limiter: self.rate_limiter.wait()
+        response = self._get(url)
+        response.raise_for_status()
+        return response.text
+
+    def parse_cards(self, url, html):
+        """解析整页卡片并补全磁链 (流水线模式的解析阶段)，单条失败的位置返回 None"""
+        with self.metrics.timer('parse'):
+            soup = BeautifulSoup(html, 'html.parser')
+            card_selector = self.config.get('selectors', {}).get('card', 'div.card.mb-3')
+            cards = soup.select(card_selector)
+        if not cards:
+            logger.warning(f"页面上未找到种子信息卡片: {url}")
+            return []
+        records = []
+        for card in cards:
+            try:
+                with self.metrics.timer('parse'):
+                    info, tags = self.extract_torrent_info(card, self.tag_rules)
+                with self.metrics.timer('fetch'):
+                    has_magnet = self.ensure_magnet(info)
+                records.append((info, tags) if has_magnet else None)
+            except Exception as e:
+                logger.error(f"处理单个卡片时出错: {e}")
+                records.append(None)
+        return records
+
     def scrape_page(self, url, tag_rules, stats_counter):
         try:
             logger.info(f"正在抓取页面: {url}")
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            card_selector = self.config.get('selectors', {}).get('card', 'div.card.mb-3')
-            cards = soup.select(card_selector)
+            if self.rate_limiter: self.rate_limiter.wait()
+            with self.metrics.timer('fetch'):
+                response = self._get(url)
+                response.raise_for_status()
+            with self.metrics.timer('parse'):
+                soup = BeautifulSoup(response.text, 'html.parser')
+                card_selector = self.config.get('selectors', {}).get('card', 'div.card.mb-3')
+                cards = soup.select(card_selector)
             
             if not cards:
                 logger.warning(f"页面上未找到种子信息卡片: {url}")
                 return "NO_CONTENT"
             
             stats_counter['total_found'] += len(cards)
+            budget.report_progress(pages=1, items=len(cards))
             logger.info(f"在页面 {url} 找到 {len(cards)} 个种子信息")
             
             consecutive_duplicates = 0
@@ -188,9 +274,15 @@ class JavbeeDownloader:
 
             for card in cards:
                 try:
-                    info, tags = self.extract_torrent_info(card, tag_rules)
+                    with self.metrics.timer('parse'):
+                        info, tags = self.extract_torrent_info(card, tag_rules)
+                    if self._reached_high_water_mark(info):
+                        logger.info(f"到达高水位标记 ({info['post_url']})，终止抓取当前系列。")
+                        return "STOP_SIGNAL"
                     result = self.process_item(info, tags)
                     if result in stats_counter: stats_counter[result] += 1
+                    if result == 'FAILED':
+                        self.any_item_failed = True
                     
                     if result == 'DUPLICATE':
                         consecutive_duplicates += 1
@@ -203,9 +295,11 @@ class JavbeeDownloader:
                 except Exception as e:
                     logger.error(f"处理单个卡片时出错: {e}")
                     stats_counter['FAILED'] += 1
+                    self.any_item_failed = True
                     consecutive_duplicates = 0
                 
-            time.sleep(self.config.get('request_delay', 1))
+            if not self.rate_limiter and not self.proxy_pool:
+                time.sleep(self.config.get('request_delay', 1))
             return "CONTINUE"
         except requests.RequestException as e:
             logger.error(f"请求页面时出错 {url}: {e}")
@@ -214,20 +308,100 @@ class JavbeeDownloader:
             logger.error(f"处理页面时出现未知错误 {url}: {e}")
             return "PAGE_ERROR"
 
+    def _series_page_url(self, path_suffix, page):
+        # [关键修订] 智能判断连接符：如果路径里已经有 '?'，则分页参数用 '&' 连接
+        sep = "&" if "?" in path_suffix else "?"
+        return f"{self.base_url}/{path_suffix}{sep}page={page}"
+
+    def _scrape_series_pipelined(self, path_suffix, start_page, stats_counter, pipeline_config):
+        stop_threshold = self.config.get('stop_on_consecutive_duplicates', 10)
+        CONSECUTIVE_FAILURE_THRESHOLD = 2
+        if not self.rate_limiter and not self.proxy_pool:
+            self.rate_limiter = RateLimiter(1.0 / max(self.config.get('request_delay', 1), 0.01))
+        # any_page_failed: 中途有页面请求失败 (即使之后恢复)，该页的条目没有入库，不能推进高水位
+        state = {'consecutive_failures': 0, 'finished_cleanly': False, 'any_page_failed': False}
+        use_mark = self._begin_series_mark(path_suffix, start_page)
+        logger.info(f"开始抓取系列 (流水线模式): {self.base_url}/{path_suffix} (起始页: {start_page})")
+
+        def fetch(page):
+            url = self._series_page_url(path_suffix, page)
+            if self.rate_limiter: self.rate_limiter.wait()
+            with self.metrics.timer('fetch'):
+                return self.fetch_page_html(url, wait=False)
+
+        def parse(page, html):
+            return self.parse_cards(self._series_page_url(path_suffix, page), html)
+
+        def write(page, records):
+            if not records:
+                if records is None:
+                    state['any_page_failed'] = True
+                state['consecutive_failures'] += 1
+                logger.warning(f"抓取第 {page} 页失败或为空，连续失败次数: {state['consecutive_failures']}/{CONSECUTIVE_FAILURE_THRESHOLD}")
+                if state['consecutive_failures'] >= CONSECUTIVE_FAILURE_THRESHOLD:
+                    logger.info(f"已连续 {CONSECUTIVE_FAILURE_THRESHOLD} 次抓取页面失败或为空，系列 {path_suffix} 处理完毕。")
+                    # 空页 ([]) 说明正常翻到末页；请求失败 (None) 则不推进高水位
+                    state['finished_cleanly'] = records is not None
+                    return 'STOP'
+                return 'CONTINUE'
+            state['consecutive_failures'] = 0
+            stats_counter['total_found'] += len(records)
+            budget.report_progress(pages=1, items=len(records))
+
+            reached_mark = False
+            for index, record in enumerate(records):
+                if record is not None and self._reached_high_water_mark(record[0]):
+                    records, reached_mark = records[:index], True
+                    break
+
+            valid = [r for r in records if r is not None]
+            with self.metrics.timer('db'):
+                written = iter(self.spool.add_bulk(valid) if self.spool else
+                               database.add_processed_posts_bulk(self.config['database_file'], self.config['site_name'], valid))
+            consecutive_duplicates = 0
+            for record in records:
+                result = next(written) if record is not None else 'FAILED'
+                stats_counter[result] += 1
+                if result == 'FAILED':
+                    self.any_item_failed = True
+                consecutive_duplicates = consecutive_duplicates + 1 if result == 'DUPLICATE' else 0
+                if consecutive_duplicates >= stop_threshold:
+                    logger.info(f"在第 {page} 页遇到“旧数据之墙” (连续 {stop_threshold} 个重复记录)，系列 {path_suffix} 处理完毕。")
+                    state['finished_cleanly'] = True
+                    return 'STOP'
+            if reached_mark:
+                logger.info(f"在第 {page} 页到达高水位标记，系列 {path_suffix} 处理完毕。")
+                state['finished_cleanly'] = True
+                return 'STOP'
+            if budget.stop_requested():
+                logger.warning(f"收到停止请求，系列 {path_suffix} 在第 {page} 页后停止，高水位标记保持不变。")
+                return 'STOP'
+            return 'CONTINUE'
+
+        PagePipeline(fetch, parse, write, **pipeline_config).run(start_page)
+        self._finish_series_mark(path_suffix, use_mark, state['finished_cleanly'] and not state['any_page_failed'])
+        logger.info(f"系列 {path_suffix} 的所有页面处理完成。")
+
     def scrape_series(self, path_suffix, start_page, stats_counter):
+        if self.pipeline_config:
+            return self._scrape_series_pipelined(path_suffix, start_page, stats_counter, self.pipeline_config)
         page = start_page
         tag_rules = self.config.get('tag_rules', {})
         consecutive_failure_count = 0
         CONSECUTIVE_FAILURE_THRESHOLD = 2
+        use_mark = self._begin_series_mark(path_suffix, start_page)
+        page_result = None
+        # 同上: 中途有页面请求失败时不推进高水位
+        any_page_failed = False
         
         logger.info(f"开始抓取系列: {self.base_url}/{path_suffix} (起始页: {page})")
 
         while True:
-            # [关键修订] 智能判断连接符：如果路径里已经有 '?'，则分页参数用 '&' 连接
-            sep = "&" if "?" in path_suffix else "?"
-            url = f"{self.base_url}/{path_suffix}{sep}page={page}"
+            url = self._series_page_url(path_suffix, page)
             
             page_result = self.scrape_page(url, tag_rules, stats_counter)
+            if page_result == "PAGE_ERROR":
+                any_page_failed = True
             
             if page_result == "CONTINUE" or page_result == "STOP_SIGNAL":
                 consecutive_failure_count = 0
@@ -241,9 +415,14 @@ class JavbeeDownloader:
             if consecutive_failure_count >= CONSECUTIVE_FAILURE_THRESHOLD:
                 logger.info(f"已连续 {CONSECUTIVE_FAILURE_THRESHOLD} 次抓取页面失败或为空，系列 {path_suffix} 处理完毕。")
                 break
+            if budget.stop_requested():
+                logger.warning(f"收到停止请求，系列 {path_suffix} 在第 {page} 页后停止，高水位标记保持不变。")
+                page_result = "STOPPED"
+                break
             
             page += 1
             
+        self._finish_series_mark(path_suffix, use_mark, page_result != "STOPPED" and not any_page_failed)
         logger.info(f"系列 {path_suffix} 的所有页面处理完成。")
 
 def validate_date_format(date_str):
@@ -259,16 +438,71 @@ def validate_date_format(date_str):
         except ValueError: pass
     return None, None
 
-def main():
+def new_stats():
+    return {'ADDED': 0, 'DUPLICATE': 0, 'FAILED': 0, 'total_found': 0}
+
+def scrape_dates_concurrently(config, day_list, stats, per_day_stats, max_workers=None, pipeline_config=None, metrics=None):
+    """
+    并发抓取多个日期系列。所有线程共享一个全局限速器 (rate_limit_per_second，
+    默认 1/request_delay)；每个日期使用独立的下载器与统计，保留各自的连续重复终止逻辑。
+    """
+    target_url_fmt = config.get('url_date_format', "%Y-%m-%d")
+    max_workers = max_workers or config.get('date_workers', 3)
+    rate = config.get('rate_limit_per_second') or 1.0 / max(config.get('request_delay', 1), 0.01)
+    limiter = RateLimiter(rate)
+    pool = proxy_pool.get_pool(config)
+    pacing = f"代理池: {pool.describe()}" if pool else f"全局限速: {rate:.2f} 请求/秒"
+    logger.info(f"--- 并发抓取 {len(day_list)} 天 (线程数: {max_workers}, {pacing}) ---")
+
+    def crawl_day(day_dt):
+        url_date_str = day_dt.strftime(target_url_fmt)
+        if budget.stop_requested():
+            return url_date_str, None
+        day_stats = new_stats()
+        downloader = JavbeeDownloader(config, rate_limiter=limiter, pipeline_config=pipeline_config, metrics=metrics)
+        logger.info(f"--- 正在处理 {url_date_str} ---")
+        downloader.scrape_series(f"date/{url_date_str}", 1, day_stats)
+        return url_date_str, day_stats
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(crawl_day, day_dt) for day_dt in day_list]
+        for future in as_completed(futures):
+            try:
+                url_date_str, day_stats = future.result()
+            except Exception as e:
+                logger.error(f"抓取日期系列时出现未知错误: {e}")
+                continue
+            if day_stats is None:
+                logger.info(f"收到停止请求，跳过 {url_date_str}。")
+                continue
+            per_day_stats[url_date_str] = day_stats
+            for key in stats:
+                stats[key] += day_stats[key]
+
+def parse_day(date_str):
+    date_type, input_fmt = validate_date_format(date_str)
+    if date_type != "day":
+        return None
+    return datetime.strptime(date_str, input_fmt)
+
+def main(argv=None):
+    """命令行入口；也可由 task_runner 在预热进程中直接调用，返回统计字典"""
     parser = argparse.ArgumentParser(description='按日期、标签或搜索词下载种子信息')
     parser.add_argument("--site", "-s", required=True, help="网站标识")
     parser.add_argument('--date', type=str, help='日期，格式 YYYY-MM-DD, YYYYMMDD 等')
+    parser.add_argument('--date-from', type=str, help='日期范围起点 (含)，格式同 --date 的单日格式')
+    parser.add_argument('--date-to', type=str, help='日期范围终点 (含)，默认昨天')
+    parser.add_argument('--workers', type=int, help='日期范围/整月模式的并发线程数 (默认: 配置 date_workers 或 3)')
     parser.add_argument('--tag', type=str, help='标签/关键词')
     parser.add_argument('--search', type=str, help='搜索关键词 (例如: ABP)')
     parser.add_argument('--start-page', type=int, default=1, help='起始页码 (默认: 1)')
-    args = parser.parse_args()
+    parser.add_argument('--pipeline', action='store_true', help="使用 抓取/解析/写入 分离的流水线模式 (也可在配置 pipeline.enabled 中开启)")
+    parser.add_argument('--spool', action='store_true', help="结果写入 spool 文件，由 spool_loader 另行入库 (也可在配置 spool.enabled 中开启)")
+    args = parser.parse_args(argv)
 
     config = load_config(args.site)
+    if args.spool:
+        config['spool'] = {**(config.get('spool') or {}), 'enabled': True}
     db_path = config['database_file']
     setup_logging(config['log_level'], config['site_name'], "scrape_javbee")
     database.init_db(db_path)
@@ -277,11 +511,14 @@ def main():
     # [新增] 获取搜索 URL 格式，默认使用路径参数
     target_search_fmt = config.get('search_url_format', "search/{}")
 
-    stats = {'ADDED': 0, 'DUPLICATE': 0, 'FAILED': 0, 'total_found': 0}
+    stats = new_stats()
+    per_day_stats = {}
     start_time = time.time()
+    pipeline_config = get_pipeline_config(config, force=args.pipeline)
+    metrics = RunMetrics(config, "scrape_javbee", argv)
 
     try:
-        downloader = JavbeeDownloader(config)
+        downloader = JavbeeDownloader(config, pipeline_config=pipeline_config, metrics=metrics)
         
         # 模式 1: 搜索模式 (优先级最高)
         if args.search:
@@ -296,7 +533,23 @@ def main():
             path_suffix = f"tag/{args.tag}"
             downloader.scrape_series(path_suffix, args.start_page, stats)
 
-        # 模式 3: 按日期
+        # 模式 3: 按日期范围 (并发)
+        elif args.date_from:
+            date_from = parse_day(args.date_from)
+            date_to = parse_day(args.date_to) if args.date_to else datetime.now() - timedelta(days=1)
+            if not date_from or not date_to:
+                logger.error(f"日期范围格式错误: '{args.date_from}' ~ '{args.date_to}'")
+                sys.exit(1)
+            date_from = date_from.replace(hour=0, minute=0, second=0, microsecond=0)
+            date_to = date_to.replace(hour=0, minute=0, second=0, microsecond=0)
+            if date_from > date_to:
+                logger.error(f"日期范围起点晚于终点: {date_from:%Y-%m-%d} > {date_to:%Y-%m-%d}")
+                sys.exit(1)
+            logger.info(f"--- 开始处理日期范围任务: {date_from:%Y-%m-%d} ~ {date_to:%Y-%m-%d} ---")
+            day_list = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+            scrape_dates_concurrently(config, day_list, stats, per_day_stats, args.workers, pipeline_config, metrics)
+
+        # 模式 4: 按日期
         elif args.date:
             date_input = args.date
             date_type, input_fmt = validate_date_format(date_input)
@@ -312,14 +565,8 @@ def main():
                 year, month = dt.year, dt.month
                 _, days_in_month = calendar.monthrange(year, month)
                 logger.info(f"--- 开始处理整月任务: {year}-{month:02d} ---")
-                
-                for day in range(1, days_in_month + 1):
-                    day_dt = datetime(year, month, day)
-                    url_date_str = day_dt.strftime(target_url_fmt)
-                    logger.info(f"--- 正在处理 {url_date_str} ---")
-                    downloader.scrape_series(f"date/{url_date_str}", 1, stats)
-                    if day < days_in_month:
-                        time.sleep(config.get('request_delay', 1) * 2)
+                day_list = [datetime(year, month, day) for day in range(1, days_in_month + 1)]
+                scrape_dates_concurrently(config, day_list, stats, per_day_stats, args.workers, pipeline_config, metrics)
             else:
                 logger.error(f"日期格式错误: '{date_input}'")
                 sys.exit(1)
@@ -332,6 +579,8 @@ def main():
             downloader.scrape_series(f"date/{url_date_str}", 1, stats)
 
     finally:
+        writer = spool.close_writer(config['site_name'])
+        run = metrics.finish(stats)
         end_time = time.time()
         duration = end_time - start_time
         total_in_db = database.get_total_count(db_path)
@@ -340,18 +589,24 @@ def main():
         title = " 任务总结 "
         top_line = f"{title:=^{width}}"
         bottom_line = "=" * width
+        per_day_lines = "\n".join(
+            f"        - {day}: 发现 {s['total_found']} / 新增 {s['ADDED']} / 重复 {s['DUPLICATE']} / 失败 {s['FAILED']}"
+            for day, s in sorted(per_day_stats.items())
+        )
+        per_day_section = f"\n\n        --- 分日统计 ({len(per_day_stats)} 天) ---\n{per_day_lines}" if per_day_stats else ""
         summary = f"""
         \n{top_line}
         - 目标网站: {config['site_name']}
         - 开始时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}
         - 结束时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}
         - 总耗时: {time.strftime('%H时%M分%S秒', time.gmtime(duration))}
+        - 吞吐: {metrics.describe(run)}
 
         --- 处理结果 ---
         - 页面发现总数: {stats['total_found']}
         - ✅ 成功新增记录: {stats['ADDED']}
         - ⏩ 检测到重复记录: {stats['DUPLICATE']}
-        - ❌ 处理失败记录: {stats['FAILED']}
+        - ❌ 处理失败记录: {stats['FAILED']}{per_day_section}
 
         --- 数据库状态 ---
         - 数据库文件: {db_path}
@@ -359,6 +614,12 @@ def main():
         \n{bottom_line}
         """
         logger.info(summary)
+        pool = proxy_pool.get_pool(config)
+        if pool:
+            logger.info(f"代理使用情况: {pool.describe()}")
+        if writer and spool.get_spool_config(config):
+            logger.info(f"spool: {writer.describe()}")
+    return {**stats, 'per_day': per_day_stats}
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,31 +6,126 @@ import time
 import logging
 import json
 import sys
+import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode, quote
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 
 import database
-from utils import setup_logging, load_config, normalize_date, parse_tags_from_title
+import budget
+import http_client
+import proxy_pool
+import spool
+from pipeline import PagePipeline, get_pipeline_config
+from run_metrics import RunMetrics
+from utils import setup_logging, load_config, normalize_date, parse_tags_from_title, RateLimiter, config_fingerprint
 
 logger = logging.getLogger(__name__)
 
+# nyaa 条目页: /view/<id>，id 随发布递增，可直接作为高水位标记
+NYAA_ID_PATTERN = re.compile(r'/view/(\d+)')
+
+# 番号: 允许下划线作为分隔符，并允许结尾包含字母（适配 PACO, CARIB, 10MU 等格式）
+ITEM_NUMBER_PATTERN = re.compile(r'([A-Z0-9]+(?:[_\-][A-Z0-9]+)+)', re.IGNORECASE)
+
+# RSS 中 nyaa 扩展字段 (infoHash/size 等) 的命名空间
+NYAA_NS = {'nyaa': 'https://nyaa.si/xmlns/nyaa'}
+
+DEFAULT_RSS_CONFIG = {
+    'url': None,
+    'batch_size': 100,
+    'chunk_size': 16384,
+    # 与 nyaa/sukebei 页面上磁链所带的 tracker 一致
+    'trackers': [
+        'http://sukebei.tracker.wf:8888/announce',
+        'udp://open.stealth.si:80/announce',
+        'udp://tracker.opentrackr.org:1337/announce',
+        'udp://exodus.desync.com:6969/announce',
+        'udp://tracker.torrent.eu.org:451/announce',
+    ],
+}
+
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36',
     'Accept-Language': 'en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7',
 }
 
+def get_rss_config(config, force=False):
+    """
+    读取站点配置中的 rss 段，未启用时返回 None (也可用命令行 --rss 临时开启)。
+    配置示例:
+        rss:
+          enabled: true
+          url: ""          # 默认由 base_url 推出，如 https://sukebei.nyaa.si/user/offkab -> https://sukebei.nyaa.si/?u=offkab&page=rss
+          batch_size: 100  # 每批写库的条目数
+          trackers: []     # 拼入磁链的 tracker，默认与页面上的磁链一致
+    """
+    raw = config.get('rss') or {}
+    if not force and not raw.get('enabled'):
+        return None
+    settings = {**DEFAULT_RSS_CONFIG, **raw}
+    settings.pop('enabled', None)
+    return settings
+
+def rss_feed_url(base_url):
+    """列表页地址 -> RSS 地址: 保留搜索/分类参数，/user/<name> 转为 u=<name>"""
+    parts = urlsplit(base_url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in ('p', 'page')]
+    path = parts.path or '/'
+    user = re.match(r'/user/([^/]+)', path)
+    if user:
+        query.append(('u', user.group(1)))
+        path = '/'
+    return urlunsplit((parts.scheme, parts.netloc, path, urlencode(query + [('page', 'rss')]), ''))
+
 class NyaaScraper:
-    def __init__(self, config):
-        self.session = requests.Session()
-        self.session.headers.update(HEADERS)
+    def __init__(self, config, metrics=None):
+        self.session = http_client.get_session(config, HEADERS)
         self.config = config
+        # 配置了 proxy_pool 时由各代理的令牌桶限速，代替 request_delay
+        self.proxy_pool = proxy_pool.get_pool(config)
+        # 配置了 spool 时抓取结果追加写入 spool 文件，由 spool_loader 另行入库，抓取不再等待数据库写锁
+        self.spool = spool.get_writer(config)
         self.base_url = config['base_url']
         self.tag_rules = config.get('tag_rules', {})
         self.selectors = config.get('selectors', {})
         if not self.selectors:
             logger.error("配置文件中缺少 'selectors' 部分！")
             sys.exit(1)
+        self.config_hash = config_fingerprint(config, ['base_url', 'selectors'])
+        self.metrics = metrics or RunMetrics(config, 'scrape_nyaa')
+        # 由 run() 设置: (range_key) 及“是否已正常结束”，用于检查点的保存与清除
+        self.range_key = None
+        self.finished_cleanly = False
+        # 高水位标记: 上次运行见过的最新 nyaa id，遇到 <= 该 id 的条目立即停止
+        self.high_water_mark = None
+        self.newest_id = None
+
+    def _reached_high_water_mark(self, details):
+        """记录本次见到的最新 id，并判断该条目是否已达到 (<=) 上次的高水位"""
+        match = NYAA_ID_PATTERN.search(details.get('post_url') or '')
+        if not match:
+            return False
+        item_id = int(match.group(1))
+        if self.high_water_mark is not None and item_id <= self.high_water_mark:
+            return True
+        if self.newest_id is None or item_id > self.newest_id:
+            self.newest_id = item_id
+        return False
+
+    def _save_checkpoint(self, page_num, consecutive_duplicate_pages):
+        """每页写库后记录游标，中断后可 --resume 从下一页继续"""
+        database.save_crawl_state(self.config['database_file'], self.config['site_name'], 'pages', self.range_key,
+                                  self.config_hash, cursor_data={'page': page_num, 'consecutive_duplicate_pages': consecutive_duplicate_pages})
+
+    def _load_checkpoint(self):
+        state = database.load_crawl_state(self.config['database_file'], self.config['site_name'], 'pages', self.range_key, self.config_hash)
+        if not state or not state['cursor']:
+            logger.info("没有可用的检查点，从头开始抓取。")
+            return None
+        logger.info(f"从检查点续跑 ({state['updated_at']}): 上次完成到第 {state['cursor']['page']} 页。")
+        return state['cursor']
 
     def extract_item_info(self, item_row):
         details = {}
@@ -46,8 +141,7 @@ class NyaaScraper:
         raw_date_str = date_tag.get('data-timestamp') if date_tag and date_tag.get('data-timestamp') else (date_tag.get_text(strip=True) if date_tag else None)
         details['date'] = normalize_date(raw_date_str)
         # number_match = re.search(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', details['title'], re.IGNORECASE)
-        # 允许下划线作为分隔符，并允许结尾包含字母（适配 PACO, CARIB, 10MU 等格式）
-        number_match = re.search(r'([A-Z0-9]+(?:[_\-][A-Z0-9]+)+)', details['title'], re.IGNORECASE)
+        number_match = ITEM_NUMBER_PATTERN.search(details['title'])
         details['item_number'] = number_match.group(1).upper() if number_match else ''
         details['cover_image_url'] = ''
         tags = parse_tags_from_title(details['title'], self.tag_rules)
@@ -56,18 +150,219 @@ class NyaaScraper:
         logger.debug(f"解析出的标签: {tags}")
         return details, tags
 
+    def _get(self, url, **kwargs):
+        """配置了代理池时经代理发出请求，否则直连"""
+        if self.proxy_pool:
+            return self.proxy_pool.get(self.session, url, timeout=30, **kwargs)
+        return self.session.get(url, timeout=30, **kwargs)
+
+    def _write_bulk(self, records):
+        """写入一批 (details, tags): 配置了 spool 时追加到 spool，否则直接入库；返回值相同"""
+        if self.spool:
+            return self.spool.add_bulk(records)
+        return database.add_processed_posts_bulk(self.config['database_file'], self.config['site_name'], records)
+
+    def extract_rss_item(self, item, trackers):
+        """RSS 的 <item> -> 与 extract_item_info 相同字段的 (details, tags)；磁链由 infoHash 拼出"""
+        title = (item.findtext('title') or '').strip()
+        info_hash = (item.findtext('nyaa:infoHash', '', NYAA_NS) or '').strip().lower()
+        magnet = ''
+        if info_hash:
+            magnet = f"magnet:?xt=urn:btih:{info_hash}&dn={quote(title)}" + ''.join(f"&tr={quote(t, safe='')}" for t in trackers)
+        pub_date = item.findtext('pubDate')
+        try:
+            # 与 HTML 列表的 data-timestamp 一样按时间戳转换，两种模式写入的时间一致
+            date = normalize_date(str(int(parsedate_to_datetime(pub_date).timestamp()))) if pub_date else None
+        except (TypeError, ValueError):
+            date = normalize_date(pub_date)
+        number_match = ITEM_NUMBER_PATTERN.search(title)
+        details = {
+            'title': title,
+            'post_url': urljoin(self.base_url, (item.findtext('guid') or '').strip()),
+            'magnet_link': magnet,
+            'size': (item.findtext('nyaa:size', '', NYAA_NS) or '').strip(),
+            'date': date,
+            'item_number': number_match.group(1).upper() if number_match else '',
+            'cover_image_url': '',
+        }
+        tags = parse_tags_from_title(title, self.tag_rules)
+        logger.debug(f"RSS 条目: {json.dumps(details, ensure_ascii=False)} 标签: {tags}")
+        return details, tags
+
+    def _run_rss(self, stats, rss_config):
+        """
+        RSS 模式: 一次请求取回最新条目，用 XMLPullParser 边下载边解析 (已解析的 <item> 随即释放)，按批写库。
+        返回 'DONE' (已覆盖到高水位或没有高水位)、'GAP' (新条目超出 RSS 的长度，需要翻 HTML 列表补齐) 或 'ERROR'。
+        """
+        url = rss_config['url'] or rss_feed_url(self.base_url)
+        logger.info(f"RSS 模式: {url}")
+        parser = ET.XMLPullParser(events=('end',))
+        batch = []
+        reached_mark = False
+
+        def flush():
+            if not batch:
+                return
+            stats['total_found'] += len(batch)
+            budget.report_progress(items=len(batch))
+            with self.metrics.timer('db'):
+                results = self._write_bulk(batch)
+            for result in results:
+                stats[result] += 1
+            batch.clear()
+
+        try:
+            with self.metrics.timer('fetch'):
+                response = self._get(url, stream=True)
+                response.raise_for_status()
+            budget.report_progress(pages=1)
+            try:
+                chunks = response.iter_content(chunk_size=rss_config['chunk_size'])
+                while not reached_mark:
+                    with self.metrics.timer('fetch'):
+                        chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    with self.metrics.timer('parse'):
+                        parser.feed(chunk)
+                        records = []
+                        for _, element in parser.read_events():
+                            if element.tag != 'item':
+                                continue
+                            records.append(self.extract_rss_item(element, rss_config['trackers']))
+                            element.clear()
+                    for details, tags in records:
+                        if self._reached_high_water_mark(details):
+                            logger.info(f"RSS 到达高水位标记 (id <= {self.high_water_mark})。")
+                            reached_mark = True
+                            break
+                        if not details['magnet_link']:
+                            stats['total_found'] += 1
+                            stats['FAILED'] += 1
+                            continue
+                        batch.append((details, tags))
+                        if len(batch) >= rss_config['batch_size']:
+                            flush()
+                    if budget.stop_requested():
+                        logger.warning("收到停止请求，已解析的条目写入后结束。")
+                        break
+                if not reached_mark and not budget.stop_requested():
+                    parser.close()
+            finally:
+                response.close()
+        except (requests.RequestException, ET.ParseError) as e:
+            logger.error(f"读取 RSS 失败 {url}: {e}")
+            flush()
+            return 'ERROR'
+        flush()
+
+        if budget.stop_requested():
+            return 'ERROR'
+        self.finished_cleanly = True
+        if self.high_water_mark is not None and not reached_mark:
+            self.finished_cleanly = False
+            return 'GAP'
+        if self.high_water_mark is None:
+            logger.info("没有高水位标记，RSS 只包含最新的条目；更早的内容请用 HTML 模式抓取。")
+        return 'DONE'
+
+    def fetch_page_html(self, page_num):
+        """只负责网络请求 (流水线模式的抓取阶段)"""
+        base = self.base_url.strip().rstrip('/')
+        url = f"{base}?p={page_num}"
+        referer = f"{base}?p={page_num - 1}" if page_num > 1 else self.base_url
+        logger.info(f"正在抓取页面: {url}")
+        response = self._get(url, headers={'Referer': referer})
+        response.raise_for_status()
+        return response.text
+
+    def parse_page(self, page_num, html):
+        """解析整页 (流水线模式的解析阶段)，单条解析失败的位置返回 None"""
+        soup = BeautifulSoup(html, 'html.parser')
+        item_rows = soup.select(self.selectors['item_row'])
+        if not item_rows:
+            logger.warning(f"第 {page_num} 页上未找到信息条目")
+            return []
+        records = []
+        for row in item_rows:
+            try:
+                records.append(self.extract_item_info(row))
+            except Exception as e:
+                logger.error(f"处理单个条目时出错: {e}")
+                records.append(None)
+        return records
+
+    def _run_pipelined(self, start_page, end_page, stats, pipeline_config, consecutive_duplicate_pages=0):
+        stop_threshold = self.config.get('stop_on_consecutive_duplicates', 2)
+        limiter = RateLimiter(None if self.proxy_pool else 1.0 / max(self.config.get('request_delay', 1), 0.01))
+        state = {'consecutive_duplicate_pages': consecutive_duplicate_pages}
+        logger.info(f"使用流水线模式抓取: {pipeline_config}")
+
+        def fetch(page_num):
+            limiter.wait()
+            with self.metrics.timer('fetch'):
+                return self.fetch_page_html(page_num)
+
+        def parse(page_num, html):
+            with self.metrics.timer('parse'):
+                return self.parse_page(page_num, html)
+
+        def write(page_num, records):
+            if not records:
+                logger.info(f"第 {page_num} 页抓取失败或没有内容，任务结束。")
+                # 抓取失败 (None) 时保留检查点，空页 ([]) 视为正常结束
+                self.finished_cleanly = records is not None
+                return 'STOP'
+            reached_mark = False
+            for index, record in enumerate(records):
+                if record is not None and self._reached_high_water_mark(record[0]):
+                    records, reached_mark = records[:index], True
+                    break
+            stats['total_found'] += len(records)
+            budget.report_progress(pages=1, items=len(records))
+            valid = [r for r in records if r is not None]
+            stats['FAILED'] += len(records) - len(valid)
+            with self.metrics.timer('db'):
+                results = self._write_bulk(valid)
+            for result in results:
+                stats[result] += 1
+            if reached_mark:
+                logger.info(f"第 {page_num} 页到达高水位标记 (id <= {self.high_water_mark})，任务结束。")
+                self.finished_cleanly = True
+                return 'STOP'
+
+            if results.count('ADDED') == 0:
+                state['consecutive_duplicate_pages'] += 1
+                logger.info(f"页面 {page_num} 的所有内容均重复，连续重复页面计数: {state['consecutive_duplicate_pages']}/{stop_threshold}")
+            else:
+                state['consecutive_duplicate_pages'] = 0
+            self._save_checkpoint(page_num, state['consecutive_duplicate_pages'])
+            if state['consecutive_duplicate_pages'] >= stop_threshold:
+                logger.info(f"已连续遇到 {stop_threshold} 个完全重复的页面，自动终止抓取。")
+                self.finished_cleanly = True
+                return 'STOP'
+            if budget.stop_requested():
+                logger.warning(f"收到停止请求，第 {page_num} 页已写入并保存检查点，任务提前结束。")
+                return 'STOP'
+            if page_num >= end_page:
+                self.finished_cleanly = True
+            return 'CONTINUE'
+
+        PagePipeline(fetch, parse, write, **pipeline_config).run(start_page, end_page)
+
     def scrape_page(self, page_num, stats_counter):
         base = self.base_url.strip().rstrip('/')
         url = f"{base}?p={page_num}"
         page_stats = {'found': 0, 'added': 0}
         try:
             logger.info(f"正在抓取页面: {url}")
-            self.session.headers['Referer'] = f"{base}?p={page_num - 1}" if page_num > 1 else self.base_url
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            item_rows = soup.select(self.selectors['item_row'])
+            referer = f"{base}?p={page_num - 1}" if page_num > 1 else self.base_url
+            with self.metrics.timer('fetch'):
+                response = self._get(url, headers={'Referer': referer})
+                response.raise_for_status()
+            with self.metrics.timer('parse'):
+                soup = BeautifulSoup(response.text, 'html.parser')
+                item_rows = soup.select(self.selectors['item_row'])
             if not item_rows:
                 logger.warning(f"页面上未找到信息条目: {url}")
                 return page_stats
@@ -78,9 +373,15 @@ class NyaaScraper:
 
             for row in item_rows:
                 try:
-                    details, tags = self.extract_item_info(row)
+                    with self.metrics.timer('parse'):
+                        details, tags = self.extract_item_info(row)
+                    if self._reached_high_water_mark(details):
+                        page_stats['reached_mark'] = True
+                        break
                     # ---【核心修正：直接调用数据库函数，不再经过 process_item】---
-                    result = database.add_processed_post_with_tags(self.config['database_file'], self.config['site_name'], details, tags)
+                    with self.metrics.timer('db'):
+                        result = (self.spool.add(details, tags) if self.spool else
+                                  database.add_processed_post_with_tags(self.config['database_file'], self.config['site_name'], details, tags))
                     if result in stats_counter: 
                         stats_counter[result] += 1
                         if result == 'ADDED':
@@ -93,7 +394,7 @@ class NyaaScraper:
             logger.error(f"处理页面时出错 {url}: {e}")
             return None
 
-    def run(self, start_page, end_page_str):
+    def run(self, start_page, end_page_str, pipeline_config=None, resume=False, rss_config=None):
         stats = {'ADDED': 0, 'DUPLICATE': 0, 'FAILED': 0, 'total_found': 0}
         start_time = time.time()
         is_auto_mode = (str(end_page_str).lower() == 'auto')
@@ -101,14 +402,51 @@ class NyaaScraper:
         page_num = start_page
         consecutive_duplicate_pages = 0
         stop_threshold = self.config.get('stop_on_consecutive_duplicates', 2)
+        self.range_key = f"{start_page}-{str(end_page_str).lower()}"
+        self.finished_cleanly = False
+
+        if resume:
+            cursor = self._load_checkpoint()
+            if cursor:
+                page_num = cursor['page'] + 1
+                consecutive_duplicate_pages = cursor.get('consecutive_duplicate_pages', 0)
+
+        # 只有从第 1 页开始的 auto 增量抓取 (或 RSS 模式) 才使用/更新高水位标记，指定页码范围的回填不受影响
+        use_mark = self.config.get('high_water_mark', True) and (bool(rss_config) or (is_auto_mode and page_num == 1))
+        self.high_water_mark = None
+        self.newest_id = None
+        if use_mark:
+            mark = database.get_high_water_mark(self.config['database_file'], self.config['site_name'], 'list')
+            self.high_water_mark = int(mark) if mark else None
+            if self.high_water_mark:
+                logger.info(f"高水位标记: id {self.high_water_mark}，遇到该位置即停止 (连续重复页计数仍作为兜底)。")
         
         try:
+            if rss_config:
+                # RSS 只有一次请求，不使用翻页检查点
+                range_key, self.range_key = self.range_key, None
+                outcome = self._run_rss(stats, rss_config)
+                if outcome != 'GAP':
+                    return stats
+                logger.warning(f"RSS 中没有出现高水位标记 (id {self.high_water_mark})，新条目多于 RSS 的长度，从第 1 页翻 HTML 列表补齐。")
+                self.range_key, page_num, consecutive_duplicate_pages = range_key, 1, 0
+                end_page = float('inf')
+            if pipeline_config:
+                self._run_pipelined(page_num, end_page, stats, pipeline_config, consecutive_duplicate_pages)
+                return stats
             while page_num <= end_page:
                 logger.info(f"--- 开始处理第 {page_num} 页 ---")
                 page_stats = self.scrape_page(page_num, stats)
-                
+                if page_stats is not None:
+                    budget.report_progress(pages=1, items=page_stats['found'])
+
                 if page_stats is None or page_stats['found'] == 0:
                     logger.info(f"第 {page_num} 页抓取失败或没有内容，任务结束。")
+                    self.finished_cleanly = page_stats is not None
+                    break
+                if page_stats.get('reached_mark'):
+                    logger.info(f"第 {page_num} 页到达高水位标记 (id <= {self.high_water_mark})，任务结束。")
+                    self.finished_cleanly = True
                     break
 
                 is_fully_duplicate = (page_stats['found'] > 0 and page_stats['added'] == 0)
@@ -118,12 +456,30 @@ class NyaaScraper:
                 else:
                     consecutive_duplicate_pages = 0
 
+                self._save_checkpoint(page_num, consecutive_duplicate_pages)
                 if consecutive_duplicate_pages >= stop_threshold:
                     logger.info(f"已连续遇到 {stop_threshold} 个完全重复的页面，自动终止抓取。")
+                    self.finished_cleanly = True
+                    break
+                if budget.stop_requested():
+                    logger.warning(f"收到停止请求，第 {page_num} 页已写入并保存检查点，任务提前结束。")
                     break
                 page_num += 1
-                time.sleep(self.config.get('request_delay', 1))
+                if not self.proxy_pool:
+                    time.sleep(self.config.get('request_delay', 1))
+            else:
+                self.finished_cleanly = True
         finally:
+            if self.finished_cleanly:
+                database.clear_crawl_state(self.config['database_file'], self.config['site_name'], 'pages')
+                # 只在完整抓到旧数据边界后推进标记，避免中断时跳过未抓取的区间
+                if use_mark and self.newest_id and (self.high_water_mark is None or self.newest_id > self.high_water_mark):
+                    database.set_high_water_mark(self.config['database_file'], self.config['site_name'], 'list', self.newest_id)
+            elif self.range_key:
+                logger.info("任务未正常结束，检查点已保留，可使用 --resume 继续。")
+            if self.spool:
+                spool.close_writer(self.config['site_name'])
+            run = self.metrics.finish(stats)
             end_time = time.time()
             duration = end_time - start_time
             db_path = self.config['database_file']
@@ -139,6 +495,7 @@ class NyaaScraper:
             - 开始时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}
             - 结束时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}
             - 总耗时: {time.strftime('%H时%M分%S秒', time.gmtime(duration))}
+            - 吞吐: {self.metrics.describe(run)}
     
             --- 处理结果 ---
             - 页面发现总数: {stats['total_found']}
@@ -152,19 +509,47 @@ class NyaaScraper:
             \n{bottom_line}
             """
             logger.info(summary)
+            if self.proxy_pool:
+                logger.info(f"代理使用情况: {self.proxy_pool.describe()}")
+            if self.spool:
+                logger.info(f"spool: {self.spool.describe()}")
+        return stats
 
-if __name__ == "__main__":
+def main(argv=None):
+    """命令行入口；也可由 task_runner 在预热进程中直接调用，返回统计字典"""
     parser = argparse.ArgumentParser(description='从 nyaa.si 这样的列表页网站抓取种子信息。')
     parser.add_argument("--site", "-s", required=True, help="网站标识")
     parser.add_argument('--start-page', type=int, default=1, help='起始页码 (默认: 1)')
     parser.add_argument('--end-page', type=str, default='auto', help="结束页码或 'auto' (默认: 'auto')")
-    args = parser.parse_args()
+    parser.add_argument('--pipeline', action='store_true', help="使用 抓取/解析/写入 分离的流水线模式 (也可在配置 pipeline.enabled 中开启)")
+    parser.add_argument('--resume', action='store_true', help="从上次中断的检查点继续 (抓取范围或配置变化时检查点自动失效)")
+    parser.add_argument('--rss', action='store_true', help="读取 RSS 而不是翻 HTML 列表 (也可在配置 rss.enabled 中开启)")
+    parser.add_argument('--spool', action='store_true', help="结果写入 spool 文件，由 spool_loader 另行入库 (也可在配置 spool.enabled 中开启)")
+    args = parser.parse_args(argv)
 
     config = load_config(args.site)
+    if args.spool:
+        config['spool'] = {**(config.get('spool') or {}), 'enabled': True}
     setup_logging(config['log_level'], config['site_name'], "scrape_nyaa")
     database.init_db(config['database_file'])
 
-    scraper = NyaaScraper(config)
-    scraper.run(args.start_page, args.end_page)
+    rss_config = get_rss_config(config, force=args.rss)
+    # RSS 只替代日常增量 (从第 1 页开始的 auto 且不续跑)；指定页码范围的回填或 --resume 仍翻 HTML 列表，除非显式传入 --rss
+    ignored = ([] if args.start_page == 1 and args.end_page.lower() == 'auto' else [f"页码范围 {args.start_page}-{args.end_page}"]) + \
+              (["--resume"] if args.resume else [])
+    if rss_config and ignored:
+        if args.rss:
+            logger.warning(f"已指定 --rss，忽略 {' 与 '.join(ignored)}。")
+        else:
+            logger.info(f"指定了 {' 与 '.join(ignored)}，本次翻 HTML 列表，不使用配置中的 RSS 模式。")
+            rss_config = None
+
+    scraper = NyaaScraper(config, RunMetrics(config, "scrape_nyaa", argv))
+    stats = scraper.run(args.start_page, args.end_page, get_pipeline_config(config, force=args.pipeline), resume=args.resume,
+                        rss_config=rss_config)
 
     logger.info("所有任务处理完毕。")
+    return stats
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import glob
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import psutil
+
+import database
+
+logger = logging.getLogger(__name__)
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPTS_DIR)
+
+DEFAULT_SPOOL_CONFIG = {
+    'dir': 'spool',
+    'max_segment_mb': 16,
+    'max_segment_seconds': 300,
+    'fsync': False,
+    'batch_size': 500,
+    'stale_seconds': 3600,
+    'keep_segments': False,
+    'poll_interval': 5,
+}
+
+# 正在写入的段带 .open 后缀，写满或到时后改名封存；loader 对两者都按已记录的偏移增量读取
+SEGMENT_SUFFIX = '.ndjson'
+OPEN_SUFFIX = '.open'
+DONE_SUFFIX = '.done'
+
+# 与 database 中提取 info_hash 的规则一致: 没有 info_hash 的记录入库时同样记为 FAILED
+INFO_HASH_PATTERN = re.compile(r'btih:([a-fA-F0-9]+)')
+
+# 段序号在进程内递增 (不随写入器重建归零)，同一秒内先后打开的段也不会重名
+_segment_seq = itertools.count(1)
+
+def get_spool_config(config, force=False):
+    """
+    读取站点配置中的 spool 段，未启用时返回 None (也可用 scrape_nyaa/scrape_javbee 的 --spool 临时开启)。
+    配置示例:
+        spool:
+          enabled: true
+          dir: "spool"               # 相对项目根目录，各站点写入 <dir>/<site>/
+          max_segment_mb: 16         # 段文件超过该大小即封存并开始新段
+          max_segment_seconds: 300   # 段文件打开超过该时间即封存
+          fsync: false               # 每次写入后 fsync (断电也不丢数据，写入变慢)
+          batch_size: 500            # spool_loader 每个事务写入的记录数
+          stale_seconds: 3600        # .open 段超过该时间未修改且写入进程已退出时，loader 将其封存后入库
+          keep_segments: false       # 入库完成的段改名为 .done 保留，而不是删除
+          poll_interval: 5           # spool_loader --follow 的轮询间隔 (秒)
+    """
+    raw = config.get('spool') or {}
+    if not force and not raw.get('enabled'):
+        return None
+    settings = {**DEFAULT_SPOOL_CONFIG, **raw}
+    settings.pop('enabled', None)
+    return settings
+
+def spool_dir(config, settings):
+    return os.path.join(PROJECT_ROOT, settings['dir'], config['site_name'])
+
+def segment_name(path):
+    """段的名称 (去掉 .open 后缀)，封存前后相同，用作 spool_offsets 的键"""
+    name = os.path.basename(path)
+    return name[:-len(OPEN_SUFFIX)] if name.endswith(OPEN_SUFFIX) else name
+
+def writer_alive(path):
+    """段名中记录的写入进程 (本机) 是否仍在运行"""
+    try:
+        return psutil.pid_exists(int(segment_name(path).split('-')[1]))
+    except (IndexError, ValueError):
+        return False
+
+def list_segments(directory):
+    """按创建顺序列出未入库完成的段 (含正在写入的 .open 段)"""
+    paths = glob.glob(os.path.join(directory, f"*{SEGMENT_SUFFIX}")) + glob.glob(os.path.join(directory, f"*{SEGMENT_SUFFIX}{OPEN_SUFFIX}"))
+    return sorted(paths, key=segment_name)
+
+class SpoolWriter:
+    """
+    只追加的 NDJSON spool: 每行一条 {"details": ..., "tags": [...]}，按大小/时间轮转。
+    add/add_bulk 的返回值与 database.add_processed_post_with_tags / add_processed_posts_bulk 相同，
+    其中 ADDED 表示已写入 spool；DUPLICATE 由只读查询 (WAL 模式下不等待写锁) 和本次已写入的记录判断，
+    数据库繁忙时跳过查询，由 loader 入库时去重。
+    """
+    def __init__(self, config, settings):
+        self.db_path = config['database_file']
+        self.source = config['site_name']
+        self.settings = settings
+        self.directory = spool_dir(config, settings)
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+        self._opened_at = 0
+        self._seen = set()
+        self.written = 0
+        self.segments = 0
+
+    def _open(self):
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}-{os.getpid()}-{next(_segment_seq):04d}{SEGMENT_SUFFIX}{OPEN_SUFFIX}"
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path, 'ab')
+        self._opened_at = time.time()
+        self.segments += 1
+
+    def _seal(self):
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path, self._path[:-len(OPEN_SUFFIX)])
+        logger.debug(f"spool 段已封存: {segment_name(self._path)}")
+        self._file = self._path = None
+
+    def _append(self, lines):
+        with self._lock:
+            if self._file is None:
+                self._open()
+            self._file.write(b''.join(lines))
+            # 每批写完即 flush，loader 可以随时读到完整的行
+            self._file.flush()
+            if self.settings['fsync']:
+                os.fsync(self._file.fileno())
+            if (self._file.tell() >= self.settings['max_segment_mb'] * 1024 * 1024
+                    or time.time() - self._opened_at >= self.settings['max_segment_seconds']):
+                self._seal()
+
+    def _known_urls(self, urls):
+        try:
+            return set(urls) - set(database.filter_new_urls(self.db_path, self.source, urls))
+        except sqlite3.OperationalError as e:
+            logger.debug(f"spool 去重查询跳过 (数据库繁忙): {e}")
+            return set()
+
+    def add_bulk(self, records):
+        if not records: return []
+        known = self._known_urls([details.get('post_url') for details, _ in records if details.get('post_url')])
+        results, lines = [], []
+        with self._lock:
+            for details, tags in records:
+                match = INFO_HASH_PATTERN.search(details.get('magnet_link') or '')
+                if not match:
+                    logger.warning(f"缺少 info_hash，跳过记录: {details.get('title')}")
+                    results.append('FAILED')
+                    continue
+                keys = {('url', details.get('post_url')), ('hash', match.group(1).lower())}
+                if details.get('post_url') in known or keys & self._seen:
+                    results.append('DUPLICATE')
+                    continue
+                self._seen.update(keys)
+                lines.append(json.dumps({'details': details, 'tags': list(tags or [])}, ensure_ascii=False).encode('utf-8') + b'\n')
+                results.append('ADDED')
+            self.written += len(lines)
+        if lines:
+            self._append(lines)
+        return results
+
+    def add(self, details, tags):
+        return self.add_bulk([(details, tags)])[0]
+
+    def close(self):
+        """封存当前段；之后再写入会开始新段 (去重集合一并清空，之后由数据库查询与 loader 去重)"""
+        with self._lock:
+            self._seal()
+            self._seen.clear()
+
+    def describe(self):
+        return f"写入 {self.written} 条 ({self.segments} 个段) 到 {self.directory}，待 spool_loader 入库"
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_writer(config):
+    """同一进程内同一站点共用一个 spool 写入器 (多日并发的各下载器写入同一组段)；未启用 spool 时返回 None"""
+    settings = get_spool_config(config)
+    if settings is None:
+        return None
+    with _writers_lock:
+        writer = _writers.get(config['site_name'])
+        if writer is None or writer.settings != settings:
+            if writer is not None:
+                writer.close()
+            writer = _writers[config['site_name']] = SpoolWriter(config, settings)
+            logger.info(f"[{config['site_name']}] 抓取结果写入 spool: {writer.directory}")
+        return writer
+
+def close_writer(site_name):
+    """
+    封存该站点当前的段 (抓取脚本结束时调用)，返回写入器以便输出本次的统计；没有写入器时返回 None。
+    写入器同时移出缓存，预热进程中的下一次运行重新计数。
+    """
+    with _writers_lock:
+        writer = _writers.pop(site_name, None)
+    if writer is not None:
+        writer.close()
+    return writer
+
+def read_batches(path, offset, batch_size):
+    """
+    从 offset 开始读取完整的行，产出 (起始偏移, 结束偏移, [(details, tags)], 无法解析的行数)。
+    结尾不完整的行 (写入进程正在写或已崩溃) 不读取，结束偏移停在它之前。
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        start, records, bad = offset, [], 0
+        position = offset
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            position += len(line)
+            try:
+                entry = json.loads(line)
+                records.append((entry['details'], entry.get('tags') or []))
+            except (ValueError, KeyError, TypeError) as e:
+                logger.error(f"spool 段 {segment_name(path)} 偏移 {position - len(line)} 的行无法解析，跳过: {e}")
+                bad += 1
+            if len(records) + bad >= batch_size:
+                yield start, position, records, bad
+                start, records, bad = position, [], 0
+        if records or bad:
+            yield start, position, records, bad
@@ -0,0 +1,136 @@
+import argparse
+import logging
+import os
+import time
+
+import database
+import budget
+import spool
+from run_metrics import RunMetrics
+from utils import setup_logging, load_config
+
+logger = logging.getLogger(__name__)
+
+def load_segment(config, settings, path, stats, metrics):
+    """
+    把一个段中尚未入库的部分写入数据库 (每批记录与段的偏移在同一事务中提交)；
+    已封存的段全部入库后删除 (或改名为 .done)。返回该段是否已处理完毕。
+    """
+    db_path = config['database_file']
+    source = config['site_name']
+    name = spool.segment_name(path)
+    if (path.endswith(spool.OPEN_SUFFIX) and time.time() - os.path.getmtime(path) > settings['stale_seconds']
+            and not spool.writer_alive(path)):
+        sealed = path[:-len(spool.OPEN_SUFFIX)]
+        os.replace(path, sealed)
+        logger.warning(f"段 {name} 超过 {settings['stale_seconds']}s 未写入，写入进程应已退出，封存后入库。")
+        path = sealed
+
+    offset = database.get_spool_offset(db_path, source, name)
+    if offset is None:
+        # 上次标记完成后、删除文件之前退出 (或另一个 loader 刚刚完成)，只需清理文件
+        _remove_segment(path, settings)
+        return True
+    try:
+        for start, end, records, bad in spool.read_batches(path, offset, settings['batch_size']):
+            with metrics.timer('db'):
+                results = database.ingest_spool_batch(db_path, source, name, start, end, records)
+            if results is None:
+                logger.warning(f"段 {name} 的入库进度已被另一个 loader 推进，本次跳过该段。")
+                return False
+            offset = end
+            stats['total_found'] += len(records) + bad
+            stats['FAILED'] += bad
+            for result in results:
+                stats[result] += 1
+            budget.report_progress(items=len(records) + bad)
+            logger.info(f"段 {name}: 写入 {len(records)} 条 (新增 {results.count('ADDED')}, 重复 {results.count('DUPLICATE')})，偏移 {end}")
+            if budget.stop_requested():
+                return False
+    except FileNotFoundError:
+        # 读取前写入进程刚好封存了这个段 (.open 改名)，下一轮按新文件名继续
+        return False
+
+    if path.endswith(spool.OPEN_SUFFIX):
+        return False
+    size = os.path.getsize(path)
+    # 先在数据库中标记完成再删除文件: 完成标记一直保留，并发的 loader 不会把已删除的段当作从偏移 0 开始
+    if not database.finish_spool_segment(db_path, source, name, offset):
+        logger.warning(f"段 {name} 的入库进度已被另一个 loader 推进，本次跳过该段。")
+        return False
+    if offset < size:
+        logger.warning(f"段 {name} 结尾有 {size - offset} 字节不完整的行 (写入进程异常退出)，已丢弃。")
+        stats['FAILED'] += 1
+    _remove_segment(path, settings)
+    stats['segments'] += 1
+    return True
+
+def _remove_segment(path, settings):
+    """删除已全部入库的段 (keep_segments 时改名为 .done)；已被另一个 loader 处理掉时忽略"""
+    try:
+        if settings['keep_segments']:
+            os.replace(path, path + spool.DONE_SUFFIX)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def main(argv=None):
+    """命令行入口；也可由 task_runner 在预热进程中直接调用，返回统计字典"""
+    parser = argparse.ArgumentParser(description="将抓取脚本写入 spool 的记录批量入库 (每条记录只入库一次)。")
+    parser.add_argument("--site", "-s", required=True, help="网站标识")
+    parser.add_argument("--follow", action="store_true", help="持续运行: 处理完现有的段后继续轮询新写入的记录")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.site)
+    db_path = config['database_file']
+    setup_logging(config['log_level'], config['site_name'], "spool_loader")
+    database.init_db(db_path)
+    settings = spool.get_spool_config(config, force=True)
+    directory = spool.spool_dir(config, settings)
+    logger.info(f"开始将 spool '{directory}' 入库到 '{db_path}'{' (持续模式)' if args.follow else ''}")
+
+    stats = {'ADDED': 0, 'DUPLICATE': 0, 'FAILED': 0, 'total_found': 0, 'segments': 0}
+    start_time = time.time()
+    metrics = RunMetrics(config, "spool_loader", argv)
+    try:
+        while not budget.stop_requested():
+            for path in spool.list_segments(directory):
+                load_segment(config, settings, path, stats, metrics)
+                if budget.stop_requested():
+                    break
+            if not args.follow:
+                break
+            time.sleep(settings['poll_interval'])
+    except KeyboardInterrupt:
+        logger.warning("收到中断信号，已提交的批次不会重复入库。")
+    finally:
+        run = metrics.finish(stats)
+        duration = time.time() - start_time
+        remaining = spool.list_segments(directory) if os.path.isdir(directory) else []
+
+        width = 62
+        top_line = f"{' spool 入库总结 ':=^{width}}"
+        bottom_line = "=" * width
+        summary = f"""
+        \n{top_line}
+        - 目标网站: {config['site_name']}
+        - 总耗时: {time.strftime('%H时%M分%S秒', time.gmtime(duration))}
+        - 吞吐: {metrics.describe(run)}
+
+        --- 处理结果 ---
+        - 读取记录: {stats['total_found']} (完成 {stats['segments']} 个段，剩余 {len(remaining)} 个)
+        - ✅ 成功新增记录: {stats['ADDED']}
+        - ⏩ 检测到重复记录: {stats['DUPLICATE']}
+        - ❌ 处理失败记录: {stats['FAILED']}
+
+        --- 数据库状态 ---
+        - 数据库文件: {db_path}
+        - 数据库总记录数: {database.get_total_count(db_path)}
+        \n{bottom_line}
+        """
+        logger.info(summary)
+    return stats
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+import importlib
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+import budget
+
+logger = logging.getLogger(__name__)
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPTS_DIR)
+
+# 阶段名 -> 模块名，模块需提供 main(argv) 并返回统计字典
+STAGES = {
+    'fetch_urls': 'fetch_urls',
+    'process_details': 'process_details',
+    'scrape_nyaa': 'scrape_nyaa',
+    'scrape_javbee': 'scrape_javbee',
+    'import_torrents': 'import_torrents',
+    'retag': 'retag',
+    'spool_loader': 'spool_loader',
+}
+
+# 工作进程启动后立即导入的模块 (selenium/bs4/yaml 等重量级依赖随阶段模块一并加载)
+DEFAULT_PRELOAD = ['yaml', 'bs4', 'requests', 'psutil', 'selenium.webdriver', 'database', 'utils'] + list(STAGES.values())
+
+def _worker_main(conn, preload):
+    """工作进程: 预先导入依赖，然后逐个执行父进程发来的 (阶段, 参数)，把结果发回"""
+    os.chdir(PROJECT_ROOT)
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    budget.install_stop_handler()
+    import utils
+    send_lock = threading.Lock()
+
+    def send(message):
+        # 进度可能由阶段内的其他线程报告，与最终结果共用一个管道
+        with send_lock:
+            conn.send(message)
+
+    warm_start = time.time()
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            # 缺少可选依赖时推迟到真正执行阶段再报错
+            pass
+    send({'ready': True, 'pid': os.getpid(), 'warmup_seconds': round(time.time() - warm_start, 3)})
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        stage, argv, config_overrides = message
+        budget.reset(reporter=lambda progress: send({'progress': progress}))
+        utils.set_config_overrides(config_overrides)
+        started = time.time()
+        reply = {'ok': True, 'stats': {}, 'error': None, 'started_at': started}
+        try:
+            stats = importlib.import_module(STAGES[stage]).main(list(argv))
+            reply['stats'] = stats or {}
+        except SystemExit as e:
+            # 脚本内部的 sys.exit (如配置文件不存在) 视为阶段失败，不结束工作进程
+            if e.code not in (None, 0):
+                reply.update(ok=False, error=f"退出码: {e.code}")
+        except BaseException as e:
+            reply.update(ok=False, error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+        reply['seconds'] = round(time.time() - started, 3)
+        reply['progress'] = budget.get_progress()
+        budget.reset()
+        utils.set_config_overrides(None)
+        try:
+            send(reply)
+        except (OSError, ValueError, TypeError) as e:
+            # 统计结果无法序列化时只回传错误
+            send({'ok': False, 'stats': {}, 'error': f"结果无法回传: {e}", 'started_at': started, 'seconds': reply['seconds']})
+
+class _Worker:
+    def __init__(self, ctx, preload):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, preload), name="magneto-task-worker")
+        self.process.start()
+        child_conn.close()
+        self.ready = None
+        self.tasks = 0
+
+    def is_ready(self):
+        """非阻塞地读取预热完成消息"""
+        if self.ready is None and self.conn.poll():
+            try:
+                self.ready = self.conn.recv()
+            except (EOFError, OSError):
+                self.ready = {}
+        return bool(self.ready)
+
+    def recv(self):
+        """读取下一条阶段消息 (进度或结果)；读到尚未处理的预热完成消息时记录下来并返回 None"""
+        message = self.conn.recv()
+        if self.ready is None and message.get('ready'):
+            self.ready = message
+            return None
+        return message
+
+    def stop(self, timeout=5):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+class StageRun:
+    """
+    一次已提交的阶段执行，wait() 返回结构化结果。
+    带 budget 时 wait() 同时充当监督者: 超出运行时间/内存/页数/条目数限制后先发送 SIGTERM 让阶段在
+    页面边界处提交当前批次和检查点后退出；grace_seconds 过半仍未结束再发一次 (在主线程抛出 StopRequested)；
+    到期后强制结束整个进程树。
+    """
+    def __init__(self, runner, worker, stage, argv, submitted_at, warm, budget_limits=None):
+        self.runner = runner
+        self.worker = worker
+        self.stage = stage
+        self.argv = list(argv)
+        self.submitted_at = submitted_at
+        self.warm = warm
+        self.budget = budget_limits if budget.has_limits(budget_limits) else None
+        self.progress = {'pages': 0, 'items': 0}
+        self.budget_exceeded = None
+        self.result = None
+
+    @property
+    def pid(self):
+        return self.worker.process.pid
+
+    def _supervise(self):
+        """读取进度直到收到结果；超出预算时逐级停止。进程树被强制结束时返回 None"""
+        interval = self.budget['check_interval'] if self.budget else None
+        stop_sent_at = None
+        signals_sent = 0
+        while True:
+            if self.worker.conn.poll(interval):
+                message = self.worker.recv()
+                if message is not None and not ('progress' in message and len(message) == 1):
+                    return message
+                # 进度消息之后同样检查预算，持续有进度时也不会错过超限
+                if message is not None:
+                    self.progress = message['progress']
+                if not self.budget:
+                    continue
+            now = time.time()
+            if stop_sent_at is None:
+                rss_mb = budget.process_tree_rss_mb(self.pid) if self.budget.get('max_rss_mb') else 0
+                reason = budget.check_budget(self.budget, now - self.submitted_at, rss_mb, self.progress)
+                if reason:
+                    self.budget_exceeded = reason
+                    logger.warning(f"阶段 {self.stage} (pid {self.pid}) {reason}，要求其收尾退出。")
+                    self._signal_stop()
+                    stop_sent_at, signals_sent = now, 1
+                continue
+            grace = self.budget['grace_seconds']
+            if signals_sent == 1 and now - stop_sent_at >= grace / 2:
+                logger.warning(f"阶段 {self.stage} (pid {self.pid}) 仍未结束，再次发送停止信号。")
+                self._signal_stop()
+                signals_sent = 2
+            elif now - stop_sent_at >= grace:
+                killed = budget.kill_process_tree(self.pid)
+                logger.error(f"阶段 {self.stage} 在 {grace}s 宽限期内未结束，已强制结束进程树 ({killed} 个进程)。")
+                return None
+
+    def _signal_stop(self):
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def wait(self):
+        if self.result is not None:
+            return self.result
+        healthy = True
+        try:
+            reply = self._supervise()
+        except (EOFError, OSError):
+            self.worker.process.join(1)
+            reply = {'ok': False, 'stats': {}, 'error': f"工作进程异常退出 (exitcode={self.worker.process.exitcode})"}
+            healthy = False
+        if reply is None:
+            reply = {'ok': False, 'stats': {}, 'error': f"预算超限 ({self.budget_exceeded})，阶段未能在宽限期内结束，进程树已被强制结束"}
+            healthy = False
+        elif self.budget_exceeded:
+            reply['ok'] = False
+            reply['error'] = f"预算超限: {self.budget_exceeded}" + (f" ({reply['error']})" if reply.get('error') else "")
+        started_at = reply.pop('started_at', None)
+        self.result = {
+            'stage': self.stage,
+            'argv': self.argv,
+            'pid': self.pid,
+            'warm': self.warm,
+            # 从提交到阶段函数开始执行的等待时间，即“启动开销”
+            'startup_ms': round((started_at - self.submitted_at) * 1000, 1) if started_at else None,
+            'progress': self.progress,
+            'budget_exceeded': self.budget_exceeded,
+            **reply,
+        }
+        self.runner._finish(self.worker, healthy)
+        return self.result
+
+class TaskRunner:
+    """
+    预热进程池: 始终保持 spares 个已导入全部依赖的空闲工作进程 (spawn 方式启动，互不共享状态)。
+    每提交一个阶段就取走一个空闲进程并立即补充新的备用进程；
+    默认每个进程只执行一个阶段后退出 (max_tasks_per_worker=1)，与原先独立子进程的隔离程度相同。
+    """
+    def __init__(self, spares=1, max_tasks_per_worker=1, preload=None):
+        self.ctx = multiprocessing.get_context('spawn')
+        self.spares = max(0, spares)
+        self.max_tasks_per_worker = max(1, max_tasks_per_worker)
+        self.preload = DEFAULT_PRELOAD if preload is None else list(preload)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+        # 工作进程不是 daemon (import_torrents 等阶段还会创建自己的子进程)，
+        # 需要在 multiprocessing 退出时 join 子进程之前先通知它们结束 (与 multiprocessing.Pool 的做法相同)
+        multiprocessing.util.Finalize(self, self.close, exitpriority=15)
+        self._fill()
+
+    def _fill(self):
+        with self._lock:
+            while not self._closed and len(self._idle) < self.spares:
+                self._idle.append(_Worker(self.ctx, self.preload))
+
+    def submit(self, stage, argv=(), budget_limits=None, config_overrides=None):
+        """
+        在空闲的预热进程中开始执行阶段，立即返回 StageRun；budget_limits 见 budget.get_budget_config，
+        config_overrides ({站点名: {配置项: 值}}) 只在本次阶段中覆盖站点配置
+        """
+        if stage not in STAGES:
+            raise ValueError(f"未知阶段: {stage}")
+        submitted_at = time.time()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("TaskRunner 已关闭")
+            # 优先使用已完成预热的进程
+            self._idle = [w for w in self._idle if w.process.is_alive()]
+            ready = [w for w in self._idle if w.is_ready()]
+            worker = (ready or self._idle or [None])[0]
+            if worker is not None:
+                self._idle.remove(worker)
+        if worker is None:
+            worker = _Worker(self.ctx, self.preload)
+        warm = worker.is_ready()
+        worker.tasks += 1
+        worker.conn.send((stage, list(argv), config_overrides or {}))
+        self._fill()
+        return StageRun(self, worker, stage, argv, submitted_at, warm, budget_limits)
+
+    def run(self, stage, argv=(), budget_limits=None, config_overrides=None):
+        return self.submit(stage, argv, budget_limits, config_overrides).wait()
+
+    def _finish(self, worker, healthy):
+        with self._lock:
+            keep = (healthy and not self._closed and worker.tasks < self.max_tasks_per_worker
+                    and len(self._idle) < self.spares and worker.process.is_alive())
+            if keep:
+                self._idle.append(worker)
+        if not keep:
+            worker.stop()
+        self._fill()
+
+    def status(self):
+        with self._lock:
+            return {'spares': self.spares, 'idle': len(self._idle),
+                    'ready': sum(1 for w in self._idle if w.is_ready()),
+                    'pids': [w.process.pid for w in self._idle]}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
@@ -5,36 +5,30 @@ import time
 import yaml
 import re
 import json
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+import hashlib
+import threading
 from datetime import datetime
 
 DEFAULT_CONFIG = {"log_level": "INFO", "request_delay": 1}
 logger = logging.getLogger(__name__)
 
-def setup_driver():
-    options = Options()
-    options.page_load_strategy = 'eager'
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36")
-    options.add_argument("--disable-blink-features=AutomationControlled")
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
-    chromedriver_path = os.environ.get("CHROMEDRIVER_PATH", "/usr/bin/chromedriver")
-    try:
-        service = Service(chromedriver_path)
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.set_page_load_timeout(60)
-        driver.set_script_timeout(60)
-        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"})
-        logger.info("成功启动 WebDriver (已应用基础反检测设置)。")
-        return driver
-    except Exception as e:
-        logger.error(f"启动 WebDriver 失败: {e}")
-        sys.exit(1)
+# 站点名 -> 临时覆盖的配置项 (run_task.py run_all 按共享预算压低并发/速率时，由工作进程在执行阶段前设置)
+_config_overrides = {}
+
+class RateLimiter:
+    """线程安全的全局限速器: 保证所有线程的请求之间至少间隔 1/rate_per_second 秒"""
+    def __init__(self, rate_per_second):
+        self.min_interval = 1.0 / rate_per_second if rate_per_second and rate_per_second > 0 else 0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if wait_time > 0:
+            time.sleep(wait_time)
 
 def setup_logging(log_level_str, site_name, log_prefix="script"):
     for handler in logging.root.handlers[:]:
@@ -49,6 +43,11 @@ def setup_logging(log_level_str, site_name, log_prefix="script"):
     logging.basicConfig(level=numeric_level, format="[%(asctime)s] [%(levelname)s] %(message)s", handlers=[logging.FileHandler(log_file_path, encoding='utf-8'), logging.StreamHandler(sys.stdout)])
     logger.info(f"日志已配置。级别: {log_level_str}, 文件: {log_file_path}")
 
+def set_config_overrides(overrides=None):
+    """设置 load_config 在读取 YAML 之后合并的覆盖项 ({站点名: {配置项: 值}})，传 None 清空"""
+    _config_overrides.clear()
+    _config_overrides.update(overrides or {})
+
 def load_config(site_name):
     if not site_name:
         print("错误: 必须通过 --site <site_name> 参数指定一个网站配置。")
@@ -58,8 +57,9 @@ def load_config(site_name):
     current_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(current_dir)
     
-    # 2. 读取 YAML
-    config_path = os.path.join(project_root, 'configs', f"{site_name}.yaml")
+    # 2. 读取 YAML (MAGNETO_CONFIG_DIR 可指向另一套配置，如压测用的替身站点配置)
+    config_dir = os.environ.get("MAGNETO_CONFIG_DIR") or os.path.join(project_root, 'configs')
+    config_path = os.path.join(config_dir, f"{site_name}.yaml")
     if not os.path.exists(config_path):
         print(f"错误: 配置文件未找到: {config_path}")
         sys.exit(1)
@@ -71,7 +71,7 @@ def load_config(site_name):
         print(f"错误: 加载或解析配置文件 {config_path} 失败: {e}")
         sys.exit(1)
         
-    config = {**DEFAULT_CONFIG, **site_config}
+    config = {**DEFAULT_CONFIG, **site_config, **_config_overrides.get(site_name, {})}
     config['site_name'] = site_name
 
     # --- 【核心修改：智能数据库路径处理】 ---
@@ -94,6 +94,11 @@ def load_config(site_name):
 
     return config
 
+def config_fingerprint(config, keys):
+    """对配置中影响抓取结果的字段计算指纹，用于判断检查点是否过期"""
+    subset = {key: config.get(key) for key in keys}
+    return hashlib.sha1(json.dumps(subset, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()[:16]
+
 def normalize_date(date_str):
     """
     尝试解析多种常见的日期格式（包括Unix时间戳秒/毫秒），并将其标准化为 'YYYY-MM-DD HH:MM:SS'。
@@ -158,6 +163,19 @@ def normalize_date(date_str):
     return date_str
 
 
+def extract_item_number(title):
+    """从标题中提取番号: 优先匹配 ABC-123 形式，其次 ABC123 紧凑形式，短标题直接作为番号"""
+    if not title: return ''
+    standard_match = re.search(r'([A-Z0-9]+(?:-[A-Z0-9]+)*-\d+)', title, re.IGNORECASE)
+    if standard_match:
+        return standard_match.group(1).upper()
+    compact_match = re.search(r'([A-Z]+)(\d{3,})', title, re.IGNORECASE)
+    if compact_match:
+        return f"{compact_match.group(1).upper()}-{compact_match.group(2)}"
+    if len(title) < 15:
+        return title.strip().upper()
+    return ''
+
 def parse_tags_from_title(title, tag_rules):
     found_tags = set()
     if not title or not tag_rules: return []
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+import uuid
+
+import database
+from utils import load_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORK_QUEUE_CONFIG = {
+    'lease_seconds': 300,
+    'max_batch': 20,
+    'result_retention_hours': 24,
+}
+
+# 仍可接受处理结果的 URL 状态 (FAILED: --retry-failed 领取的任务)
+PENDING_STATUSES = {'NEW', 'FAILED'}
+
+# 提交的检查与写入需作为一个整体执行，避免两个线程同时提交同一 URL 时重复写入
+_submit_lock = threading.Lock()
+_ready_dbs = set()
+
+def get_work_queue_config(config):
+    """
+    读取站点配置中的 work_queue 段 (远程工作进程从 app 领取详情页 URL):
+        work_queue:
+          lease_seconds: 300          # 租约时长，工作进程每 1/3 租约发送一次心跳；超时未续期的 URL 重新分配给其他工作进程
+          max_batch: 20               # 单次领取的 URL 数上限
+          result_retention_hours: 24  # 提交结果的保留时间，期间同一租约重复提交直接返回原结果
+    """
+    return {**DEFAULT_WORK_QUEUE_CONFIG, **(config.get('work_queue') or {})}
+
+def site_config(site):
+    """读取站点配置，不存在或无法解析时返回 None"""
+    try:
+        return load_config(site)
+    except SystemExit:
+        return None
+
+def worker_config(config):
+    """发给工作进程的配置: 去掉只在本机有意义的数据库路径"""
+    return {k: v for k, v in config.items() if k != 'database_file'}
+
+def _db_path(config):
+    db_path = config['database_file']
+    if db_path not in _ready_dbs:
+        database.init_db(db_path)
+        _ready_dbs.add(db_path)
+    return db_path
+
+def claim(config, worker, limit, retry_failed=False):
+    settings = get_work_queue_config(config)
+    lease_id = uuid.uuid4().hex
+    limit = max(1, min(limit, settings['max_batch']))
+    urls = database.claim_urls(_db_path(config), config['site_name'], lease_id, worker, limit, settings['lease_seconds'],
+                               retry_failed, settings['result_retention_hours'] * 3600)
+    if urls:
+        logger.info(f"[{config['site_name']}] 工作进程 {worker} 领取 {len(urls)} 个 URL (租约 {lease_id[:8]})。")
+    return {'lease_id': lease_id if urls else None, 'urls': urls, 'lease_seconds': settings['lease_seconds']}
+
+def heartbeat(config, lease_id):
+    """续期租约，返回仍持有的 URL 数；为 0 表示租约已过期被回收或已全部提交"""
+    settings = get_work_queue_config(config)
+    return database.renew_lease(_db_path(config), lease_id, settings['lease_seconds'])
+
+def release(config, lease_id):
+    count = database.release_lease(_db_path(config), lease_id)
+    if count:
+        logger.info(f"[{config['site_name']}] 租约 {lease_id[:8]} 归还 {count} 个未处理的 URL。")
+    return count
+
+def _submit_one(db_path, source, lease_id, worker, result):
+    url = result['url']
+    lease = database.get_work_lease(db_path, source, url)
+    if lease and lease['lease_id'] == lease_id and lease['result']:
+        # 同一租约重复提交 (如上次的响应丢失后重试)
+        return lease['result']
+    if lease and lease['result'] is None and lease['lease_id'] != lease_id and lease['expires_at'] >= time.time():
+        # 租约过期后该 URL 已分配给其他工作进程，以对方的结果为准
+        return 'LEASE_LOST'
+    if database.get_url_status(db_path, source, url) not in PENDING_STATUSES:
+        # 已由其他工作进程 (或本机的 process_details) 完成，或已作为重复删除
+        return 'ALREADY'
+    details = result.get('details')
+    if result.get('error') or not details:
+        logger.warning(f"[{source}] 工作进程 {worker} 处理失败: {url} - {result.get('error')}")
+        database.mark_url_failed(db_path, url, source)
+        outcome = 'FAILED'
+    else:
+        outcome = database.update_post_with_tags(db_path, url, source, details, result.get('tags') or [])
+    database.complete_lease(db_path, source, url, lease_id, worker, outcome)
+    return outcome
+
+def submit(config, lease_id, worker, results):
+    """
+    写入工作进程提交的结果，返回 {url: 结果}。结果为 UPDATED/DUPLICATE/FAILED (已写入)，
+    ALREADY (已由其他进程完成，本次忽略) 或 LEASE_LOST (租约已被回收并重新分配)；同一租约重复提交返回首次的结果。
+    """
+    db_path = _db_path(config)
+    outcomes = {}
+    with _submit_lock:
+        for result in results:
+            outcomes[result['url']] = _submit_one(db_path, config['site_name'], lease_id, worker, result)
+    return outcomes
+
+def status(config):
+    """待处理/失败的 URL 数以及各工作进程持有的租约"""
+    db_path = _db_path(config)
+    source = config['site_name']
+    now = time.time()
+    return {
+        'pending': len(database.get_unprocessed_urls(db_path, source)),
+        'failed': len(database.get_failed_urls(db_path, source)),
+        'leases': [{'worker': worker, 'urls': count, 'expires_in': round(expires_at - now, 1)}
+                   for worker, count, expires_at in database.get_active_leases(db_path, source)],
+    }